@@ -0,0 +1,150 @@
+# Load test for the LLM layer against the local mock server (or any
+# OpenAI-compatible endpoint). N concurrent sessions each run
+# synthesize_recommendations once and then a few follow-up turns; per-operation
+# latency percentiles and throughput are reported.
+#
+#   python benchmarks/llm_load_test.py --sessions 32 --followups 2 --ttft 0.3 --tokens-per-second 40
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.schemas import ActionRecommendation, RecommendationBundle
+from src import llm_layer
+from src.llm_backend import HFInferenceBackend, set_backend
+from src.llm_mock_server import MockLLMServer
+
+QUESTIONS = [
+    "Which action should we start with?",
+    "How sensitive is the payback to the electricity price?",
+    "What would change if we had a £5,000 budget?",
+]
+
+class CountingBackend(HFInferenceBackend):
+    """Counts completed backend calls; llm_layer.CALL_TIMINGS is bounded, so it cannot."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _counted(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+
+    async def acomplete(self, messages: list[dict], max_tokens: int) -> str:
+        text = await super().acomplete(messages, max_tokens)
+        self._counted()
+        return text
+
+    def stream(self, messages: list[dict], max_tokens: int):
+        yield from super().stream(messages, max_tokens)
+        self._counted()
+
+def sample_bundle(session: int) -> RecommendationBundle:
+    # Slightly different figures per session so no two sessions share cache keys
+    def action(title, category, capex, savings, co2, disruption):
+        savings += session
+        return ActionRecommendation(
+            title=title, category=category, capex_gbp=capex, annual_savings_gbp=savings,
+            payback_months=capex / savings * 12 if capex else 0.0, co2_savings_tonnes_per_year=co2,
+            short_term_impact="Savings from the first bill", long_term_impact="Sustained savings",
+            operational_disruption=disruption, confidence=0.8,
+            assumptions_list=["Unit rate derived from bill"], rule_ids_applied=[],
+        )
+    return RecommendationBundle(
+        customer_id=f"Load test site {session}",
+        generated_at="",
+        executive_summary={},
+        detailed=[
+            action("Switch to time-of-use tariff", "no-capex", 0.0, 400.0, 0.2, "Low"),
+            action("LED Lighting Retrofit", "capex", 1600.0, 1050.0, 1.2, "Low"),
+            action("Solar Panel Installation", "capex", 70000.0, 23000.0, 18.7, "Medium"),
+        ],
+        scoring_weights={"roi": 0.6, "carbon": 0.2, "disruption": 0.1, "confidence": 0.1},
+        provenance={"bill_source": "synthetic", "calculations": "deterministic"},
+    )
+
+async def _session(i: int, followups: int, mode: str, latencies: dict) -> None:
+    bundle = sample_bundle(i)
+    start = time.perf_counter()
+    await llm_layer.synthesize_recommendations_async(bundle, mode)
+    latencies["synthesize"].append(time.perf_counter() - start)
+    context = llm_layer.followup_context(bundle)
+    for question in QUESTIONS[:followups]:
+        start = time.perf_counter()
+        await llm_layer.followup_response_async(question, bundle, context)
+        latencies["followup"].append(time.perf_counter() - start)
+
+async def _run(sessions: int, followups: int, mode: str) -> tuple[dict, float]:
+    latencies = {"synthesize": [], "followup": []}
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_session(i, followups, mode, latencies) for i in range(sessions)))
+    finally:
+        await llm_layer.close_async_client()
+    return latencies, time.perf_counter() - start
+
+def summarise(latencies: dict, wall_s: float, llm_calls: int) -> dict:
+    out = {"wall_s": round(wall_s, 3), "llm_calls": llm_calls, "llm_calls_per_s": round(llm_calls / wall_s, 2)}
+    for op, values in latencies.items():
+        if not values:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        out[op] = {"count": len(values), "p50_s": round(p50, 3), "p95_s": round(p95, 3), "p99_s": round(p99, 3),
+                   "mean_s": round(float(np.mean(values)), 3), "per_s": round(len(values) / wall_s, 2)}
+    return out
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="Load test synthesize_recommendations and followup_response")
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent user sessions")
+    parser.add_argument("--followups", type=int, default=2, help=f"Follow-up turns per session (max {len(QUESTIONS)})")
+    parser.add_argument("--mode", default="template", choices=["template", "llm"], help="LLM_RENDER_MODE to test")
+    parser.add_argument("--concurrency", type=int, default=llm_layer.LLM_CONCURRENCY, help="Client-side LLM_CONCURRENCY")
+    parser.add_argument("--base-url", default=None, help="Existing OpenAI-compatible server; default starts the mock")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Mock server time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Mock server decode speed")
+    parser.add_argument("--server-concurrency", type=int, default=None, help="Mock server slots; excess requests queue")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock server 503 rate (exercises retries)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    os.environ["LLM_CACHE_DISABLED"] = "1"  # Measure the backend, not the disk cache
+    llm_layer.LLM_CONCURRENCY = args.concurrency
+    server = None
+    if args.base_url is None:
+        server = MockLLMServer(ttft_s=args.ttft, tokens_per_s=args.tokens_per_second or None,
+                               max_concurrency=args.server_concurrency, error_rate=args.error_rate).start()
+    backend = CountingBackend(base_url=args.base_url or server.url, token=os.getenv("HF_TOKEN") or "mock",
+                              timeout=llm_layer.LLM_TIMEOUT_SECONDS)
+    previous = set_backend(backend)
+    try:
+        latencies, wall_s = asyncio.run(_run(args.sessions, min(args.followups, len(QUESTIONS)), args.mode))
+    finally:
+        set_backend(previous)
+        if server is not None:
+            server.stop()
+    summary = summarise(latencies, wall_s, backend.calls)
+    summary["config"] = vars(args)
+
+    print(f"{args.sessions} sessions, mode={args.mode}, client concurrency={args.concurrency}: "
+          f"{summary['wall_s']} s wall, {summary['llm_calls_per_s']} LLM calls/s")
+    print(f"{'operation':<12}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'req/s':>9}")
+    for op in ("synthesize", "followup"):
+        if op in summary:
+            r = summary[op]
+            print(f"{op:<12}{r['count']:>7}{r['p50_s']:>9}{r['p95_s']:>9}{r['p99_s']:>9}{r['per_s']:>9}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+if __name__ == "__main__":
+    main()
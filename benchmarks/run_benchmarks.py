@@ -0,0 +1,316 @@
+# Benchmark suite: times the ingest parsers, calculation kernels (scalar and
+# batch), tariff pricing, ranking, postcode lookups, the rules layer and the LLM
+# layer (against the in-process mock backend) on synthetic data, reports throughput and peak
+# traced memory, and compares against benchmarks/baseline.json. A case more
+# than --time-tolerance slower (or --memory-tolerance larger) than its baseline
+# fails the run; so does any batch/scalar kernel mismatch.
+#
+#   python benchmarks/run_benchmarks.py                      # smoke scale vs baseline
+#   python benchmarks/run_benchmarks.py --scale large        # 100k sites, 10M intervals
+#   python benchmarks/run_benchmarks.py --update-baseline    # record this machine's numbers
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from benchmarks import synthetic
+from src.action_table import ActionTable
+from src.engine import batch, calculations
+from src.engine.tariff import bill_from_intervals
+from src.ingest import load_interval_data, parse_csv_bill, parse_interval_csv
+from src.ingest_cache import IngestCache
+from src.measures import evaluate_measures
+from src.pipeline import apply_industry, apply_rules
+from src.postcodes import get_postcode_index
+from src.rules.engine import build_facts
+from src.rules.uk_rules import UK_RULESET, action_type
+from src.schemas import CustomerProfile, RecommendationBundle
+from src.scoring import rank_actions, rank_table
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SCALES = {
+    "smoke": {"sites": 1_000, "intervals": 35_040, "bundles": 16},
+    "medium": {"sites": 10_000, "intervals": 1_000_000, "bundles": 64},
+    "large": {"sites": 100_000, "intervals": 10_000_000, "bundles": 256},
+}
+MAX_BILL_FILES = 2_000  # parse_csv_bill is timed on at most this many files
+DEFAULT_TIME_TOLERANCE = 0.5  # Fail when 50% slower than baseline
+DEFAULT_MEMORY_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.005  # Ignore timer noise on sub-millisecond cases
+MIN_REGRESSION_MB = 1.0
+
+@dataclass(slots=True)
+class Case:
+    name: str
+    items: int  # Work units per call, for throughput
+    unit: str
+    fn: Callable[[], object]
+    repeats: int = 3
+
+@dataclass(slots=True)
+class Result:
+    name: str
+    items: int
+    unit: str
+    seconds: float  # Best of the repeats
+    per_s: float
+    peak_mb: float | None  # tracemalloc peak over one extra call
+
+def measure(case: Case, memory: bool = True) -> Result:
+    best = float("inf")
+    for _ in range(case.repeats):
+        gc.collect()
+        start = time.perf_counter()
+        case.fn()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        # Separate call: tracing slows Python-heavy code, so it is kept out of the timings
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.fn()
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return Result(case.name, case.items, case.unit, best, case.items / best if best else float("inf"), peak)
+
+# Batch kernels must match their scalar counterparts element-wise
+
+def check_kernel_parity(bills: list, rtol: float = 1e-9) -> list[str]:
+    """Names of batch kernels whose output differs from the scalar loop (empty when all match)."""
+    rng = np.random.default_rng(7)
+    n = len(bills)
+    kwh = np.array([b.total_kwh for b in bills])
+    cost = np.array([b.total_cost_gbp for b in bills])
+    standing = np.array([b.standing_charge_per_day for b in bills])
+    provided = np.array([np.nan if b.unit_rate_p_per_kwh is None else b.unit_rate_p_per_kwh for b in bills])
+    days = batch.days_in_period_batch([b.start_date for b in bills], [b.end_date for b in bills])
+    rate = batch.derive_unit_rate_batch(kwh, cost, standing, days, provided)
+    capex = rng.uniform(0, 20_000, n)
+    savings = rng.uniform(-500, 5_000, n)
+    hours = rng.uniform(4, 24, n)
+    flags = rng.random((n, 3)) < 0.3
+
+    lighting = batch.lighting_retrofit_savings_batch(50, 12, 40, hours, rate)
+    scalar_lighting = [calculations.lighting_retrofit_savings(50, 12, 40, h, r) for h, r in zip(hours, rate)]
+    checks = {
+        "days_in_period": (days, [calculations.days_in_period(b) for b in bills]),
+        "derive_unit_rate": (rate, [calculations.derive_unit_rate(b) for b in bills]),
+        "calc_cost_from_unit_rate": (batch.calc_cost_from_unit_rate_batch(kwh, rate, standing * 100, days),
+                                     [calculations.calc_cost_from_unit_rate(k, r, s * 100, d)
+                                      for k, r, s, d in zip(kwh, rate, standing, days)]),
+        "lighting_retrofit_savings.annual_kwh_saved": (lighting["annual_kwh_saved"],
+                                                        [x["annual_kwh_saved"] for x in scalar_lighting]),
+        "lighting_retrofit_savings.annual_savings_gbp": (lighting["annual_savings_gbp"],
+                                                          [x["annual_savings_gbp"] for x in scalar_lighting]),
+        "co2_from_kwh": (batch.co2_from_kwh_batch(kwh, 181.0), [calculations.co2_from_kwh(k, 181.0) for k in kwh]),
+        "payback_months": (batch.payback_months_batch(capex, savings),
+                           [calculations.payback_months(c, s) for c, s in zip(capex, savings)]),
+        "confidence_score": (batch.confidence_score_batch(flags),
+                             [calculations.confidence_score(dict(enumerate(row))) for row in flags]),
+    }
+    return [name for name, (vectorised, scalar) in checks.items()
+            if not np.allclose(vectorised, np.asarray(scalar, dtype=np.float64), rtol=rtol, atol=1e-9, equal_nan=True)]
+
+# Cases
+
+def _scalar_kernels(bills: list) -> None:
+    for b in bills:
+        rate = calculations.derive_unit_rate(b)
+        lighting = calculations.lighting_retrofit_savings(50, 12, 40, 12, rate)
+        calculations.payback_months(1600, lighting["annual_savings_gbp"])
+        calculations.co2_from_kwh(lighting["annual_kwh_saved"], 181.0)
+
+def _batch_kernels(columns: dict) -> None:
+    rate = batch.derive_unit_rate_batch(columns["kwh"], columns["cost"], columns["standing"], columns["days"],
+                                        columns["provided"])
+    lighting = batch.lighting_retrofit_savings_batch(50, 12, 40, 12, rate)
+    batch.payback_months_batch(1600, lighting["annual_savings_gbp"])
+    batch.co2_from_kwh_batch(lighting["annual_kwh_saved"], 181.0)
+
+def _rank_per_site(actions: list, per_site: int) -> None:
+    for i in range(0, len(actions), per_site):
+        rank_actions(actions[i:i + per_site])
+
+def _rules(actions: list) -> None:
+    apply_rules(apply_industry(actions, "retail"))
+
+def _bundles(n: int, actions: list, per_site: int) -> list[RecommendationBundle]:
+    return [RecommendationBundle(
+        customer_id=f"Synthetic site {i}", generated_at="", executive_summary={},
+        detailed=rank_actions(actions[i * per_site:(i + 1) * per_site]),
+        scoring_weights={"roi": 0.6, "carbon": 0.2, "disruption": 0.1, "confidence": 0.1},
+        provenance={"bill_source": "synthetic", "calculations": "deterministic"},
+    ) for i in range(n)]
+
+def _synthesize_all(bundles: list) -> None:
+    from src import llm_layer
+
+    async def run():
+        try:
+            await asyncio.gather(*(llm_layer.synthesize_recommendations_async(b, "template") for b in bundles))
+        finally:
+            await llm_layer.close_async_client()
+    asyncio.run(run())
+
+def build_cases(sizes: dict, workdir: str, seed: int) -> list[Case]:
+    sites, intervals, n_bundles = sizes["sites"], sizes["intervals"], sizes["bundles"]
+    big = intervals >= 1_000_000
+
+    bill_paths = synthetic.write_bill_csvs(os.path.join(workdir, "bills"), min(sites, MAX_BILL_FILES), seed=seed)
+    interval_path = synthetic.write_interval_csv(os.path.join(workdir, "intervals.csv"), intervals, seed)
+    interval_data = parse_interval_csv(interval_path)
+    cache = IngestCache(os.path.join(workdir, "ingest_cache"))
+    load_interval_data(interval_path, cache=cache)  # Warm the cache for the hit case
+
+    bills = synthetic.bill_records(sites, seed)
+    columns = {
+        "kwh": np.array([b.total_kwh for b in bills]),
+        "cost": np.array([b.total_cost_gbp for b in bills]),
+        "standing": np.array([b.standing_charge_per_day for b in bills]),
+        "days": batch.days_in_period_batch([b.start_date for b in bills], [b.end_date for b in bills]),
+        "provided": np.array([np.nan if b.unit_rate_p_per_kwh is None else b.unit_rate_p_per_kwh for b in bills]),
+    }
+    per_site = len(synthetic.ACTION_TEMPLATES)
+    actions, customer = synthetic.portfolio_actions(sites, seed=seed)
+    table = ActionTable.from_actions(actions, customer)
+    bundles = _bundles(min(n_bundles, sites), actions, per_site)
+    profiles = [CustomerProfile(**p) for p in synthetic.customer_profiles(sites, seed)]
+    postcodes = [p.postcode for p in profiles]
+    facts = build_facts(profiles)
+    site_facts = build_facts(profiles, bills)
+    title_types = [action_type(t) for t in table.pools["title"].values]
+
+    return [
+        Case("ingest.parse_csv_bill", len(bill_paths), "bills", lambda: [parse_csv_bill(p) for p in bill_paths]),
+        Case("ingest.parse_interval_csv", intervals, "intervals", lambda: parse_interval_csv(interval_path),
+             repeats=1 if big else 3),
+        Case("ingest.load_interval_data.cached", intervals, "intervals",
+             lambda: load_interval_data(interval_path, cache=cache)),
+        Case("engine.kernels.scalar", sites, "sites", lambda: _scalar_kernels(bills)),
+        Case("engine.kernels.batch", sites, "sites", lambda: _batch_kernels(columns)),
+        Case("engine.tariff.bill_from_intervals", intervals, "intervals", lambda: bill_from_intervals(interval_data)),
+        Case("scoring.rank_actions", len(actions), "actions", lambda: _rank_per_site(actions, per_site)),
+        Case("scoring.rank_table", len(actions), "actions", lambda: rank_table(table, k=3)),
+        Case("rules.industry_and_rule_ids", len(actions), "actions", lambda: _rules(actions)),
+        Case("postcodes.lookup_many", len(postcodes), "postcodes", lambda: get_postcode_index().lookup_many(postcodes)),
+        Case("rules.evaluate_portfolio", len(table), "actions",
+             lambda: UK_RULESET.evaluate(facts, table.title, table.customer, types=title_types)),
+        Case("measures.evaluate_catalog", sites, "sites", lambda: evaluate_measures(site_facts)),
+        Case("llm.synthesize_template_mock", len(bundles), "bundles", lambda: _synthesize_all(bundles)),
+    ]
+
+# Baseline comparison
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(results: list[Result], baseline: dict, time_tolerance: float, memory_tolerance: float) -> list[str]:
+    """Human-readable regressions against the baseline cases (missing cases are skipped)."""
+    problems = []
+    for r in results:
+        base = baseline.get(r.name)
+        if not base:
+            continue
+        if r.seconds > base["seconds"] * (1 + time_tolerance) and r.seconds - base["seconds"] > MIN_REGRESSION_SECONDS:
+            problems.append(f"{r.name}: {r.seconds:.4f} s vs baseline {base['seconds']:.4f} s "
+                            f"(+{(r.seconds / base['seconds'] - 1) * 100:.0f}%)")
+        if (r.peak_mb is not None and base.get("peak_mb") is not None
+                and r.peak_mb > base["peak_mb"] * (1 + memory_tolerance) and r.peak_mb - base["peak_mb"] > MIN_REGRESSION_MB):
+            problems.append(f"{r.name}: peak {r.peak_mb:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return problems
+
+def print_results(results: list[Result], baseline: dict) -> None:
+    print(f"{'case':<36}{'items':>11}{'seconds':>10}{'items/s':>13}{'peak MB':>9}{'vs base':>9}")
+    for r in results:
+        base = baseline.get(r.name)
+        delta = f"{(r.seconds / base['seconds'] - 1) * 100:+.0f}%" if base and base["seconds"] else "-"
+        peak = f"{r.peak_mb:.1f}" if r.peak_mb is not None else "-"
+        print(f"{r.name:<36}{r.items:>11,}{r.seconds:>10.4f}{r.per_s:>13,.0f}{peak:>9}{delta:>9}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ingest, kernels, ranking, rules and the LLM layer")
+    parser.add_argument("--scale", default="smoke", choices=sorted(SCALES))
+    parser.add_argument("--sites", type=int, default=None, help="Override the scale's site count (1 to 100k)")
+    parser.add_argument("--intervals", type=int, default=None, help="Override the scale's interval rows (1k to 10M)")
+    parser.add_argument("--seed", type=int, default=synthetic.DEFAULT_SEED)
+    parser.add_argument("--only", default=None, help="Run cases whose name contains this text")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    sizes = dict(SCALES[args.scale])
+    if args.sites is not None:
+        sizes["sites"] = args.sites
+    if args.intervals is not None:
+        sizes["intervals"] = args.intervals
+    custom = args.sites is not None or args.intervals is not None
+    scale_key = args.scale if not custom else f"custom-{sizes['sites']}-{sizes['intervals']}"
+
+    # Measure the code, not the LLM disk cache or the network
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    from src.llm_backend import MockBackend, set_backend
+    previous = set_backend(MockBackend())
+
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="ener-gpt-bench-") as workdir:
+            print(f"Generating {scale_key} data: {sizes['sites']:,} sites, {sizes['intervals']:,} intervals")
+            cases = build_cases(sizes, workdir, args.seed)
+            mismatched = check_kernel_parity(synthetic.bill_records(min(sizes["sites"], 100_000), args.seed))
+            failures += [f"batch kernel {name} does not match the scalar version" for name in mismatched]
+            results = [measure(c, memory=not args.no_memory) for c in cases if not args.only or args.only in c.name]
+    finally:
+        set_backend(previous)
+
+    stored = load_baseline(args.baseline)
+    baseline = stored.get("scales", {}).get(scale_key, {})
+    print_results(results, baseline)
+    failures += compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+
+    summary = {"scale": scale_key, "sizes": sizes, "results": [asdict(r) for r in results], "failures": failures}
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.update_baseline:
+        stored.setdefault("scales", {})[scale_key] = {
+            r.name: {"seconds": round(r.seconds, 6), "peak_mb": None if r.peak_mb is None else round(r.peak_mb, 2)}
+            for r in results}
+        stored["machine"] = {"python": platform.python_version(), "platform": platform.platform(),
+                             "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline for {scale_key} written to {args.baseline}")
+        return 0 if not mismatched else 1
+    if failures:
+        print("\nFAILED:")
+        for problem in failures:
+            print(f"  {problem}")
+        return 1
+    if not baseline:
+        print(f"\nNo baseline for {scale_key}; run with --update-baseline to record one.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Deterministic synthetic inputs for the benchmark suite: monthly bill CSVs,
+# 15-minute interval files shaped like "Sample Energy Data.csv", asset
+# inventories, customer profiles and candidate actions for a portfolio of
+# sites. The same seed always gives the same data; large outputs are produced
+# in chunks so memory stays flat from 1 to 100k sites and 1k to 10M intervals.
+#
+#   python benchmarks/synthetic.py --out /tmp/synthetic --sites 1000 --intervals 35040
+
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from src.ingest import INTERVAL_COLUMNS
+from src.schemas import ActionRecommendation, BillRecord
+
+DEFAULT_SEED = 2025
+INTERVAL_START = np.datetime64("2025-01-01T00:00", "s")
+INTERVAL_STEP = np.timedelta64(15, "m")
+INTERVAL_CHUNK_ROWS = 500_000
+SLOTS_PER_DAY = 96
+# Side column like the sample export; must be ignored by the parsers
+TARIFF_NOTE_COLUMN = "Grid Tariff: $0.30 per kWh from 7am to 10 am and 5pm to 10pm"
+INDUSTRIES = ("HORECA", "Office", "Retail", "Other")
+REGIONS = ("UK", "EU", "India", "Other")
+ASSET_TYPES = ("lighting", "boiler", "hvac", "refrigeration", "it")
+
+# title, category, capex range (£), savings range (£/yr), CO₂ range (t/yr), disruption
+ACTION_TEMPLATES = (
+    ("LED Lighting Retrofit", "capex", (800, 4000), (300, 2500), (0.2, 2.0), "Low"),
+    ("Smart HVAC Tuning", "no-capex", (0, 500), (200, 1500), (0.1, 1.5), "Low"),
+    ("Solar Panel Installation", "capex", (8000, 90000), (1000, 25000), (1.0, 20.0), "Medium"),
+    ("Battery Storage", "capex", (5000, 60000), (500, 9000), (0.0, 3.0), "Medium"),
+    ("Heat Pump Installation", "capex", (6000, 30000), (-200, 3000), (1.0, 8.0), "High"),
+    ("Switch to time-of-use tariff", "no-capex", (0, 0), (0, 900), (0.0, 0.5), "Low"),
+)
+
+def _rng(seed: int, stream: int = 0) -> np.random.Generator:
+    # Independent streams per table/chunk so resizing one output does not shift another
+    return np.random.default_rng([seed, stream])
+
+def bill_records(n_sites: int, seed: int = DEFAULT_SEED) -> list[BillRecord]:
+    """One annual BillRecord per site."""
+    rng = _rng(seed, 1)
+    kwh = rng.lognormal(np.log(30_000), 0.8, n_sites)
+    rate = rng.uniform(0.14, 0.34, n_sites)
+    standing = rng.uniform(0.2, 0.8, n_sites)
+    days = rng.integers(28, 366, n_sites)
+    provided = np.where(rng.random(n_sites) < 0.2, rate * 100, np.nan)
+    start = pd.Timestamp("2025-01-01").date()
+    return [BillRecord(float(k), float(k * r + s * d), float(s), start, (pd.Timestamp(start) + pd.Timedelta(days=int(d))).date(),
+                       None if np.isnan(p) else float(p))
+            for k, r, s, d, p in zip(kwh, rate, standing, days, provided)]
+
+def bill_frame(site: int, months: int = 12, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Monthly bill lines for one site (readable by parse_csv_bill and the pipeline)."""
+    rng = _rng(seed, 10_000 + site)
+    kwh = np.round(rng.lognormal(np.log(2500), 0.6) * rng.uniform(0.8, 1.2, months), 1)
+    cost = np.round(kwh * rng.uniform(0.14, 0.34), 2)
+    dates = pd.date_range("2025-01-01", periods=months, freq="MS").strftime("%Y-%m-%d")
+    return pd.DataFrame({"date": dates, "kwh": kwh, "cost": cost, "cost_gbp": cost})
+
+def write_bill_csvs(directory: str, n_sites: int, months: int = 12, seed: int = DEFAULT_SEED) -> list[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for site in range(n_sites):
+        path = os.path.join(directory, f"site_{site:06d}.csv")
+        bill_frame(site, months, seed).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def interval_chunk(start: int, n: int, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Rows [start, start + n) of a synthetic 15-minute meter export."""
+    rng = _rng(seed, 20_000 + start // INTERVAL_CHUNK_ROWS)
+    idx = np.arange(start, start + n)
+    slot = idx % SLOTS_PER_DAY
+    day = idx // SLOTS_PER_DAY
+    hour = slot / 4.0
+    season = np.cos(2 * np.pi * (day % 365) / 365.0)  # +1 mid-winter, -1 mid-summer
+    occupied = (hour >= 7) & (hour < 19)
+    consumption = np.round(6 + 8 * occupied + 2 * season + rng.normal(0, 1, n).clip(-3, 3), 2)
+    wind = np.round(np.abs(60 + 40 * season + rng.normal(0, 35, n)), 2)
+    daylight = np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None)
+    solar = np.round(daylight * (120 - 80 * season) * rng.uniform(0.3, 1.0, n), 2)
+    timestamps = pd.to_datetime(INTERVAL_START + idx * INTERVAL_STEP)
+    note = np.where(idx == 1, "Renewable Energy Tariff: $0.15 per kWh", "")
+    return pd.DataFrame({
+        INTERVAL_COLUMNS[0]: timestamps.strftime("%m/%d/%Y %H:%M"),
+        INTERVAL_COLUMNS[1]: consumption,
+        INTERVAL_COLUMNS[2]: wind,
+        INTERVAL_COLUMNS[3]: solar,
+        "": "",
+        TARIFF_NOTE_COLUMN: note,
+    })
+
+def write_interval_csv(path: str, n_intervals: int, seed: int = DEFAULT_SEED) -> str:
+    """Write an interval CSV in INTERVAL_CHUNK_ROWS pieces (flat memory at 10M rows)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for start in range(0, n_intervals, INTERVAL_CHUNK_ROWS):
+            n = min(INTERVAL_CHUNK_ROWS, n_intervals - start)
+            interval_chunk(start, n, seed).to_csv(f, index=False, header=start == 0)
+    return path
+
+def asset_frame(n_assets: int, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Asset inventory with the columns parse_asset_csv() reads."""
+    rng = _rng(seed, 2)
+    return pd.DataFrame({
+        "type": rng.choice(ASSET_TYPES, n_assets),
+        "capacity": np.round(rng.uniform(0.5, 50, n_assets), 2),
+        "efficiency": np.round(rng.uniform(0.5, 0.98, n_assets), 3),
+        "usage": np.round(rng.uniform(1, 200, n_assets), 1),
+        "opex": np.round(rng.uniform(50, 5000, n_assets), 0),
+        "capex": np.round(rng.uniform(200, 40000, n_assets), 0),
+    })
+
+def customer_profiles(n_sites: int, seed: int = DEFAULT_SEED) -> list[dict]:
+    """Dicts accepted by parse_customer_profile()."""
+    rng = _rng(seed, 3)
+    areas = ("SW1A", "M1", "B1", "LS1", "G1", "CF10", "BT1", "EH1")
+    return [{
+        "type": "SME" if rng.random() < 0.8 else "household",
+        "postcode": f"{areas[int(rng.integers(len(areas)))]} {int(rng.integers(1, 10))}AA",
+        "floor_area_m2": float(np.round(rng.uniform(30, 2000), 1)),
+        "operating_hours_per_day": float(rng.integers(6, 24)),
+        "business_category": INDUSTRIES[int(rng.integers(len(INDUSTRIES)))],
+    } for _ in range(n_sites)]
+
+def portfolio_actions(n_sites: int, actions_per_site: int = len(ACTION_TEMPLATES),
+                      seed: int = DEFAULT_SEED) -> tuple[list[ActionRecommendation], np.ndarray]:
+    """Candidate actions for every site and the site index of each action."""
+    rng = _rng(seed, 4)
+    k = min(actions_per_site, len(ACTION_TEMPLATES))
+    n = n_sites * k
+    template = np.tile(np.arange(k), n_sites)
+    u = rng.random((3, n))
+    actions = []
+    for i, t in enumerate(template.tolist()):
+        title, category, capex_r, savings_r, co2_r, disruption = ACTION_TEMPLATES[t]
+        capex = round(capex_r[0] + u[0, i] * (capex_r[1] - capex_r[0]), 0)
+        savings = round(savings_r[0] + u[1, i] * (savings_r[1] - savings_r[0]), 2)
+        actions.append(ActionRecommendation(
+            title=title, category=category, capex_gbp=capex, annual_savings_gbp=savings,
+            payback_months=capex / savings * 12 if savings > 0 else float("inf"),
+            co2_savings_tonnes_per_year=round(co2_r[0] + u[2, i] * (co2_r[1] - co2_r[0]), 3),
+            short_term_impact="Synthetic", long_term_impact="Synthetic", operational_disruption=disruption,
+            confidence=round(0.6 + 0.4 * u[0, i], 2), assumptions_list=["Synthetic data"], rule_ids_applied=[],
+        ))
+    return actions, np.repeat(np.arange(n_sites, dtype=np.int32), k)
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic portfolio to disk")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--sites", type=int, default=100, help="Bill CSVs, assets and profiles to generate")
+    parser.add_argument("--intervals", type=int, default=35_040, help="Rows in intervals.csv (35,040 = one year)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    write_bill_csvs(os.path.join(args.out, "bills"), args.sites, seed=args.seed)
+    write_interval_csv(os.path.join(args.out, "intervals.csv"), args.intervals, args.seed)
+    asset_frame(args.sites * 5, args.seed).to_csv(os.path.join(args.out, "assets.csv"), index=False)
+    pd.DataFrame(customer_profiles(args.sites, args.seed)).to_csv(os.path.join(args.out, "profiles.csv"), index=False)
+    print(f"Wrote {args.sites} bills, {args.intervals} intervals, {args.sites * 5} assets and "
+          f"{args.sites} profiles to {args.out}")
+
+if __name__ == "__main__":
+    main()
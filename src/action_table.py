@@ -0,0 +1,222 @@
+# Columnar (struct-of-arrays) container for large sets of candidate actions.
+# Numeric fields are typed arrays, string fields are interned into integer codes,
+# and the per-action lists (assumptions, rule IDs) use offsets + codes (CSR layout).
+# Converts losslessly to/from ActionRecommendation for the LLM layer.
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .schemas import ActionRecommendation
+
+NUMERIC_FIELDS = ("capex_gbp", "annual_savings_gbp", "payback_months", "co2_savings_tonnes_per_year", "confidence")
+CATEGORICAL_FIELDS = ("title", "category", "operational_disruption", "short_term_impact", "long_term_impact")
+LIST_FIELDS = ("assumptions_list", "rule_ids_applied")
+
+# Fixed leading vocabularies keep codes stable across tables
+CATEGORIES = ("no-capex", "capex")
+DISRUPTION_LEVELS = ("Low", "Medium", "High")
+
+class StringPool:
+    """Interns strings to dense int32 codes."""
+    __slots__ = ("values", "_index")
+
+    def __init__(self, values=()):
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value: str) -> int:
+        c = self._index.get(value)
+        if c is None:
+            c = self._index[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def codes(self, values) -> np.ndarray:
+        if isinstance(values, np.ndarray):
+            # Intern each distinct value once, then map the whole column
+            uniq, inverse = np.unique(values, return_inverse=True)
+            mapping = np.fromiter((self.code(str(v)) for v in uniq), dtype=np.int32, count=len(uniq))
+            return mapping[inverse.reshape(-1)]
+        return np.fromiter((self.code(v) for v in values), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+def default_pools() -> dict:
+    """Empty string pools for every categorical and list field (fixed vocabularies pre-seeded)."""
+    pools = {name: StringPool() for name in CATEGORICAL_FIELDS + LIST_FIELDS}
+    pools["category"] = StringPool(CATEGORIES)
+    pools["operational_disruption"] = StringPool(DISRUPTION_LEVELS)
+    return pools
+
+@dataclass
+class ActionTable:
+    customer: np.ndarray  # int32 row -> customer index
+    numeric: dict[str, np.ndarray]  # NUMERIC_FIELDS -> float64
+    codes: dict[str, np.ndarray]  # CATEGORICAL_FIELDS -> int32 codes into pools
+    list_offsets: dict[str, np.ndarray]  # LIST_FIELDS -> int64 offsets, len n + 1
+    list_codes: dict[str, np.ndarray]  # LIST_FIELDS -> int32 codes into pools
+    pools: dict[str, StringPool] = field(default_factory=default_pools)
+    customer_ids: list[str] | None = None  # Optional labels for customer indices
+
+    def __len__(self) -> int:
+        return len(self.customer)
+
+    def __getattr__(self, name):
+        # Column shortcuts: table.capex_gbp, table.title (codes), ...
+        numeric = self.__dict__.get("numeric", {})
+        if name in numeric:
+            return numeric[name]
+        codes = self.__dict__.get("codes", {})
+        if name in codes:
+            return codes[name]
+        raise AttributeError(name)
+
+    @classmethod
+    def from_actions(cls, actions: list[ActionRecommendation], customer=None,
+                     customer_ids: list[str] | None = None) -> "ActionTable":
+        """Build a table from dataclasses. `customer` is an int per action (defaults to 0)."""
+        n = len(actions)
+        pools = default_pools()
+        numeric = {f: np.fromiter((getattr(a, f) for a in actions), dtype=np.float64, count=n) for f in NUMERIC_FIELDS}
+        codes = {f: pools[f].codes(getattr(a, f) for a in actions) for f in CATEGORICAL_FIELDS}
+        offsets, list_codes = {}, {}
+        for f in LIST_FIELDS:
+            lengths = np.fromiter((len(getattr(a, f)) for a in actions), dtype=np.int64, count=n)
+            offsets[f] = np.concatenate(([0], np.cumsum(lengths)))
+            list_codes[f] = pools[f].codes(v for a in actions for v in getattr(a, f))
+        cust = np.zeros(n, dtype=np.int32) if customer is None else np.asarray(customer, dtype=np.int32)
+        return cls(cust, numeric, codes, offsets, list_codes, pools, customer_ids)
+
+    @classmethod
+    def from_columns(cls, customer, numeric: dict, strings: dict, lists: dict | None = None,
+                     customer_ids: list[str] | None = None) -> "ActionTable":
+        """Build a table from column arrays. `strings` maps CATEGORICAL_FIELDS to a per-row
+        sequence or a single value broadcast to every row; `lists` maps LIST_FIELDS to a
+        per-row sequence of lists or one list shared by every row.
+        """
+        customer = np.asarray(customer, dtype=np.int32)
+        n = len(customer)
+        pools = default_pools()
+        num = {f: np.broadcast_to(np.asarray(numeric[f], dtype=np.float64), (n,)).copy() for f in NUMERIC_FIELDS}
+        codes = {}
+        for f in CATEGORICAL_FIELDS:
+            v = strings[f]
+            codes[f] = np.full(n, pools[f].code(v), dtype=np.int32) if isinstance(v, str) else pools[f].codes(v)
+        offsets, list_codes = {}, {}
+        for f in LIST_FIELDS:
+            v = (lists or {}).get(f, [])
+            if not v or isinstance(v[0], str):
+                shared = pools[f].codes(v)
+                offsets[f] = np.arange(n + 1, dtype=np.int64) * len(shared)
+                list_codes[f] = np.tile(shared, n)
+            else:
+                lengths = np.fromiter((len(x) for x in v), dtype=np.int64, count=n)
+                offsets[f] = np.concatenate(([0], np.cumsum(lengths)))
+                list_codes[f] = pools[f].codes(s for x in v for s in x)
+        return cls(customer, num, codes, offsets, list_codes, pools, customer_ids)
+
+    def strings(self, name: str) -> np.ndarray:
+        """Decode a categorical column into an object array."""
+        return np.asarray(self.pools[name].values, dtype=object)[self.codes[name]]
+
+    def list_at(self, name: str, row: int) -> list[str]:
+        offsets = self.list_offsets[name]
+        values = self.pools[name].values
+        return [values[c] for c in self.list_codes[name][offsets[row]:offsets[row + 1]]]
+
+    def take(self, rows) -> "ActionTable":
+        """Select rows (index array or boolean mask); pools are shared with the source table."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        offsets, list_codes = {}, {}
+        for f in LIST_FIELDS:
+            o = self.list_offsets[f]
+            starts, stops = o[rows], o[rows + 1]
+            lengths = stops - starts
+            offsets[f] = np.concatenate(([0], np.cumsum(lengths)))
+            # Gather each row's slice without a Python loop
+            idx = np.repeat(starts - offsets[f][:-1], lengths) + np.arange(offsets[f][-1])
+            list_codes[f] = self.list_codes[f][idx]
+        return ActionTable(
+            customer=self.customer[rows],
+            numeric={f: a[rows] for f, a in self.numeric.items()},
+            codes={f: a[rows] for f, a in self.codes.items()},
+            list_offsets=offsets,
+            list_codes=list_codes,
+            pools=self.pools,
+            customer_ids=self.customer_ids,
+        )
+
+    def to_actions(self, rows=None) -> list[ActionRecommendation]:
+        """Materialise ActionRecommendation dataclasses (all rows, or the given indices)."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        num = {f: a[rows].tolist() for f, a in self.numeric.items()}
+        cat = {f: self.pools[f].values for f in CATEGORICAL_FIELDS}
+        codes = {f: a[rows].tolist() for f, a in self.codes.items()}
+        out = []
+        for j, i in enumerate(rows.tolist()):
+            out.append(ActionRecommendation(
+                **{f: num[f][j] for f in NUMERIC_FIELDS},
+                **{f: cat[f][codes[f][j]] for f in CATEGORICAL_FIELDS},
+                **{f: self.list_at(f, i) for f in LIST_FIELDS},
+            ))
+        return out
+
+    def to_pandas(self, include_lists: bool = False):
+        """DataFrame view: numeric columns are passed without copying, string columns as Categoricals."""
+        import pandas as pd
+        cols = {"customer": self.customer}
+        cols.update(self.numeric)
+        for f in CATEGORICAL_FIELDS:
+            cols[f] = pd.Categorical.from_codes(self.codes[f], categories=self.pools[f].values)
+        df = pd.DataFrame(cols, copy=False)
+        if include_lists:
+            for f in LIST_FIELDS:
+                df[f] = [self.list_at(f, i) for i in range(len(self))]
+        return df
+
+    def to_arrow(self):
+        """pyarrow Table with dictionary-encoded strings and list<dictionary> rule/assumption columns."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("to_arrow() requires pyarrow (pip install pyarrow)") from e
+        arrays, names = [pa.array(self.customer)], ["customer"]
+        for f, a in self.numeric.items():
+            arrays.append(pa.array(a))
+            names.append(f)
+        for f in CATEGORICAL_FIELDS:
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(self.codes[f]), pa.array(self.pools[f].values, pa.string())))
+            names.append(f)
+        for f in LIST_FIELDS:
+            values = pa.DictionaryArray.from_arrays(pa.array(self.list_codes[f]), pa.array(self.pools[f].values, pa.string()))
+            arrays.append(pa.ListArray.from_arrays(pa.array(self.list_offsets[f].astype(np.int32)), values))
+            names.append(f)
+        return pa.Table.from_arrays(arrays, names=names)
+
+def concat_tables(tables: list[ActionTable]) -> ActionTable:
+    """Concatenate tables, re-coding strings into a shared pool."""
+    pools = default_pools()
+    codes, list_codes = {f: [] for f in CATEGORICAL_FIELDS}, {f: [] for f in LIST_FIELDS}
+    offsets = {f: [np.zeros(1, dtype=np.int64)] for f in LIST_FIELDS}
+    for t in tables:
+        for f in CATEGORICAL_FIELDS:
+            remap = pools[f].codes(t.pools[f].values)
+            codes[f].append(remap[t.codes[f]] if len(remap) else t.codes[f])
+        for f in LIST_FIELDS:
+            remap = pools[f].codes(t.pools[f].values)
+            list_codes[f].append(remap[t.list_codes[f]] if len(remap) else t.list_codes[f])
+            offsets[f].append(t.list_offsets[f][1:] + offsets[f][-1][-1])
+    return ActionTable(
+        customer=np.concatenate([t.customer for t in tables]),
+        numeric={f: np.concatenate([t.numeric[f] for t in tables]) for f in NUMERIC_FIELDS},
+        codes={f: np.concatenate(v) for f, v in codes.items()},
+        list_offsets={f: np.concatenate(v) for f, v in offsets.items()},
+        list_codes={f: np.concatenate(v).astype(np.int32) for f, v in list_codes.items()},
+        pools=pools,
+    )
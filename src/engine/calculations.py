@@ -1,10 +1,14 @@
 import math
 from datetime import date
 from ..schemas import BillRecord, AssetRecord
+from ..postcodes import lookup_postcode
+from ..telemetry import traced
 
+@traced(hot=True)
 def days_in_period(bill: BillRecord) -> int:
     return (bill.end_date - bill.start_date).days or 1
 
+@traced(hot=True)
 def derive_unit_rate(bill: BillRecord) -> float:
     days = days_in_period(bill)
     if bill.unit_rate_p_per_kwh:
@@ -16,9 +20,11 @@ def derive_unit_rate(bill: BillRecord) -> float:
         return 30.0  # Conservative high rate
     return (variable_cost / bill.total_kwh) * 100.0  # pence/kWh
 
+@traced(hot=True)
 def calc_cost_from_unit_rate(kwh: float, unit_rate_p: float, standing_p_per_day: float, days: int) -> float:
     return (kwh * (unit_rate_p / 100.0)) + (standing_p_per_day / 100.0) * days
 
+@traced(hot=True)
 def lighting_retrofit_savings(current_w_per_fixture: float, new_w_per_fixture: float,
                              n_fixtures: int, hours_per_day: float, electricity_price_p_per_kwh: float) -> dict:
     daily_kwh_saved = (current_w_per_fixture - new_w_per_fixture) * n_fixtures * hours_per_day / 1000.0
@@ -29,16 +35,19 @@ def lighting_retrofit_savings(current_w_per_fixture: float, new_w_per_fixture: f
         "annual_savings_gbp": round(annual_savings_gbp, 2)
     }
 
+@traced(hot=True)
 def co2_from_kwh(kwh: float, grid_gco2_per_kwh: float) -> float:
     # gCO2/kWh to tonnes/year
     return (kwh * grid_gco2_per_kwh) / 1_000_000.0
 
+@traced(hot=True)
 def payback_months(capex_gbp: float, annual_savings_gbp: float) -> float:
     if annual_savings_gbp <= 0:
         return float('inf')
     years = capex_gbp / annual_savings_gbp
     return years * 12.0
 
+@traced(hot=True)
 def confidence_score(data_quality_flags: dict) -> float:
     score = 1.0
     for missing in data_quality_flags.values():
@@ -46,12 +55,32 @@ def confidence_score(data_quality_flags: dict) -> float:
             score -= 0.2
     return max(0.0, round(score, 2))
 
-# Placeholder for grid carbon lookup (hardcoded for UK average)
 GRID_CARBON_UK_AVERAGE = 181  # gCO2/kWh
 
+# Approximate annual average intensity per carbon region (gCO2/kWh); Scotland's
+# wind and nuclear mix sits far below the English Midlands and South Wales
+GRID_CARBON_BY_REGION = {
+    "North Scotland": 30.0,
+    "South Scotland": 50.0,
+    "North West England": 120.0,
+    "North East England": 90.0,
+    "Yorkshire": 170.0,
+    "North Wales & Merseyside": 180.0,
+    "South Wales": 230.0,
+    "West Midlands": 210.0,
+    "East Midlands": 200.0,
+    "East England": 150.0,
+    "South West England": 140.0,
+    "South England": 170.0,
+    "London": 185.0,
+    "South East England": 160.0,
+    "Northern Ireland": 300.0,
+}
+
 def get_grid_carbon(postcode: str) -> float:
-    """Return an approximate grid carbon intensity based on region label.
-    Accepts simple region names (UK, EU, India, Other). Defaults to UK average.
+    """Return an approximate grid carbon intensity for a region label or a UK postcode.
+    Accepts simple region names (UK, EU, India, Other) or a postcode / outward code,
+    which is mapped to its carbon-intensity region. Defaults to UK average.
     """
     region = (postcode or "").strip().lower()
     if region == "uk":
@@ -62,5 +91,8 @@ def get_grid_carbon(postcode: str) -> float:
         return 650.0
     if region == "other":
         return 400.0
+    info = lookup_postcode(postcode) if postcode else None
+    if info is not None:
+        return GRID_CARBON_BY_REGION.get(info.carbon_region, GRID_CARBON_UK_AVERAGE)
     # Fallback
     return GRID_CARBON_UK_AVERAGE
\ No newline at end of file
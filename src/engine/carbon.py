@@ -0,0 +1,138 @@
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .calculations import get_grid_carbon
+from ..postcodes import lookup_postcode
+
+# Half-hourly grid carbon intensity series (gCO2/kWh), one .npy file per region and year:
+#   <CARBON_INTENSITY_DIR>/<region>_<year>.npy, element 0 = 1 January 00:00 UTC.
+# Files are memory-mapped and shared by every caller in the process. Meter
+# exports use naive UK local time (BST in summer), so intensity_for() converts
+# them to UTC before looking up slots.
+CARBON_INTENSITY_DIR = os.getenv(
+    "CARBON_INTENSITY_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "carbon_intensity")),
+)
+SLOT_MINUTES = 30
+METER_TIMEZONE = "Europe/London"  # Timezone of naive interval timestamps
+
+@dataclass(frozen=True)
+class IntensitySeries:
+    region: str
+    year: int
+    values: np.ndarray  # memory-mapped gCO2/kWh per half-hour
+
+    @property
+    def start(self) -> np.datetime64:
+        return np.datetime64(f"{self.year}-01-01T00:00", "m")
+
+    def at(self, timestamps: np.ndarray) -> np.ndarray:
+        """O(1) per timestamp: the slot index is arithmetic on the (naive UTC) timestamp."""
+        offset = (timestamps.astype("datetime64[m]") - self.start).astype(np.int64) // SLOT_MINUTES
+        return self.values[np.clip(offset, 0, len(self.values) - 1)]
+
+_SERIES: dict = {}
+_SERIES_LOCK = threading.Lock()
+_MISSING = object()
+
+def _region_key(region: str) -> str:
+    # A UK postcode selects its carbon-intensity region's series
+    info = lookup_postcode(region) if region else None
+    name = info.carbon_region if info is not None else (region or "uk")
+    return name.strip().lower().replace(" & ", "_").replace(" ", "_")
+
+def intensity_path(region: str, year: int, directory: str | None = None) -> str:
+    return os.path.join(directory or CARBON_INTENSITY_DIR, f"{_region_key(region)}_{year}.npy")
+
+def load_intensity(region: str, year: int, directory: str | None = None) -> IntensitySeries | None:
+    """Return the memory-mapped series for a region/year, or None if no file exists.
+    Lookups after the first are a dict hit; missing files are remembered too.
+    """
+    key = (_region_key(region), int(year), directory)
+    series = _SERIES.get(key)
+    if series is None:
+        with _SERIES_LOCK:
+            series = _SERIES.get(key)
+            if series is None:
+                path = intensity_path(region, year, directory)
+                if os.path.exists(path):
+                    series = IntensitySeries(key[0], key[1], np.load(path, mmap_mode="r"))
+                else:
+                    series = _MISSING
+                _SERIES[key] = series
+    return None if series is _MISSING else series
+
+def clear_intensity_cache() -> None:
+    with _SERIES_LOCK:
+        _SERIES.clear()
+
+def to_utc(timestamps: np.ndarray, timezone: str = METER_TIMEZONE) -> np.ndarray:
+    """Naive local datetime64 values -> naive UTC. Repeated autumn hours are inferred from
+    their order where possible (else read as GMT); skipped spring hours shift forward.
+    """
+    local = pd.DatetimeIndex(timestamps)
+    try:
+        aware = local.tz_localize(timezone, ambiguous="infer", nonexistent="shift_forward")
+    except ValueError:
+        aware = local.tz_localize(timezone, ambiguous=False, nonexistent="shift_forward")
+    return aware.tz_convert("UTC").tz_localize(None).to_numpy()
+
+def intensity_for(timestamps: np.ndarray, region: str, directory: str | None = None,
+                  timezone: str = METER_TIMEZONE) -> np.ndarray:
+    """Per-interval gCO2/kWh aligned to `timestamps`, which are naive local time in `timezone`
+    (pass timezone="UTC" for UTC timestamps).
+    Years without a local series fall back to the flat get_grid_carbon() value for the region.
+    """
+    out = np.full(len(timestamps), float(get_grid_carbon(region)), dtype=np.float64)
+    if len(timestamps) == 0:
+        return out
+    if timezone != "UTC":
+        timestamps = to_utc(timestamps, timezone)
+    years = timestamps.astype("datetime64[Y]").astype(np.int64) + 1970
+    for year in np.unique(years):
+        series = load_intensity(region, int(year), directory)
+        if series is not None:
+            mask = years == year
+            out[mask] = series.at(timestamps[mask])
+    return out
+
+def co2_from_profile(timestamps: np.ndarray, kwh: np.ndarray, region: str, directory: str | None = None) -> float:
+    """Tonnes CO₂ for a consumption or savings profile (dot product with the intensity series).
+    `timestamps` are naive UK local time, as in meter exports (see intensity_for).
+    """
+    return float(kwh @ intensity_for(timestamps, region, directory)) / 1_000_000.0
+
+def load_shift_co2_savings(timestamps: np.ndarray, baseline_kwh: np.ndarray, shifted_kwh: np.ndarray,
+                           region: str, directory: str | None = None) -> float:
+    """Tonnes CO₂ saved by reshaping a profile; positive when kWh move into lower-carbon hours."""
+    return co2_from_profile(timestamps, baseline_kwh - shifted_kwh, region, directory)
+
+def write_intensity_file(region: str, year: int, values: np.ndarray, directory: str | None = None) -> str:
+    path = intensity_path(region, year, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, np.asarray(values, dtype=np.float32))
+    with _SERIES_LOCK:
+        _SERIES.pop((_region_key(region), int(year), directory), None)
+    return path
+
+def import_intensity_csv(csv_path: str, region: str, directory: str | None = None) -> list[str]:
+    """Convert a half-hourly CSV (e.g. a Carbon Intensity API export) into per-year .npy files.
+    Expects a timestamp column ("from" or "datetime") and an intensity column
+    ("actual", "forecast" or "intensity"). Gaps are forward-filled.
+    """
+    df = pd.read_csv(csv_path)
+    time_col = next(c for c in ("from", "datetime", "timestamp") if c in df.columns)
+    value_col = next(c for c in ("actual", "intensity", "forecast") if c in df.columns)
+    ts = pd.to_datetime(df[time_col], utc=True).dt.tz_localize(None)
+    series = pd.Series(pd.to_numeric(df[value_col], errors="coerce").to_numpy(), index=ts).sort_index()
+    series = series[~series.index.duplicated()]
+    paths = []
+    for year in sorted(series.index.year.unique()):
+        slots = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq=f"{SLOT_MINUTES}min", inclusive="left")
+        values = series.reindex(slots).ffill().bfill().fillna(get_grid_carbon(region))
+        paths.append(write_intensity_file(region, int(year), values.to_numpy(), directory))
+    return paths
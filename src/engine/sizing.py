@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..schemas import IntervalData, ActionRecommendation
+from .calculations import payback_months
+from .tariff import Tariff, SAMPLE_GRID_TOU, SAMPLE_RENEWABLE, interval_rates
+
+# Candidates are evaluated in blocks so the (candidates x intervals) matrix stays small
+CANDIDATE_BLOCK = 128
+
+SOLAR_CAPEX_GBP_PER_KWP = 1000.0  # Typical UK commercial rooftop install
+
+@dataclass
+class SizingResult:
+    wind_mw: float
+    solar_mwp: float
+    matched_kwh: float  # Generation used in the same interval
+    excess_kwh: float  # Generation above consumption (spilled/exported)
+    grid_import_kwh: float
+    generation_kwh: float
+    grid_cost_gbp: float  # TOU cost of remaining grid import
+    renewable_cost_gbp: float  # Renewable tariff paid on all generation
+    total_cost_gbp: float
+    baseline_grid_cost_gbp: float  # Grid cost with no renewables
+    consumption_kwh: float
+
+    @property
+    def matching_fraction(self) -> float:
+        return self.matched_kwh / self.consumption_kwh if self.consumption_kwh > 0 else 0.0
+
+def evaluate_mix(data: IntervalData, wind_mw: np.ndarray, solar_mwp: np.ndarray,
+                 grid_tariff: Tariff = SAMPLE_GRID_TOU,
+                 renewable_tariff: Tariff = SAMPLE_RENEWABLE) -> dict:
+    """Evaluate many (wind MW, solar MWp) pairs against the interval profile at once.
+    `wind_mw` and `solar_mwp` are 1-D arrays of equal length K; returns a dict of (K,) arrays:
+    matched_kwh, excess_kwh, grid_import_kwh, generation_kwh, grid_cost_gbp, renewable_cost_gbp, total_cost_gbp.
+    """
+    wind_mw = np.asarray(wind_mw, dtype=np.float64)
+    solar_mwp = np.asarray(solar_mwp, dtype=np.float64)
+    load = data.consumption_kwh
+    grid_rate = interval_rates(data.timestamps, grid_tariff)
+    renewable_rate = interval_rates(data.timestamps, renewable_tariff)
+
+    # Generation is linear in capacity, so its totals need no per-interval work
+    wind_total = data.wind_kwh_per_mw.sum()
+    solar_total = data.solar_kwh_per_mwp.sum()
+    wind_rate_total = data.wind_kwh_per_mw @ renewable_rate
+    solar_rate_total = data.solar_kwh_per_mwp @ renewable_rate
+    generation = wind_mw * wind_total + solar_mwp * solar_total
+
+    matched = np.empty(len(wind_mw))
+    matched_cost = np.empty(len(wind_mw))
+    for start in range(0, len(wind_mw), CANDIDATE_BLOCK):
+        stop = start + CANDIDATE_BLOCK
+        gen = np.outer(wind_mw[start:stop], data.wind_kwh_per_mw)
+        gen += np.outer(solar_mwp[start:stop], data.solar_kwh_per_mwp)
+        np.minimum(gen, load, out=gen)
+        matched[start:stop] = gen.sum(axis=1)
+        matched_cost[start:stop] = gen @ grid_rate
+
+    baseline = float(load @ grid_rate)
+    grid_cost = baseline - matched_cost
+    renewable_cost = wind_mw * wind_rate_total + solar_mwp * solar_rate_total
+    return {
+        "matched_kwh": matched,
+        "excess_kwh": generation - matched,
+        "grid_import_kwh": load.sum() - matched,
+        "generation_kwh": generation,
+        "grid_cost_gbp": grid_cost,
+        "renewable_cost_gbp": renewable_cost,
+        "total_cost_gbp": grid_cost + renewable_cost,
+    }
+
+def _objective(metrics: dict, objective: str, excess_weight: float) -> np.ndarray:
+    if objective == "cost":
+        return metrics["total_cost_gbp"]
+    if objective == "matching":
+        # Maximise matched energy while penalising spilled generation
+        return excess_weight * metrics["excess_kwh"] - metrics["matched_kwh"]
+    raise ValueError(f"Unknown sizing objective '{objective}'")
+
+def _capacity_bound(load: np.ndarray, per_unit: np.ndarray) -> float:
+    # Enough capacity to cover annual consumption twice over on energy alone
+    total = per_unit.sum()
+    return 0.0 if total <= 0 else 2.0 * load.sum() / total
+
+def optimise_renewable_mix(data: IntervalData, objective: str = "cost", excess_weight: float = 1.0,
+                           max_wind_mw: float | None = None, max_solar_mwp: float | None = None,
+                           grid_points: int = 17, refine_steps: int = 5,
+                           grid_tariff: Tariff = SAMPLE_GRID_TOU,
+                           renewable_tariff: Tariff = SAMPLE_RENEWABLE) -> SizingResult:
+    """Find the wind/solar capacities that best serve the consumption profile.
+    objective="cost" minimises grid TOU cost plus renewable tariff cost; objective="matching"
+    maximises real-time matched kWh minus `excess_weight` x spilled kWh. A coarse grid is
+    evaluated in one broadcast pass, then refined around the best cell `refine_steps` times.
+    Pass max_wind_mw=0 to size solar only.
+    """
+    if max_wind_mw is None:
+        max_wind_mw = _capacity_bound(data.consumption_kwh, data.wind_kwh_per_mw)
+    if max_solar_mwp is None:
+        max_solar_mwp = _capacity_bound(data.consumption_kwh, data.solar_kwh_per_mwp)
+
+    lo = np.array([0.0, 0.0])
+    hi = np.array([max_wind_mw, max_solar_mwp])
+    best = lo.copy()
+    for _ in range(refine_steps + 1):
+        wind_axis = np.linspace(lo[0], hi[0], grid_points) if hi[0] > lo[0] else lo[:1]
+        solar_axis = np.linspace(lo[1], hi[1], grid_points) if hi[1] > lo[1] else lo[1:]
+        wind, solar = (a.ravel() for a in np.meshgrid(wind_axis, solar_axis, indexing="ij"))
+        scores = _objective(evaluate_mix(data, wind, solar, grid_tariff, renewable_tariff), objective, excess_weight)
+        i = int(np.argmin(scores))
+        best = np.array([wind[i], solar[i]])
+        # Zoom to the neighbouring grid cells, clipped to the original bounds
+        step = (hi - lo) / max(grid_points - 1, 1)
+        lo = np.maximum(best - step, 0.0)
+        hi = np.minimum(best + step, [max_wind_mw, max_solar_mwp])
+
+    m = evaluate_mix(data, best[:1], best[1:], grid_tariff, renewable_tariff)
+    baseline = float(data.consumption_kwh @ interval_rates(data.timestamps, grid_tariff))
+    return SizingResult(
+        wind_mw=float(best[0]),
+        solar_mwp=float(best[1]),
+        matched_kwh=float(m["matched_kwh"][0]),
+        excess_kwh=float(m["excess_kwh"][0]),
+        grid_import_kwh=float(m["grid_import_kwh"][0]),
+        generation_kwh=float(m["generation_kwh"][0]),
+        grid_cost_gbp=float(m["grid_cost_gbp"][0]),
+        renewable_cost_gbp=float(m["renewable_cost_gbp"][0]),
+        total_cost_gbp=float(m["total_cost_gbp"][0]),
+        baseline_grid_cost_gbp=baseline,
+        consumption_kwh=float(data.consumption_kwh.sum()),
+    )
+
+def size_solar(data: IntervalData, grid_tariff: Tariff = SAMPLE_GRID_TOU) -> SizingResult:
+    """Solar-only sizing used by solar_installation_action(); independent of carbon intensity."""
+    owned = Tariff(name="Owned solar", default_rate_gbp_per_kwh=0.0, standing_charge_gbp_per_day=0.0)
+    return optimise_renewable_mix(data, objective="matching", max_wind_mw=0.0,
+                                  grid_tariff=grid_tariff, renewable_tariff=owned)
+
+def solar_installation_action(data: IntervalData, grid_gco2_per_kwh: float | np.ndarray,
+                              capex_gbp_per_kwp: float = SOLAR_CAPEX_GBP_PER_KWP,
+                              savings_multiplier: float = 1.0,
+                              grid_tariff: Tariff = SAMPLE_GRID_TOU,
+                              rule_ids: list[str] | None = None,
+                              sizing: SizingResult | None = None) -> ActionRecommendation:
+    """Size behind-the-meter solar on the interval profile and express it as an action.
+    Owned panels have no per-kWh tariff, so sizing uses the matching objective with the
+    renewable cost set to zero; savings are the grid TOU cost avoided by self-consumption.
+    `grid_gco2_per_kwh` is a constant or a per-interval series (see carbon.intensity_for).
+    Pass `sizing` from size_solar() to skip the optimisation (e.g. when only the region changed).
+    """
+    result = sizing if sizing is not None else size_solar(data, grid_tariff)
+    kwp = result.solar_mwp * 1000.0
+    capex = round(kwp * capex_gbp_per_kwp, 2)
+    annual_savings = (result.baseline_grid_cost_gbp - result.grid_cost_gbp) * savings_multiplier
+    # Scale partial-year data to a full year
+    years = max(len(data) * data.interval_hours / 8760.0, 1e-9)
+    annual_savings /= years
+    matched = np.minimum(data.solar_kwh_per_mwp * result.solar_mwp, data.consumption_kwh)
+    co2_per_year = float(matched @ np.broadcast_to(grid_gco2_per_kwh, matched.shape)) / 1_000_000.0 / years
+    return ActionRecommendation(
+        title="Solar Panel Installation",
+        category="capex",
+        capex_gbp=capex,
+        annual_savings_gbp=round(annual_savings, 2),
+        payback_months=payback_months(capex, annual_savings),
+        co2_savings_tonnes_per_year=co2_per_year,
+        short_term_impact="Installation period",
+        long_term_impact="Long-term clean energy",
+        operational_disruption="Medium",
+        confidence=0.8,
+        assumptions_list=[
+            f"{kwp:.0f} kWp sized on interval data ({result.matching_fraction:.0%} of demand matched in real time)",
+            f"{result.excess_kwh / years:,.0f} kWh/yr excess generation not credited",
+            f"Capex £{capex_gbp_per_kwp:,.0f}/kWp",
+        ],
+        rule_ids_applied=rule_ids or [],
+    )
@@ -0,0 +1,236 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..schemas import IntervalData, ActionRecommendation
+from .calculations import payback_months
+from .tariff import Tariff, SAMPLE_GRID_TOU, interval_rates
+
+BATTERY_CAPEX_GBP_PER_KWH = 350.0
+BATTERY_CAPEX_GBP_PER_KW = 150.0
+BATTERY_LIFETIME_YEARS = 10
+DEFAULT_ROUND_TRIP_EFFICIENCY = 0.90
+DEFAULT_C_RATES = (0.25, 0.5, 1.0)
+
+# Sweep results per site, keyed on a digest of the profile, tariff and sizes
+_SWEEP_CACHE: OrderedDict = OrderedDict()
+_SWEEP_CACHE_SIZE = 64
+_SWEEP_LOCK = threading.Lock()  # Sessions (Streamlit threads, service workers) share the cache
+
+def simulate_dispatch(load_kwh: np.ndarray, generation_kwh: np.ndarray, rates_gbp: np.ndarray,
+                      energy_kwh: np.ndarray, power_kw: np.ndarray, interval_hours: float,
+                      round_trip_efficiency: float = DEFAULT_ROUND_TRIP_EFFICIENCY,
+                      grid_charge: bool = True, carbon_gco2_per_kwh: np.ndarray | None = None,
+                      return_flows: bool = False) -> dict:
+    """Simulate a rule-based battery for K sizes at once over T intervals.
+    Charges from excess generation first, otherwise from the grid in the cheapest TOU band,
+    and discharges to cover grid import in the most expensive band. State of charge is a
+    (K,) vector, so the sequential loop runs once per interval regardless of K, and only
+    over intervals where the battery can act.
+    Returns (K,) arrays: discharged_kwh, excess_charged_kwh, grid_charged_kwh,
+    grid_import_kwh, grid_cost_gbp, savings_gbp, co2_saved_g (zeros unless a per-interval
+    carbon intensity series is given). With return_flows=True also returns grid_flow_kwh, a
+    (T, K) array of grid import avoided per interval (negative while charging from the grid),
+    so CO₂ for any intensity series is grid_flow_kwh.T @ intensity; keep K small.
+    """
+    energy_kwh = np.asarray(energy_kwh, dtype=np.float64)
+    power_kw = np.asarray(power_kw, dtype=np.float64)
+    eta = np.sqrt(round_trip_efficiency)  # Split losses evenly between charge and discharge
+    step_kwh = power_kw * interval_hours
+
+    net = load_kwh - generation_kwh
+    deficit = np.maximum(net, 0.0)
+    excess = np.maximum(-net, 0.0)
+    cheap = rates_gbp <= rates_gbp.min()
+    peak = rates_gbp >= rates_gbp.max()
+    if cheap.all():
+        # Flat tariff: nothing to arbitrage, only excess generation is worth storing
+        cheap = np.zeros_like(cheap)
+        peak = deficit > 0
+
+    k = len(energy_kwh)
+    soc = np.zeros(k)
+    discharged = np.zeros(k)
+    excess_charged = np.zeros(k)
+    grid_charged = np.zeros(k)
+    discharge_value = np.zeros(k)
+    grid_charge_cost = np.zeros(k)
+    co2_saved = np.zeros(k)
+    carbon = carbon_gco2_per_kwh if carbon_gco2_per_kwh is not None else np.zeros_like(rates_gbp)
+    headroom = np.empty(k)
+    flow = np.empty(k)
+    flows = np.zeros((len(rates_gbp), k)) if return_flows else None
+
+    active = np.flatnonzero((excess > 0) | (grid_charge & cheap) | (peak & (deficit > 0)))
+    for t in active:
+        if excess[t] > 0:
+            np.subtract(energy_kwh, soc, out=headroom)
+            np.minimum(step_kwh, headroom / eta, out=flow)
+            np.minimum(flow, excess[t], out=flow)
+            soc += flow * eta
+            excess_charged += flow
+        elif peak[t]:
+            np.minimum(step_kwh, soc * eta, out=flow)
+            np.minimum(flow, deficit[t], out=flow)
+            soc -= flow / eta
+            discharged += flow
+            discharge_value += flow * rates_gbp[t]
+            co2_saved += flow * carbon[t]
+            if flows is not None:
+                flows[t] = flow
+        elif cheap[t]:
+            np.subtract(energy_kwh, soc, out=headroom)
+            np.minimum(step_kwh, headroom / eta, out=flow)
+            soc += flow * eta
+            grid_charged += flow
+            grid_charge_cost += flow * rates_gbp[t]
+            co2_saved -= flow * carbon[t]
+            if flows is not None:
+                flows[t] = -flow
+
+    baseline_cost = float(deficit @ rates_gbp)
+    savings = discharge_value - grid_charge_cost
+    result = {
+        "discharged_kwh": discharged,
+        "excess_charged_kwh": excess_charged,
+        "grid_charged_kwh": grid_charged,
+        "grid_import_kwh": deficit.sum() - discharged + grid_charged,
+        "grid_cost_gbp": baseline_cost - savings,
+        "savings_gbp": savings,
+        "co2_saved_g": co2_saved,
+    }
+    if flows is not None:
+        result["grid_flow_kwh"] = flows
+    return result
+
+def _sweep_key(*parts) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(np.ascontiguousarray(p).tobytes() if isinstance(p, np.ndarray) else repr(p).encode())
+    return h.hexdigest()
+
+def default_battery_sizes(data: IntervalData, tariff: Tariff = SAMPLE_GRID_TOU, n_energy: int = 40,
+                          c_rates: tuple = DEFAULT_C_RATES) -> tuple[np.ndarray, np.ndarray]:
+    """Energy/power grid scaled to the site's average daily peak-band consumption."""
+    rates = interval_rates(data.timestamps, tariff)
+    days = max(len(data) * data.interval_hours / 24.0, 1.0)
+    daily_peak_kwh = float(data.consumption_kwh[rates >= rates.max()].sum()) / days
+    energies = np.linspace(0.05, 1.5, n_energy) * max(daily_peak_kwh, 1.0)
+    e, c = np.meshgrid(energies, np.asarray(c_rates, dtype=np.float64), indexing="ij")
+    return e.ravel(), (e * c).ravel()
+
+def sweep_battery_sizes(data: IntervalData, energy_kwh: np.ndarray, power_kw: np.ndarray,
+                        tariff: Tariff = SAMPLE_GRID_TOU, generation_kwh: np.ndarray | None = None,
+                        round_trip_efficiency: float = DEFAULT_ROUND_TRIP_EFFICIENCY,
+                        grid_charge: bool = True, carbon_gco2_per_kwh: np.ndarray | None = None) -> dict:
+    """Simulate every (energy, power) size for one site, caching the result per site.
+    Adds annualised "annual_savings_gbp", "annual_import_reduction_kwh" and
+    "annual_co2_saved_tonnes" to the simulate_dispatch() output.
+    """
+    if generation_kwh is None:
+        generation_kwh = np.zeros_like(data.consumption_kwh)
+    energy_kwh = np.asarray(energy_kwh, dtype=np.float64)
+    power_kw = np.asarray(power_kw, dtype=np.float64)
+    rates = interval_rates(data.timestamps, tariff)
+    key = _sweep_key(data.consumption_kwh, generation_kwh, rates, energy_kwh, power_kw,
+                     round_trip_efficiency, grid_charge, data.interval_hours,
+                     carbon_gco2_per_kwh if carbon_gco2_per_kwh is not None else 0)
+    with _SWEEP_LOCK:
+        cached = _SWEEP_CACHE.get(key)
+        if cached is not None:
+            _SWEEP_CACHE.move_to_end(key)
+            return cached
+
+    result = simulate_dispatch(data.consumption_kwh, generation_kwh, rates, energy_kwh, power_kw,
+                               data.interval_hours, round_trip_efficiency, grid_charge, carbon_gco2_per_kwh)
+    years = max(len(data) * data.interval_hours / 8760.0, 1e-9)
+    deficit_kwh = np.maximum(data.consumption_kwh - generation_kwh, 0.0).sum()
+    result["annual_savings_gbp"] = result["savings_gbp"] / years
+    result["annual_import_reduction_kwh"] = (deficit_kwh - result["grid_import_kwh"]) / years
+    result["annual_co2_saved_tonnes"] = result["co2_saved_g"] / 1_000_000.0 / years
+    result["energy_kwh"] = energy_kwh
+    result["power_kw"] = power_kw
+    # Simulated outside the lock; two threads on the same site may both compute it, the last write wins
+    with _SWEEP_LOCK:
+        _SWEEP_CACHE[key] = result
+        _SWEEP_CACHE.move_to_end(key)
+        if len(_SWEEP_CACHE) > _SWEEP_CACHE_SIZE:
+            _SWEEP_CACHE.popitem(last=False)
+    return result
+
+def battery_capex(energy_kwh, power_kw):
+    return energy_kwh * BATTERY_CAPEX_GBP_PER_KWH + power_kw * BATTERY_CAPEX_GBP_PER_KW
+
+@dataclass(slots=True)
+class BatterySizing:
+    energy_kwh: float
+    power_kw: float
+    capex_gbp: float
+    annual_savings_gbp: float
+    grid_flow_kwh: np.ndarray  # Per-interval grid import avoided by the chosen size
+    years: float  # Span of the interval data
+
+    def annual_co2_saved_tonnes(self, grid_gco2_per_kwh: float | np.ndarray) -> float:
+        intensity = np.broadcast_to(np.asarray(grid_gco2_per_kwh, dtype=np.float64), self.grid_flow_kwh.shape)
+        return float(self.grid_flow_kwh @ intensity) / 1_000_000.0 / self.years
+
+def size_battery(data: IntervalData, tariff: Tariff = SAMPLE_GRID_TOU, generation_kwh: np.ndarray | None = None,
+                 round_trip_efficiency: float = DEFAULT_ROUND_TRIP_EFFICIENCY) -> BatterySizing:
+    """Pick the battery size with the best annualised net benefit. The choice does not depend
+    on carbon intensity, so the result can be re-costed for any region without re-sizing.
+    """
+    if generation_kwh is None:
+        generation_kwh = np.zeros_like(data.consumption_kwh)
+    energy, power = default_battery_sizes(data, tariff)
+    sweep = sweep_battery_sizes(data, energy, power, tariff, generation_kwh, round_trip_efficiency)
+    capex = battery_capex(sweep["energy_kwh"], sweep["power_kw"])
+    i = int(np.argmax(sweep["annual_savings_gbp"] - capex / BATTERY_LIFETIME_YEARS))
+    # Re-run the chosen size alone to keep its per-interval grid flows
+    chosen = simulate_dispatch(data.consumption_kwh, generation_kwh, interval_rates(data.timestamps, tariff),
+                               energy[i:i + 1], power[i:i + 1], data.interval_hours, round_trip_efficiency,
+                               return_flows=True)
+    return BatterySizing(
+        energy_kwh=float(energy[i]),
+        power_kw=float(power[i]),
+        capex_gbp=float(capex[i]),
+        annual_savings_gbp=float(sweep["annual_savings_gbp"][i]),
+        grid_flow_kwh=chosen["grid_flow_kwh"][:, 0],
+        years=max(len(data) * data.interval_hours / 8760.0, 1e-9),
+    )
+
+def battery_storage_action(data: IntervalData, grid_gco2_per_kwh: float | np.ndarray,
+                           tariff: Tariff = SAMPLE_GRID_TOU, generation_kwh: np.ndarray | None = None,
+                           round_trip_efficiency: float = DEFAULT_ROUND_TRIP_EFFICIENCY,
+                           rule_ids: list[str] | None = None,
+                           sizing: BatterySizing | None = None) -> ActionRecommendation:
+    """Express the best battery size (see size_battery) as an action.
+    `grid_gco2_per_kwh` is a constant or a per-interval series (see carbon.intensity_for); with a
+    series, CO₂ is credited for imports moved into lower-carbon hours, otherwise only for the net
+    reduction in grid import, so pure arbitrage on a flat intensity scores negative carbon.
+    Pass a precomputed `sizing` to re-cost the same battery for another region.
+    """
+    if sizing is None:
+        sizing = size_battery(data, tariff, generation_kwh, round_trip_efficiency)
+    kwh, kw = sizing.energy_kwh, sizing.power_kw
+    annual_savings = sizing.annual_savings_gbp
+    return ActionRecommendation(
+        title="Battery Storage",
+        category="capex",
+        capex_gbp=round(sizing.capex_gbp, 2),
+        annual_savings_gbp=round(annual_savings, 2),
+        payback_months=payback_months(sizing.capex_gbp, annual_savings),
+        co2_savings_tonnes_per_year=sizing.annual_co2_saved_tonnes(grid_gco2_per_kwh),
+        short_term_impact="Peak-rate imports shifted to cheap or self-generated energy",
+        long_term_impact=f"Ongoing TOU arbitrage over a {BATTERY_LIFETIME_YEARS}-year battery life",
+        operational_disruption="Low",
+        confidence=0.75,
+        assumptions_list=[
+            f"{kwh:.0f} kWh / {kw:.0f} kW battery, {round_trip_efficiency:.0%} round-trip efficiency",
+            "Charges from excess renewables or the cheapest TOU band, discharges at peak",
+            f"Capex £{BATTERY_CAPEX_GBP_PER_KWH:,.0f}/kWh + £{BATTERY_CAPEX_GBP_PER_KW:,.0f}/kW",
+        ],
+        rule_ids_applied=rule_ids or [],
+    )
@@ -0,0 +1,139 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ..schemas import BillRecord, IntervalData
+
+# Tariffs are compiled into a (day type x hour of day) rate lookup so interval
+# data can be priced with a bincount and a matrix product instead of per-row calls.
+DAY_TYPES = ("weekday", "weekend")
+HOURS_PER_DAY = 24
+N_SLOTS = len(DAY_TYPES) * HOURS_PER_DAY
+
+DEFAULT_STANDING_CHARGE_GBP_PER_DAY = 0.30
+
+@dataclass
+class TariffBand:
+    start_hour: int  # inclusive, 0-23
+    end_hour: int  # exclusive, 1-24
+    rate_gbp_per_kwh: float
+    day_types: tuple[str, ...] = DAY_TYPES
+
+@dataclass
+class Tariff:
+    name: str
+    bands: list[TariffBand] = field(default_factory=list)
+    default_rate_gbp_per_kwh: float = 0.0  # Hours not covered by a band
+    standing_charge_gbp_per_day: float = DEFAULT_STANDING_CHARGE_GBP_PER_DAY
+
+# From the header of "Sample Energy Data.csv"
+SAMPLE_GRID_TOU = Tariff(
+    name="Grid TOU",
+    bands=[
+        TariffBand(7, 10, 0.30),
+        TariffBand(10, 17, 0.20),
+        TariffBand(17, 22, 0.30),
+    ],
+    default_rate_gbp_per_kwh=0.00,
+)
+
+SAMPLE_RENEWABLE = Tariff(
+    name="Renewable Energy Tariff",
+    default_rate_gbp_per_kwh=0.15,
+    standing_charge_gbp_per_day=0.0,
+)
+
+def compile_tariff(tariff: Tariff) -> np.ndarray:
+    """Return a flat (len(DAY_TYPES) * 24,) GBP/kWh lookup indexed by slot_index()."""
+    rates = np.full((len(DAY_TYPES), HOURS_PER_DAY), tariff.default_rate_gbp_per_kwh, dtype=np.float64)
+    for band in tariff.bands:
+        if not 0 <= band.start_hour < band.end_hour <= HOURS_PER_DAY:
+            raise ValueError(f"Invalid band hours {band.start_hour}-{band.end_hour} in tariff '{tariff.name}'")
+        for day_type in band.day_types:
+            rates[DAY_TYPES.index(day_type), band.start_hour:band.end_hour] = band.rate_gbp_per_kwh
+    return rates.reshape(-1)
+
+def compile_tariffs(tariffs: list[Tariff]) -> np.ndarray:
+    """Stack compiled tariffs into an (N, N_SLOTS) rate matrix."""
+    return np.vstack([compile_tariff(t) for t in tariffs])
+
+def slot_index(timestamps: np.ndarray) -> np.ndarray:
+    """Map datetime64 timestamps to day_type * 24 + hour_of_day."""
+    minutes = timestamps.astype("datetime64[m]").astype(np.int64)
+    days = minutes // (24 * 60)
+    hour = (minutes // 60) % HOURS_PER_DAY
+    weekend = ((days + 3) % 7) >= 5  # 1970-01-01 was a Thursday
+    return weekend.astype(np.int64) * HOURS_PER_DAY + hour
+
+def slot_consumption(timestamps: np.ndarray, kwh: np.ndarray) -> np.ndarray:
+    """Sum consumption into rate slots.
+    `kwh` may be 1-D (T,) or 2-D (sites, T) sharing the same timestamps; returns (N_SLOTS,) or (sites, N_SLOTS).
+    """
+    slots = slot_index(timestamps)
+    if kwh.ndim == 1:
+        return np.bincount(slots, weights=kwh, minlength=N_SLOTS)
+    order = np.argsort(slots, kind="stable")
+    counts = np.bincount(slots, minlength=N_SLOTS)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    out = np.zeros((kwh.shape[0], N_SLOTS), dtype=np.float64)
+    if present.any():
+        out[:, present] = np.add.reduceat(kwh[:, order], starts[present], axis=1)
+    return out
+
+def billing_days(timestamps: np.ndarray) -> int:
+    if len(timestamps) == 0:
+        return 0
+    days = timestamps.astype("datetime64[D]")
+    return int((days.max() - days.min()).astype(np.int64)) + 1
+
+def price_tariffs(timestamps: np.ndarray, kwh: np.ndarray, tariffs: list[Tariff]) -> dict:
+    """Cost consumption against every tariff in one matrix product.
+    Returns arrays with a trailing tariff axis: keys "energy_cost_gbp", "standing_cost_gbp", "total_cost_gbp".
+    """
+    rates = compile_tariffs(tariffs)
+    energy = slot_consumption(timestamps, kwh) @ rates.T
+    standing = np.array([t.standing_charge_gbp_per_day for t in tariffs]) * billing_days(timestamps)
+    return {
+        "energy_cost_gbp": energy,
+        "standing_cost_gbp": np.broadcast_to(standing, energy.shape),
+        "total_cost_gbp": energy + standing,
+    }
+
+def interval_rates(timestamps: np.ndarray, tariff: Tariff) -> np.ndarray:
+    """Per-interval GBP/kWh for a single tariff."""
+    return compile_tariff(tariff)[slot_index(timestamps)]
+
+def tariff_switch_savings(total_cost_gbp: np.ndarray, current_index: int = 0) -> dict:
+    """Savings from switching away from the current tariff (positive = cheaper).
+    Works on the output of price_tariffs for one site (N,) or a portfolio (sites, N).
+    """
+    current = total_cost_gbp[..., current_index:current_index + 1]
+    savings = current - total_cost_gbp
+    best = np.argmax(savings, axis=-1)
+    return {
+        "savings_gbp": savings,
+        "best_index": best,
+        "best_savings_gbp": np.take_along_axis(savings, best[..., None], axis=-1)[..., 0],
+    }
+
+def bill_from_intervals(data: IntervalData, tariff: Tariff = SAMPLE_GRID_TOU) -> BillRecord:
+    """Build a BillRecord from interval data priced on a TOU tariff.
+    The unit rate is the consumption-weighted rate actually paid, so derive_unit_rate()
+    uses it directly instead of backing out an average from the bill total.
+    """
+    if len(data) == 0:
+        raise ValueError("Interval data has no rows")
+    priced = price_tariffs(data.timestamps, data.consumption_kwh, [tariff])
+    total_kwh = float(data.consumption_kwh.sum())
+    energy_cost = float(priced["energy_cost_gbp"][0])
+    unit_rate_p = (energy_cost / total_kwh) * 100.0 if total_kwh > 0 else None
+    days = data.timestamps.astype("datetime64[D]")
+    return BillRecord(
+        total_kwh=total_kwh,
+        total_cost_gbp=float(priced["total_cost_gbp"][0]),
+        standing_charge_per_day=tariff.standing_charge_gbp_per_day,
+        start_date=days.min().item(),
+        end_date=days.max().item(),
+        unit_rate_p_per_kwh=unit_rate_p,
+    )
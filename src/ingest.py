@@ -1,17 +1,38 @@
 # Placeholder for data ingestion
 # In real impl, add CSV/PDF parsers
 
+import io
+import os
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
-from .schemas import BillRecord, AssetRecord, CustomerProfile
+from .schemas import BillRecord, AssetRecord, CustomerProfile, IntervalData
+from .engine.tariff import SAMPLE_GRID_TOU, Tariff
+from .ingest_cache import IngestCache, content_hash, get_ingest_cache
+from .telemetry import count, span, traced
+
+# Column headers used by 15-minute meter exports (see "Sample Energy Data.csv")
+TIME_COLUMN = "Time slot"
+CONSUMPTION_COLUMN = "Consumption (kWh)"
+WIND_COLUMN = "Wind Generation (kWh per MW)"
+SOLAR_COLUMN = "Solar Generation (kWh per MWp)"
+INTERVAL_COLUMNS = (TIME_COLUMN, CONSUMPTION_COLUMN, WIND_COLUMN, SOLAR_COLUMN)
 
-def parse_csv_bill(file_path: str) -> BillRecord:
-    # Stub: assume CSV with columns
+DEFAULT_TIMESTAMP_FORMAT = "%m/%d/%Y %H:%M"
+DEFAULT_CHUNKSIZE = 100_000
+XLSX_SUFFIXES = (".xlsx", ".xlsm")
+ZIP_MAGIC = b"PK\x03\x04"  # XLSX workbooks are zip archives
+
+@traced()
+def parse_csv_bill(file_path: str, tariff: Tariff = SAMPLE_GRID_TOU) -> BillRecord:
+    # Stub: assume CSV with columns; bill lines carry no standing charge, so it comes from the tariff
     df = pd.read_csv(file_path)
     # Extract fields...
     return BillRecord(
         total_kwh=df['kwh'].sum(),
         total_cost_gbp=df['cost'].sum(),
-        standing_charge_per_day=0.3,  # Stub
+        standing_charge_per_day=tariff.standing_charge_gbp_per_day,
         start_date=pd.to_datetime(df['date'].min()).date(),
         end_date=pd.to_datetime(df['date'].max()).date()
     )
@@ -29,4 +50,166 @@ def parse_asset_csv(file_path: str) -> list[AssetRecord]:
     ) for _, row in df.iterrows()]
 
 def parse_customer_profile(data: dict) -> CustomerProfile:
-    return CustomerProfile(**data)
\ No newline at end of file
+    return CustomerProfile(**data)
+
+def _parse_timestamps(values: pd.Series, timestamp_format: str | None) -> np.ndarray:
+    if timestamp_format:
+        try:
+            parsed = pd.to_datetime(values, format=timestamp_format)
+        except (ValueError, TypeError):
+            parsed = pd.to_datetime(values, format="ISO8601")
+    else:
+        parsed = pd.to_datetime(values)
+    return parsed.to_numpy(dtype="datetime64[s]")
+
+
+def _column_or_zeros(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column in df.columns:
+        return pd.to_numeric(df[column], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+    return np.zeros(len(df), dtype=np.float64)
+
+
+def interval_data_from_frame(df: pd.DataFrame, timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT) -> IntervalData:
+    """Convert a `Time slot / Consumption (kWh)` frame into typed arrays.
+    Wind and solar columns are optional and default to zeros. Side columns
+    (tariff notes etc.) are ignored.
+    """
+    if TIME_COLUMN not in df.columns or CONSUMPTION_COLUMN not in df.columns:
+        raise ValueError(f"Interval data needs '{TIME_COLUMN}' and '{CONSUMPTION_COLUMN}' columns")
+    df = df.dropna(subset=[TIME_COLUMN])
+    return IntervalData(
+        timestamps=_parse_timestamps(df[TIME_COLUMN], timestamp_format),
+        consumption_kwh=_column_or_zeros(df, CONSUMPTION_COLUMN),
+        wind_kwh_per_mw=_column_or_zeros(df, WIND_COLUMN),
+        solar_kwh_per_mwp=_column_or_zeros(df, SOLAR_COLUMN),
+    )
+
+
+def iter_interval_chunks(file_path, chunksize: int = DEFAULT_CHUNKSIZE,
+                         timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT) -> Iterator[IntervalData]:
+    """Stream an interval CSV as IntervalData chunks of at most `chunksize` rows.
+    Only the four interval columns are read, so memory stays bounded by the chunk size.
+    """
+    reader = pd.read_csv(
+        file_path,
+        usecols=lambda c: c in INTERVAL_COLUMNS,
+        dtype={CONSUMPTION_COLUMN: np.float64, WIND_COLUMN: np.float64, SOLAR_COLUMN: np.float64},
+        encoding="utf-8-sig",
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            yield interval_data_from_frame(chunk, timestamp_format)
+
+
+def concat_interval_data(parts: list[IntervalData]) -> IntervalData:
+    if not parts:
+        empty = np.empty(0, dtype=np.float64)
+        return IntervalData(np.empty(0, dtype="datetime64[s]"), empty, empty.copy(), empty.copy())
+    if len(parts) == 1:
+        return parts[0]
+    return IntervalData(
+        timestamps=np.concatenate([p.timestamps for p in parts]),
+        consumption_kwh=np.concatenate([p.consumption_kwh for p in parts]),
+        wind_kwh_per_mw=np.concatenate([p.wind_kwh_per_mw for p in parts]),
+        solar_kwh_per_mwp=np.concatenate([p.solar_kwh_per_mwp for p in parts]),
+    )
+
+
+@traced()
+def parse_interval_csv(file_path, chunksize: int = DEFAULT_CHUNKSIZE,
+                       timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT) -> IntervalData:
+    """Parse a 15-minute/half-hourly meter file into typed NumPy arrays.
+    Accepts a path or file-like object. Timestamps are datetime64[s]; consumption,
+    wind (kWh per MW) and solar (kWh per MWp) are float64.
+    """
+    return concat_interval_data(list(iter_interval_chunks(file_path, chunksize, timestamp_format)))
+
+
+def is_xlsx(source) -> bool:
+    """True for an .xlsx path or for workbook bytes (sniffed, so uploads need no file name)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:4]) == ZIP_MAGIC
+    return os.fspath(source).lower().endswith(XLSX_SUFFIXES)
+
+
+def _xlsx_interval_sheet(workbook):
+    """First sheet whose header row has the time and consumption columns, with the column positions."""
+    for sheet in workbook.worksheets:
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        names = [str(v).strip() if v is not None else None for v in header]
+        if TIME_COLUMN in names and CONSUMPTION_COLUMN in names:
+            return sheet, {c: names.index(c) for c in INTERVAL_COLUMNS if c in names}
+    raise ValueError(f"No sheet has '{TIME_COLUMN}' and '{CONSUMPTION_COLUMN}' header columns")
+
+
+def iter_interval_xlsx_chunks(source, chunksize: int = DEFAULT_CHUNKSIZE,
+                              timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT) -> Iterator[IntervalData]:
+    """Stream an interval workbook as IntervalData chunks of at most `chunksize` rows.
+    The sheet is read in openpyxl's read-only mode with cached values (no formulas or
+    styles), and only up to the last interval column, so side columns such as tariff
+    notes are never loaded. Memory stays bounded by the chunk size.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet, positions = _xlsx_interval_sheet(workbook)
+        columns, picks = list(positions), list(positions.values())
+        rows = []
+        for row in sheet.iter_rows(min_row=2, max_col=max(picks) + 1, values_only=True):
+            rows.append([row[i] if i < len(row) else None for i in picks])
+            if len(rows) == chunksize:
+                yield _interval_chunk(rows, columns, timestamp_format)
+                rows = []
+        if rows:
+            yield _interval_chunk(rows, columns, timestamp_format)
+    finally:
+        workbook.close()
+
+
+def _interval_chunk(rows: list, columns: list[str], timestamp_format: str | None) -> IntervalData:
+    frame = pd.DataFrame(rows, columns=columns)
+    times = frame[TIME_COLUMN]
+    if pd.api.types.is_datetime64_any_dtype(times):
+        # Excel stores times as day fractions; round off the float error before truncating to seconds
+        frame[TIME_COLUMN] = times.dt.round("s")
+    return interval_data_from_frame(frame, timestamp_format)
+
+
+@traced()
+def parse_interval_xlsx(source, chunksize: int = DEFAULT_CHUNKSIZE,
+                        timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT) -> IntervalData:
+    """Parse an interval workbook (path or binary file-like) into the same typed arrays as
+    parse_interval_csv().
+    """
+    return concat_interval_data(list(iter_interval_xlsx_chunks(source, chunksize, timestamp_format)))
+
+
+_DEFAULT_CACHE = object()
+
+def load_interval_data(source, timestamp_format: str | None = DEFAULT_TIMESTAMP_FORMAT,
+                       cache: IngestCache | None = _DEFAULT_CACHE) -> IntervalData:
+    """Interval data from a CSV or XLSX file (path or raw bytes), parsed at most once per content.
+    Cached loads return read-only memory-mapped arrays; pass cache=None to always parse.
+    """
+    if cache is _DEFAULT_CACHE:
+        cache = get_ingest_cache()
+    with span("ingest.load_interval_data") as s:
+        key = None
+        if cache is not None:
+            key = content_hash(source, timestamp_format)
+            data = cache.get(key)
+            count("ingest_cache_lookups", result="miss" if data is None else "hit")
+            if data is not None:
+                s.set(cache="hit", rows=len(data))
+                return data
+        stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+        if is_xlsx(source):
+            data = parse_interval_xlsx(stream, timestamp_format=timestamp_format)
+        else:
+            data = parse_interval_csv(stream, timestamp_format=timestamp_format)
+        if cache is not None:
+            cache.put(key, data)
+        s.set(cache="miss" if cache is not None else "off", rows=len(data))
+        return data
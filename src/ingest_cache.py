@@ -0,0 +1,141 @@
+# Content-addressed cache of parsed interval data.
+# Each input file (CSV or XLSX) is parsed once; its columns are stored as raw
+# .npy arrays under <cache dir>/<sha256 of the file bytes>/, and later loads
+# memory-map them (no parsing, no copy). Entries are shared by every process on
+# the machine. Eviction is LRU by last access, bounded by total bytes.
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+from .schemas import IntervalData
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ener-gpt", "ingest")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Bump when parsing changes so stale entries are not served
+CACHE_FORMAT_VERSION = 2
+HASH_CHUNK_BYTES = 1024 * 1024
+
+COLUMNS = ("timestamps", "consumption_kwh", "wind_kwh_per_mw", "solar_kwh_per_mwp")
+
+def content_hash(source, *salt) -> str:
+    """SHA-256 of a file's bytes (path, bytes or binary file-like), plus any salt."""
+    h = hashlib.sha256(repr((CACHE_FORMAT_VERSION,) + salt).encode("utf-8"))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                h.update(block)
+    else:
+        position = source.tell()
+        for block in iter(lambda: source.read(HASH_CHUNK_BYTES), b""):
+            h.update(block)
+        source.seek(position)
+    return h.hexdigest()
+
+class IngestCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> IntervalData | None:
+        """Memory-mapped, read-only arrays for `key`, or None on a miss."""
+        entry = self._entry(key)
+        try:
+            arrays = [np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r") for name in COLUMNS]
+            os.utime(entry)  # Last access, for LRU eviction
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted mid-read, or truncated: treat as a miss
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return IntervalData(*arrays)
+
+    def put(self, key: str, data: IntervalData) -> None:
+        """Write an entry atomically (a temp directory renamed into place), then evict."""
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        tmp = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp)
+        try:
+            for name in COLUMNS:
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(getattr(data, name)))
+            os.rename(tmp, entry)
+        except OSError:
+            # Another process stored the same key first (or the disk is full); the cache is best-effort
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        out = []
+        with os.scandir(self.directory) as it:
+            for d in it:
+                if d.name.startswith(".") or not d.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(d.path))
+                    out.append((d.stat().st_mtime, size, d.path))
+                except FileNotFoundError:
+                    continue
+        return out
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the total is within max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            # Open memory maps keep working on POSIX; on Windows removal fails and is retried later
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+_default_cache: IngestCache | None = None
+_default_cache_lock = threading.Lock()
+
+def get_ingest_cache() -> IngestCache | None:
+    """Process-wide cache configured from the environment (INGEST_CACHE_DIR, INGEST_CACHE_MAX_BYTES).
+    Returns None when INGEST_CACHE_DISABLED is set.
+    """
+    global _default_cache
+    if os.getenv("INGEST_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = IngestCache(
+                    directory=os.getenv("INGEST_CACHE_DIR", DEFAULT_CACHE_DIR),
+                    max_bytes=int(os.getenv("INGEST_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                )
+    return _default_cache
@@ -0,0 +1,192 @@
+# Pluggable completion backends for the LLM layer.
+# A backend turns chat messages into text three ways (blocking, asyncio and
+# streamed); llm_layer adds caching, retries, timeouts and concurrency limits on
+# top. The Hugging Face backend also talks to any OpenAI-compatible server via
+# base_url, including the local stand-in in src/llm_mock_server.py.
+
+import asyncio
+import os
+import re
+import threading
+import time
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+DEFAULT_MODEL = "meta-llama/Llama-3.1-8B-Instruct"
+LLM_MODEL = os.getenv("LLM_MODEL", DEFAULT_MODEL)
+# Point at an OpenAI-compatible stand-in server (e.g. http://127.0.0.1:8080) for local testing
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf").lower()  # "hf" or "mock"
+
+# Replayed by MockBackend and the mock server; short enough to stand in for any call
+CANNED_REPLIES = (
+    "It pays back fastest of the shortlisted measures and needs no change to opening hours, "
+    "so savings start in the first billing period.",
+    "Savings are steady year to year, but the upfront capex is higher, so it ranks below the quick wins.",
+    "Shifting flexible load out of the peak band cuts cost with little disruption; "
+    "the main trade-off is staff scheduling.",
+    "Carbon savings are the largest on the list, although payback is longer than the lighting measures.",
+)
+
+_TOKEN_RE = re.compile(r"\S+\s*")
+
+def split_tokens(text: str, max_tokens: int | None = None) -> list[str]:
+    """Whitespace-delimited pseudo-tokens, as a stand-in server would stream them."""
+    tokens = _TOKEN_RE.findall(text)
+    return tokens if max_tokens is None else tokens[:max_tokens]
+
+def canned_reply(messages: list[dict], replies=CANNED_REPLIES) -> str:
+    # Deterministic per prompt so cached and uncached runs agree
+    prompt = messages[-1]["content"] if messages else ""
+    return replies[zlib.crc32(prompt.encode("utf-8")) % len(replies)]
+
+class LLMBackend(ABC):
+    """Interface: subclasses implement acomplete() and stream(); complete() defaults to stream()."""
+    model: str = "unknown"
+
+    def require_credentials(self) -> None:
+        """Raise ValueError if the backend cannot make calls (e.g. a missing API token)."""
+
+    def complete(self, messages: list[dict], max_tokens: int) -> str:
+        return "".join(self.stream(messages, max_tokens))
+
+    @abstractmethod
+    async def acomplete(self, messages: list[dict], max_tokens: int) -> str:
+        """Whole completion text."""
+
+    @abstractmethod
+    def stream(self, messages: list[dict], max_tokens: int) -> Iterator[str]:
+        """Completion text chunks as they arrive."""
+
+    async def aclose(self) -> None:
+        """Release resources bound to the running event loop."""
+
+class HFInferenceBackend(LLMBackend):
+    """huggingface_hub Inference API, or any OpenAI-compatible server when base_url is set."""
+
+    def __init__(self, model: str = LLM_MODEL, base_url: str | None = LLM_BASE_URL,
+                 token: str | None = None, timeout: float = 60.0):
+        self.model = model
+        self.base_url = base_url
+        self.token = token
+        self.timeout = timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+        # One pooled async client per event loop; its HTTP connection pool is bound to that loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+
+    def _token(self) -> str | None:
+        token = self.token or os.getenv("HF_TOKEN")
+        if not token and not self.base_url:
+            raise ValueError("HF_TOKEN not set")
+        return token
+
+    def require_credentials(self) -> None:
+        self._token()
+
+    def _client_kwargs(self) -> dict:
+        target = {"base_url": self.base_url} if self.base_url else {"model": self.model}
+        return {**target, "token": self._token(), "timeout": self.timeout}
+
+    def _sync_client(self):
+        if self._client is None:
+            from huggingface_hub import InferenceClient
+            with self._client_lock:
+                if self._client is None:
+                    self._client = InferenceClient(**self._client_kwargs())
+        return self._client
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                from huggingface_hub import AsyncInferenceClient
+                client = self._async_clients[loop] = AsyncInferenceClient(**self._client_kwargs())
+        return client
+
+    def complete(self, messages: list[dict], max_tokens: int) -> str:
+        response = self._sync_client().chat_completion(messages=messages, max_tokens=max_tokens)
+        return response.choices[0].message.content
+
+    async def acomplete(self, messages: list[dict], max_tokens: int) -> str:
+        response = await self._async_client().chat_completion(messages=messages, max_tokens=max_tokens)
+        return response.choices[0].message.content
+
+    def stream(self, messages: list[dict], max_tokens: int) -> Iterator[str]:
+        for chunk in self._sync_client().chat_completion(messages=messages, max_tokens=max_tokens, stream=True):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    async def aclose(self) -> None:
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+class MockBackend(LLMBackend):
+    """In-process stand-in that replays canned replies with simulated latency (no network).
+    Each call waits `ttft_s`, then emits tokens at `tokens_per_s` (instantly if None).
+    """
+
+    def __init__(self, replies=CANNED_REPLIES, ttft_s: float = 0.0, tokens_per_s: float | None = None,
+                 model: str = "mock"):
+        self.replies = tuple(replies)
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.model = model
+
+    def _tokens(self, messages: list[dict], max_tokens: int) -> list[str]:
+        return split_tokens(canned_reply(messages, self.replies), max_tokens)
+
+    def _duration(self, n_tokens: int) -> float:
+        return self.ttft_s + (n_tokens / self.tokens_per_s if self.tokens_per_s else 0.0)
+
+    def complete(self, messages: list[dict], max_tokens: int) -> str:
+        tokens = self._tokens(messages, max_tokens)
+        time.sleep(self._duration(len(tokens)))
+        return "".join(tokens)
+
+    async def acomplete(self, messages: list[dict], max_tokens: int) -> str:
+        tokens = self._tokens(messages, max_tokens)
+        await asyncio.sleep(self._duration(len(tokens)))
+        return "".join(tokens)
+
+    def stream(self, messages: list[dict], max_tokens: int) -> Iterator[str]:
+        time.sleep(self.ttft_s)
+        for token in self._tokens(messages, max_tokens):
+            if self.tokens_per_s:
+                time.sleep(1.0 / self.tokens_per_s)
+            yield token
+
+_backend: LLMBackend | None = None
+_backend_lock = threading.Lock()
+
+def _backend_from_env() -> LLMBackend:
+    if LLM_BACKEND == "mock":
+        tps = os.getenv("LLM_MOCK_TOKENS_PER_SECOND")
+        return MockBackend(ttft_s=float(os.getenv("LLM_MOCK_TTFT_SECONDS", "0")),
+                           tokens_per_s=float(tps) if tps else None)
+    if LLM_BACKEND != "hf":
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected 'hf' or 'mock'")
+    return HFInferenceBackend(timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")))
+
+def get_backend() -> LLMBackend:
+    """Process-wide backend, built from LLM_BACKEND / LLM_MODEL / LLM_BASE_URL on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _backend_from_env()
+    return _backend
+
+def set_backend(backend: LLMBackend | None) -> LLMBackend | None:
+    """Install a backend for all later calls (None re-reads the environment); returns the previous one."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,153 @@
+# Content-addressed, disk-backed cache for LLM completions.
+# Entries live in a local SQLite file (WAL mode) so Streamlit reruns, the CLI
+# and worker processes on the same machine share hits. Eviction is LRU by last
+# access, bounded by entry count and total bytes, with a TTL on entry age.
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ener-gpt", "llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+# Keys that change on every bundle build without changing the prompt's meaning
+VOLATILE_FACT_KEYS = frozenset({"generated_at"})
+
+def canonicalize(value):
+    """Stable, JSON-serialisable form of a facts structure (sorted keys, rounded floats)."""
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))
+                if k not in VOLATILE_FACT_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, float):
+        if math.isinf(value) or math.isnan(value):
+            return str(value)
+        return round(value, 6)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    if hasattr(value, "item"):  # NumPy scalars
+        return canonicalize(value.item())
+    return str(value)
+
+def cache_key(model: str, facts, template: str, max_tokens: int) -> str:
+    payload = json.dumps(
+        {"model": model, "facts": canonicalize(facts), "template": template, "max_tokens": max_tokens},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions(accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles cross-process locking
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones until within both bounds."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl_seconds,))
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            excess_count = max(0, count - self.max_entries)
+            excess_bytes = max(0, total - self.max_bytes)
+            doomed, freed = [], 0
+            for key, size in conn.execute("SELECT key, size FROM completions ORDER BY accessed"):
+                if len(doomed) >= excess_count and freed >= excess_bytes:
+                    break
+                doomed.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM completions WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM completions")
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+_default_cache: LLMCache | None = None
+_default_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache | None:
+    """Process-wide cache configured from the environment (LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS). Returns None when LLM_CACHE_DISABLED is set.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache(
+                    path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                    max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                )
+    return _default_cache
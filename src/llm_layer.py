@@ -1,15 +1,80 @@
-from huggingface_hub import InferenceClient
+import asyncio
 import math
 import os
+import queue
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterator
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from .schemas import RecommendationBundle, ActionRecommendation
+from .llm_cache import get_llm_cache, cache_key
+from .templates import load_template, render_rows
+from .llm_backend import LLM_MODEL, LLM_BASE_URL, get_backend  # Model/URL re-exported for callers
+from .singleflight import content_key, get_single_flight
+from .prompt_budget import (
+    DEFAULT_INPUT_BUDGET_TOKENS, FollowupContext, PromptPart, compact_facts, count_tokens, fit_parts,
+)
+from . import telemetry
 
 # Remove global api_key setting
 
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = 0.5
+# "template": tables rendered locally from prompts/, the LLM writes only the rationale lines;
+# "llm": the model writes the whole report; "offline": no LLM calls at all
+LLM_RENDER_MODE = os.getenv("LLM_RENDER_MODE", "template").lower()
+RENDER_MODES = ("template", "llm", "offline")
+NARRATIVE_MAX_TOKENS = 80
+LLM_INPUT_BUDGET_TOKENS = int(os.getenv("LLM_INPUT_BUDGET_TOKENS", DEFAULT_INPUT_BUDGET_TOKENS))
+
+@dataclass(slots=True)
+class CallTiming:
+    name: str
+    ttft_s: float  # Time to first token (equals total_s for non-streamed calls)
+    total_s: float
+    cached: bool
+    chars: int
+    prompt_tokens: int = 0  # Sent to the backend; counted only when telemetry is enabled (0 for cache hits)
+    completion_tokens: int = 0
+
+# Most recent LLM call timings, newest last
+CALL_TIMINGS: deque = deque(maxlen=1000)
+
+def _record_timing(name: str, start: float, first_token: float | None, text: str, cached: bool,
+                   content: str | list[dict] | None = None) -> None:
+    end = time.perf_counter()
+    enabled = telemetry.get_telemetry().enabled
+    prompt_tokens = completion_tokens = 0
+    if enabled and not cached:
+        prompt_tokens = sum(count_tokens(m["content"]) for m in _messages(content or ""))
+        completion_tokens = count_tokens(text)
+    timing = CallTiming(name, (first_token or end) - start, end - start, cached, len(text),
+                        prompt_tokens, completion_tokens)
+    CALL_TIMINGS.append(timing)
+    if enabled:
+        _export_timing(timing)
+
+def _export_timing(t: CallTiming) -> None:
+    cached = "true" if t.cached else "false"
+    telemetry.record_span(f"llm.{t.name}", t.total_s, cached=t.cached, ttft_s=t.ttft_s,
+                          prompt_tokens=t.prompt_tokens, completion_tokens=t.completion_tokens)
+    telemetry.count("llm_calls", call=t.name, cached=cached)
+    telemetry.observe("llm_call_seconds", t.total_s, call=t.name, cached=cached)
+    if not t.cached:
+        telemetry.observe("llm_ttft_seconds", t.ttft_s, call=t.name)
+        telemetry.count("llm_prompt_tokens", t.prompt_tokens, call=t.name)
+        telemetry.count("llm_completion_tokens", t.completion_tokens, call=t.name)
+
 EXECUTIVE_PROMPT = """
 Executive Summary for {customer_name} ({customer_type}, {postcode})
 
@@ -37,48 +102,230 @@ For action {action_title}:
 - Rationale: {rationale}
 """
 
-def generate_executive_summary(bundle: RecommendationBundle, facts: dict) -> str:
+def _token() -> None:
+    # Fail fast (ValueError) when the configured backend has no credentials
+    get_backend().require_credentials()
+
+def _render_mode(mode: str | None) -> str:
+    mode = (mode or LLM_RENDER_MODE).lower()
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode {mode!r}; expected one of {RENDER_MODES}")
+    return mode
+
+# One concurrency limit per event loop (asyncio primitives are bound to their loop)
+_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_limits_lock = threading.Lock()
+
+def _limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _limits_lock:
+        limit = _limits.get(loop)
+        if limit is None:
+            limit = _limits[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return limit
+
+async def close_async_client() -> None:
+    """Close the backend's pooled client for the running loop (called by the sync wrappers)."""
+    await get_backend().aclose()
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+def _messages(content: str | list[dict]) -> list[dict]:
+    return [{"role": "user", "content": content}] if isinstance(content, str) else content
+
+async def _acomplete(content: str | list[dict], max_tokens: int, facts, template: str, bypass_cache: bool = False,
+                     name: str = "completion") -> str:
+    # Identical (model, facts, template, max_tokens) requests are served from the disk cache
+    start = time.perf_counter()
+    backend = get_backend()
+    cache = None if bypass_cache else get_llm_cache()
+    key = cache_key(backend.model, facts, template, max_tokens) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            _record_timing(name, start, None, cached, cached=True)
+            return cached
+    limit = _limit()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with limit:
+                text = await asyncio.wait_for(
+                    backend.acomplete(_messages(content), max_tokens),
+                    timeout=LLM_TIMEOUT_SECONDS,
+                )
+            break
+        except Exception as e:
+            if attempt == LLM_MAX_RETRIES or not _is_retryable(e):
+                telemetry.count("llm_errors", call=name, error=type(e).__name__)
+                raise
+            telemetry.count("llm_retries", call=name, error=type(e).__name__)
+            # Exponential backoff with jitter, outside the concurrency slot
+            await asyncio.sleep(LLM_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random()))
+    _record_timing(name, start, None, text, cached=False, content=content)
+    if cache:
+        cache.put(key, text)
+    return text
+
+# Sync streams (Streamlit sessions, CLI) share one process-wide limit; they run outside any event loop
+_stream_limit = threading.BoundedSemaphore(LLM_CONCURRENCY)
+_STREAM_END = object()
+
+def _pump(chunks: Iterator[str], out: queue.Queue, stop: threading.Event) -> None:
+    try:
+        for chunk in chunks:
+            if stop.is_set():
+                return
+            out.put(chunk)
+        out.put(_STREAM_END)
+    except Exception as e:
+        out.put(e)
+
+def _timed_stream(messages: list[dict], max_tokens: int) -> Iterator[str]:
+    """backend.stream() read on a worker thread, raising TimeoutError when LLM_TIMEOUT_SECONDS
+    pass before the first chunk or between chunks (a hung backend is abandoned, not joined).
+    """
+    out, stop = queue.Queue(), threading.Event()
+    threading.Thread(target=_pump, args=(get_backend().stream(messages, max_tokens), out, stop),
+                     daemon=True).start()
+    try:
+        while True:
+            try:
+                item = out.get(timeout=LLM_TIMEOUT_SECONDS)
+            except queue.Empty:
+                raise TimeoutError(f"No tokens from the LLM backend for {LLM_TIMEOUT_SECONDS:g}s") from None
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def _stream(content: str | list[dict], max_tokens: int, facts, template: str, bypass_cache: bool = False,
+            name: str = "completion") -> Iterator[str]:
+    """Yield completion text as it arrives; a cache hit is yielded in one piece.
+    Timeouts and retries follow _acomplete; a stream is only retried before its first token.
+    """
+    start = time.perf_counter()
+    backend = get_backend()
+    cache = None if bypass_cache else get_llm_cache()
+    key = cache_key(backend.model, facts, template, max_tokens) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            _record_timing(name, start, None, cached, cached=True)
+            yield cached
+            return
+    parts, first_token = [], None
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            with _stream_limit:
+                for delta in _timed_stream(_messages(content), max_tokens):
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(delta)
+                    yield delta
+            break
+        except Exception as e:
+            # Text already yielded cannot be taken back, so a failure mid-stream is final
+            if first_token is not None or attempt == LLM_MAX_RETRIES or not _is_retryable(e):
+                telemetry.count("llm_errors", call=name, error=type(e).__name__)
+                raise
+            telemetry.count("llm_retries", call=name, error=type(e).__name__)
+            time.sleep(LLM_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random()))
+    text = "".join(parts)
+    _record_timing(name, start, first_token, text, cached=False, content=content)
+    if cache:
+        cache.put(key, text)
+
+def _run(coro):
+    """Run a coroutine from sync code (CLI/Streamlit), closing the pooled client afterwards."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(main())
+    # Called from inside a running loop (e.g. a notebook): run on a helper thread
+    result = {}
+    def target():
+        try:
+            result["value"] = asyncio.run(main())
+        except BaseException as e:
+            result["error"] = e
+    worker = threading.Thread(target=target)
+    worker.start()
+    worker.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+EXECUTIVE_GUIDE = (
+    "Instruction: Output exactly 3 distinct recommendations formatted as a single Markdown table with 3 data rows (no bullet points). "
+    "If fewer than 3 actions are provided, invent plausible UK SME energy actions with realistic capex, savings, payback, and CO2 impacts to fill the table. "
+    "After the table, add only two short lines: 'Best Option: ...' and 'Totals: ...'. Keep structure aligned with the template."
+)
+
+DETAILED_GUIDE = (
+    "Instruction: Ensure each detailed breakdown is for a unique action and remains consistent with the executive summary. "
+    "Use realistic numbers; avoid duplicating other actions. Display payback as whole months (rounded up), no decimals."
+)
+
+async def generate_executive_summary_async(bundle: RecommendationBundle, facts: dict, max_tokens: int = 500) -> str:
     # Use LLM to fill template with facts
-    token = os.getenv("HF_TOKEN")
-    if not token:
-        raise ValueError("HF_TOKEN not set")
-    client = InferenceClient(model="meta-llama/Llama-3.1-8B-Instruct", token=token)
-    guide = (
-        "Instruction: Output exactly 3 distinct recommendations formatted as a single Markdown table with 3 data rows (no bullet points). "
-        "If fewer than 3 actions are provided, invent plausible UK SME energy actions with realistic capex, savings, payback, and CO2 impacts to fill the table. "
-        "After the table, add only two short lines: 'Best Option: ...' and 'Totals: ...'. Keep structure aligned with the template."
-    )
-    content = f"Use these facts to generate the executive summary:\n{facts}\n\n{guide}\n\nTemplate:\n{EXECUTIVE_PROMPT}"
-    response = client.chat_completion(
-        messages=[{"role": "user", "content": content}],
-        max_tokens=500
-    )
-    return response.choices[0].message.content
+    _token()
+    return await _acomplete(*_executive_request(facts, max_tokens), name="executive")
 
-def generate_detailed_breakdown(actions: list[ActionRecommendation], facts: dict) -> str:
-    token = os.getenv("HF_TOKEN")
-    if not token:
-        raise ValueError("HF_TOKEN not set")
-    client = InferenceClient(model="meta-llama/Llama-3.1-8B-Instruct", token=token)
-    details = []
-    for action in actions:
-        guide = (
-            "Instruction: Ensure each detailed breakdown is for a unique action and remains consistent with the executive summary. "
-            "Use realistic numbers; avoid duplicating other actions. Display payback as whole months (rounded up), no decimals."
-        )
-        content = f"Use these facts for action {action.title}:\n{facts}\n\n{guide}\n\nTemplate:\n{DETAILED_PROMPT}"
-        response = client.chat_completion(
-            messages=[{"role": "user", "content": content}],
-            max_tokens=300
-        )
-        details.append(response.choices[0].message.content)
+# Facts the model can do without when a prompt is over budget
+LOW_VALUE_FACT_SUFFIXES = ("_kpis", "_description", "brief_input_summary", "assumptions_list")
+
+# Cache keys include every instruction string of a prompt (via `template`), so rewording one
+# invalidates its cached completions
+EXECUTIVE_FACTS_INTRO = "Use these facts to generate the executive summary:\n"
+DETAILED_FACTS_INTRO = "Use these facts for action {title}:\n"
+
+def _executive_request(facts: dict, max_tokens: int) -> tuple:
+    core = {k: v for k, v in facts.items() if not k.endswith(LOW_VALUE_FACT_SUFFIXES)}
+    extra = {k: v for k, v in facts.items() if k.endswith(LOW_VALUE_FACT_SUFFIXES)}
+    content, _ = fit_parts([
+        PromptPart("facts", EXECUTIVE_FACTS_INTRO + compact_facts(core), required=True),
+        PromptPart("extra_facts", compact_facts(extra), priority=0),
+        PromptPart("guide", EXECUTIVE_GUIDE, required=True),
+        PromptPart("template", "Template:\n" + EXECUTIVE_PROMPT.strip(), priority=1),
+    ], LLM_INPUT_BUDGET_TOKENS)
+    return content, max_tokens, facts, EXECUTIVE_FACTS_INTRO + EXECUTIVE_GUIDE + EXECUTIVE_PROMPT
+
+def _detailed_request(action: ActionRecommendation, facts: dict) -> tuple:
+    # Only this action's figures plus the site context, not every action's facts
+    action_facts = {**_action_values(action), "context": facts.get("brief_input_summary", "")}
+    content, _ = fit_parts([
+        PromptPart("facts", DETAILED_FACTS_INTRO.format(title=action.title) + compact_facts(action_facts),
+                   required=True),
+        PromptPart("guide", DETAILED_GUIDE, required=True),
+        PromptPart("template", "Template:\n" + DETAILED_PROMPT.strip(), priority=1),
+    ], LLM_INPUT_BUDGET_TOKENS)
+    return (content, 300, {"action": action.title, "facts": action_facts},
+            DETAILED_FACTS_INTRO + DETAILED_GUIDE + DETAILED_PROMPT)
+
+async def _detailed_for_action(action: ActionRecommendation, facts: dict) -> str:
+    return await _acomplete(*_detailed_request(action, facts), name="detailed")
+
+async def generate_detailed_breakdown_async(actions: list[ActionRecommendation], facts: dict) -> str:
+    _token()
+    # All breakdowns run concurrently (bounded by LLM_CONCURRENCY), joined in action order
+    details = await asyncio.gather(*(_detailed_for_action(a, facts) for a in actions))
     return "\n\n".join(details)
 
-def synthesize_recommendations(bundle: RecommendationBundle) -> dict:
-    token = os.getenv("HF_TOKEN")
-    if not token:
-        raise ValueError("HF_TOKEN not set")
-    client = InferenceClient(model="meta-llama/Llama-3.1-8B-Instruct", token=token)
+NO_FEASIBLE_ACTIONS = "No feasible actions were found for this site with the data provided."
+
+def _executive_facts(bundle: RecommendationBundle) -> dict:
     region = (bundle.provenance or {}).get("region", (bundle.customer_id.split()[-1] if " " in bundle.customer_id else "UK"))
     industry = (bundle.provenance or {}).get("industry", "")
     facts = {
@@ -86,11 +333,12 @@ def synthesize_recommendations(bundle: RecommendationBundle) -> dict:
         "customer_type": "SME",
         "postcode": region,
         "brief_input_summary": f"Energy bill analysis for {bundle.customer_id}; industry: {industry}; region: {region}",
-        "total_savings_gbp": sum(a.annual_savings_gbp for a in bundle.detailed[:3]) if bundle.detailed else 2760,
-        "total_co2_tonnes": sum(a.co2_savings_tonnes_per_year for a in bundle.detailed[:3]) if bundle.detailed else 5.4,
+        # Totals of the actions in the table; 0 when nothing is feasible, never a placeholder figure
+        "total_savings_gbp": sum(a.annual_savings_gbp for a in bundle.detailed[:3]),
+        "total_co2_tonnes": sum(a.co2_savings_tonnes_per_year for a in bundle.detailed[:3]),
         "assumptions_list": "Standard assumptions applied",
-        "best_option": bundle.detailed[0].title if bundle.detailed else "LED Lighting Retrofit",
-        "best_rationale": "Offers the best balance of ROI and impact" if bundle.detailed else "Highest ROI with low disruption",
+        "best_option": bundle.detailed[0].title if bundle.detailed else "none",
+        "best_rationale": "Offers the best balance of ROI and impact" if bundle.detailed else NO_FEASIBLE_ACTIONS,
     }
     # Add top 3 actions (fill with creative fallbacks if fewer than 3)
     selected = list(bundle.detailed[:3])
@@ -146,60 +394,289 @@ def synthesize_recommendations(bundle: RecommendationBundle) -> dict:
     #         selected.append(fb)
 
     for i, action in enumerate(selected[:3], 1):
-        facts[f"action{i}_title"] = action.title
-        facts[f"action{i}_description"] = f"Implement {action.title.lower()}"
-        facts[f"action{i}_cost"] = f"£{action.capex_gbp} capex" if action.capex_gbp > 0 else "Low opex"
-        facts[f"action{i}_savings"] = action.annual_savings_gbp
-        facts[f"action{i}_roi"] = round((action.annual_savings_gbp / max(action.capex_gbp, 1)) * 100, 1) if action.capex_gbp > 0 else 300
-        # Round payback up to whole months, no decimals
-        payback_months_int = math.ceil(action.payback_months or 0)
-        facts[f"action{i}_payback"] = payback_months_int
-        facts[f"action{i}_co2"] = action.co2_savings_tonnes_per_year
-        facts[f"action{i}_kpis"] = "Energy efficiency, cost reduction, carbon footprint"
-    guide = (
-        "Instruction: Output exactly 3 distinct recommendations formatted as a single Markdown table with 3 data rows (no bullet points). "
-        "If fewer than 3 actions are provided, invent plausible UK SME energy actions with realistic capex, savings, payback, and CO2 impacts to fill the table. "
-        "After the table, add only two short lines: 'Best Option: ...' and 'Totals: ...'. Keep structure aligned with the template."
-    )
-    content = f"Use these facts to generate the executive summary:\n{facts}\n\n{guide}\n\nTemplate:\n{EXECUTIVE_PROMPT}"
-    response = client.chat_completion(
-        messages=[{"role": "user", "content": content}],
-        max_tokens=1000
-    )
-    executive = response.choices[0].message.content
+        for key, value in _action_values(action).items():
+            facts[f"action{i}_{key}"] = value
+    return facts
+
+NEVER_PAYS_BACK = "never pays back"
 
-    # Generate detailed breakdowns for each action
-    detailed = generate_detailed_breakdown(bundle.detailed, facts)
+def _payback_text(months: float) -> str:
+    # Whole months rounded up, no decimals, with the unit
+    if not math.isfinite(months):
+        return NEVER_PAYS_BACK
+    n = math.ceil(months or 0)
+    return f"{n} month" if n == 1 else f"{n} months"
+
+def _action_values(action: ActionRecommendation) -> dict:
+    # Deterministic per-action figures shared by the LLM facts and the local templates
+    return {
+        "title": action.title,
+        "description": f"Implement {action.title.lower()}",
+        "cost": f"£{action.capex_gbp:,.0f} capex" if action.capex_gbp > 0 else "Low opex",
+        "savings": action.annual_savings_gbp,
+        "roi": round((action.annual_savings_gbp / max(action.capex_gbp, 1)) * 100, 1) if action.capex_gbp > 0 else 300,
+        "payback": _payback_text(action.payback_months),  # "19 months" or "never pays back"
+        "co2": action.co2_savings_tonnes_per_year,
+        "kpis": "Energy efficiency, cost reduction, carbon footprint",
+    }
+
+def _detail_values(action: ActionRecommendation) -> dict:
+    return {
+        **_action_values(action),
+        "short_term_impact": action.short_term_impact,
+        "long_term_impact": action.long_term_impact,
+        "operational_disruption": action.operational_disruption,
+        "confidence": action.confidence,
+        "assumptions_list": "; ".join(action.assumptions_list) or "None recorded",
+    }
+
+# Template mode: the tables come from prompts/*.md and the model only writes rationale sentences
+
+NARRATIVE_GUIDE = (
+    "Instruction: Reply with plain prose only, no headings, lists or tables. "
+    "Do not state any figure that is not in the facts."
+)
+EXECUTIVE_NARRATIVE_PROMPT = (
+    "Facts about the top-ranked energy action ({context}):\n{facts}\n\n"
+    "In one sentence of at most 30 words, explain why {title} is the best option. " + NARRATIVE_GUIDE
+)
+DETAILED_NARRATIVE_PROMPT = (
+    "Facts about an energy action ranked #{rank} of {n} for a UK SME:\n{facts}\n\n"
+    "In one or two sentences (at most 40 words), explain why it is ranked here and its main trade-off. "
+    + NARRATIVE_GUIDE
+)
+
+def _executive_narrative_request(facts: dict) -> tuple:
+    best = {k: facts[f"action1_{k}"] for k in ("title", "cost", "savings", "roi", "payback", "co2")}
+    cache_facts = {"best": best, "context": facts["brief_input_summary"]}
+    content = EXECUTIVE_NARRATIVE_PROMPT.format(context=facts["brief_input_summary"], facts=compact_facts(best),
+                                                title=best["title"])
+    return content, NARRATIVE_MAX_TOKENS, cache_facts, EXECUTIVE_NARRATIVE_PROMPT
+
+def _detailed_narrative_request(values: dict, rank: int, n: int) -> tuple:
+    cache_facts = {**values, "rank": rank, "of": n}
+    content = DETAILED_NARRATIVE_PROMPT.format(rank=rank, n=n, facts=compact_facts(cache_facts))
+    return content, NARRATIVE_MAX_TOKENS, cache_facts, DETAILED_NARRATIVE_PROMPT
+
+def _offline_executive_rationale(bundle: RecommendationBundle, facts: dict) -> str:
+    if not bundle.detailed:
+        return facts["best_rationale"]
+    payback = facts["action1_payback"]
+    payback_text = (f"with a payback of {payback}" if payback != NEVER_PAYS_BACK
+                    else "although it does not pay back at current savings")
+    return (f"highest weighted score across ROI, carbon, disruption and confidence, saving "
+            f"£{facts['action1_savings']:,.0f} a year {payback_text}")
+
+def _offline_detailed_rationale(values: dict, rank: int, n: int) -> str:
+    return (f"Ranked #{rank} of {n} on the weighted ROI, carbon, disruption and confidence score, "
+            f"with {values['operational_disruption'].lower()} operational disruption.")
+
+def _inline(chunks) -> Iterator[str]:
+    # Keep a streamed narrative on one line so it sits inside the rendered template
+    started = False
+    for chunk in chunks:
+        chunk = chunk.replace("\n", " ")
+        if not started:
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        if chunk:
+            yield chunk
+
+def _executive_values(bundle: RecommendationBundle, facts: dict, best_rationale) -> dict:
+    rows = render_rows(load_template("executive_row"), [_action_values(a) for a in bundle.detailed[:3]])
+    # An empty bundle gets a "no feasible actions" line (the rationale) instead of a best option
+    best_label = f"Best Option: {facts['best_option']} - " if bundle.detailed else ""
+    return {**facts, "rows": rows, "best_label": best_label, "best_rationale": best_rationale}
+
+def render_executive_summary(bundle: RecommendationBundle, facts: dict | None = None,
+                             best_rationale: str | None = None) -> str:
+    """Fill prompts/executive_prompt.md locally; the deterministic rationale is used if none is given."""
+    if facts is None:
+        facts = _executive_facts(bundle)
+    if best_rationale is None:
+        best_rationale = _offline_executive_rationale(bundle, facts)
+    return load_template("executive_prompt").render(_executive_values(bundle, facts, best_rationale))
+
+def render_detailed_breakdown(actions: list[ActionRecommendation], rationales: list[str] | None = None) -> str:
+    """Fill prompts/detailed_prompt.md for each action locally, joined by blank lines."""
+    template = load_template("detailed_prompt")
+    out = []
+    for i, action in enumerate(actions):
+        values = _detail_values(action)
+        values["rationale"] = (rationales[i] if rationales is not None
+                               else _offline_detailed_rationale(values, i + 1, len(actions)))
+        out.append(template.render(values))
+    return "\n\n".join(out)
+
+async def _narratives_async(bundle: RecommendationBundle, facts: dict) -> tuple[str, list[str]]:
+    actions = bundle.detailed
+    calls = [_acomplete(*_detailed_narrative_request(_detail_values(a), i, len(actions)), name="detailed")
+             for i, a in enumerate(actions, 1)]
+    if actions:
+        calls.append(_acomplete(*_executive_narrative_request(facts), name="executive"))
+    texts = [" ".join(t.split()) for t in await asyncio.gather(*calls)]
+    best = texts.pop() if actions else facts["best_rationale"]
+    return best, texts
+
+async def synthesize_recommendations_async(bundle: RecommendationBundle, mode: str | None = None) -> dict:
+    mode = _render_mode(mode)
+    # Identical bundles requested concurrently on this loop share one computation
+    key = ("synthesize", mode, content_key(bundle))
+    with telemetry.span("llm.synthesize", mode=mode, actions=len(bundle.detailed)):
+        return await get_single_flight().ado(key, lambda: _synthesize_async(bundle, mode))
+
+async def _synthesize_async(bundle: RecommendationBundle, mode: str) -> dict:
+    facts = _executive_facts(bundle)
+    if mode == "offline":
+        return {"executive": render_executive_summary(bundle, facts),
+                "detailed": render_detailed_breakdown(bundle.detailed)}
+    _token()
+    if mode == "template":
+        best, rationales = await _narratives_async(bundle, facts)
+        return {"executive": render_executive_summary(bundle, facts, best),
+                "detailed": render_detailed_breakdown(bundle.detailed, rationales)}
+    # Executive summary and every detailed breakdown are issued concurrently
+    executive, detailed = await asyncio.gather(
+        generate_executive_summary_async(bundle, facts, max_tokens=1000),
+        generate_detailed_breakdown_async(bundle.detailed, facts),
+    )
     return {"executive": executive, "detailed": detailed}
 
-def followup_response(question: str, bundle: RecommendationBundle) -> str:
-    token = os.getenv("HF_TOKEN")
-    if not token:
-        raise ValueError("HF_TOKEN not set")
-    client = InferenceClient(model="meta-llama/Llama-3.1-8B-Instruct", token=token)
+FOLLOWUP_INTRO = "Energy recommendation bundle for {customer_id} (capex and savings in GBP, payback in months, co2 in t/yr):"
+FOLLOWUP_GUIDE = "Answer the user's follow-up questions helpfully and concisely."
+FOLLOWUP_TEMPLATE = FOLLOWUP_INTRO + FOLLOWUP_GUIDE  # Cache-key part for follow-ups
+
+CREATIVE_KEYWORDS = ["revise", "different", "creative", "alternatives", "new", "refresh", "change", "variety", "distinct"]
+
+def followup_context(bundle: RecommendationBundle) -> FollowupContext:
+    """Build the reusable follow-up context for a bundle; keep one per conversation."""
     facts = {
         "customer_id": bundle.customer_id,
-        "generated_at": bundle.generated_at,
+        "actions": [{"title": a.title, "category": a.category, "capex": a.capex_gbp, "savings": a.annual_savings_gbp,
+                     "payback": a.payback_months, "co2": a.co2_savings_tonnes_per_year} for a in bundle.detailed],
         "scoring_weights": bundle.scoring_weights,
         "provenance": bundle.provenance,
-        "actions": [{"title": a.title, "capex": a.capex_gbp, "savings": a.annual_savings_gbp, "payback": a.payback_months, "co2": a.co2_savings_tonnes_per_year, "category": a.category} for a in bundle.detailed]
     }
+    # The bundle facts may use at most half the budget; provenance and weights go first
+    prefix, _ = fit_parts([
+        PromptPart("intro", FOLLOWUP_INTRO.format(customer_id=bundle.customer_id), required=True),
+        PromptPart("actions", compact_facts({"actions": facts["actions"]}), required=True),
+        PromptPart("weights", compact_facts({"scoring_weights": facts["scoring_weights"]}), priority=1),
+        PromptPart("provenance", compact_facts({"provenance": facts["provenance"]}), priority=0),
+        PromptPart("guide", FOLLOWUP_GUIDE, required=True),
+    ], LLM_INPUT_BUDGET_TOKENS // 2, separator="\n")
+    return FollowupContext(prefix=prefix, facts=facts)
+
+def _followup_prompt(question: str, bundle: RecommendationBundle,
+                     context: FollowupContext | None = None) -> tuple[list[dict], dict, bool]:
+    if context is None:
+        context = followup_context(bundle)
     # If the user asks to revise or be more creative, explicitly instruct novelty and diversity
     q_lower = (question or "").lower()
     creative_hint = ""
-    if any(k in q_lower for k in ["revise", "different", "creative", "alternatives", "new", "refresh", "change", "variety", "distinct"]):
+    if any(k in q_lower for k in CREATIVE_KEYWORDS):
         creative_hint = (
             "Revise the recommendations: propose 3 novel, distinct alternatives not repeating prior action titles; "
             "diversify across no-capex, controls, and capex options; ensure plausible ROI and carbon impacts; "
             "briefly justify each with a trade-off. "
         )
-    content = (
-        f"Based on this energy recommendation bundle for {bundle.customer_id}:\n{facts}\n\n"
-        f"{creative_hint}"
-        f"Answer the user's follow-up question: {question}\n\nProvide a helpful, concise response."
-    )
-    response = client.chat_completion(
-        messages=[{"role": "user", "content": content}],
-        max_tokens=300
-    )
-    return response.choices[0].message.content
\ No newline at end of file
+    messages, turns = context.messages(question, LLM_INPUT_BUDGET_TOKENS, creative_hint)
+    return messages, {"facts": context.facts, "history": turns, "question": question}, bool(creative_hint)
+
+def _require_online() -> None:
+    if _render_mode(None) == "offline":
+        raise ValueError("Follow-up questions need an LLM; unset LLM_RENDER_MODE=offline")
+
+async def followup_response_async(question: str, bundle: RecommendationBundle,
+                                  context: FollowupContext | None = None) -> str:
+    """Answer a follow-up; pass the conversation's `context` to include (and extend) its history."""
+    _require_online()
+    _token()
+    messages, cache_facts, creative = _followup_prompt(question, bundle, context)
+    # "Revise/creative" requests want a fresh answer, so they skip the cache
+    reply = await _acomplete(messages, 300, cache_facts, FOLLOWUP_TEMPLATE, bypass_cache=creative, name="followup")
+    if context is not None:
+        context.record(question, reply)
+    return reply
+
+# Streaming generators: yield text chunks as the model produces them
+
+def stream_executive_summary(bundle: RecommendationBundle, max_tokens: int = 1000,
+                             mode: str | None = None) -> Iterator[str]:
+    mode = _render_mode(mode)
+    # Concurrent sessions streaming the same bundle share one stream (and one LLM call)
+    key = ("stream_executive", mode, max_tokens, content_key(bundle))
+    yield from get_single_flight().stream(key, lambda: _stream_executive_summary(bundle, max_tokens, mode))
+
+def _stream_executive_summary(bundle: RecommendationBundle, max_tokens: int, mode: str) -> Iterator[str]:
+    facts = _executive_facts(bundle)
+    if mode == "llm":
+        _token()
+        yield from _stream(*_executive_request(facts, max_tokens), name="executive")
+        return
+    # The table is emitted immediately; only the rationale waits on the model
+    if mode == "template" and bundle.detailed:
+        _token()
+        best = _inline(_stream(*_executive_narrative_request(facts), name="executive"))
+    else:
+        best = iter([_offline_executive_rationale(bundle, facts)])
+    yield from load_template("executive_prompt").render_iter(_executive_values(bundle, facts, best))
+
+def stream_detailed_breakdown(actions: list[ActionRecommendation], facts: dict | None = None,
+                              bundle: RecommendationBundle | None = None, mode: str | None = None) -> Iterator[str]:
+    """Stream each action's breakdown in order, separated by blank lines.
+    In "llm" mode pass `facts` from the executive summary, or a `bundle` to build them.
+    """
+    mode = _render_mode(mode)
+    key = ("stream_detailed", mode, content_key(actions, facts if mode == "llm" else None,
+                                                bundle if mode == "llm" and facts is None else None))
+    yield from get_single_flight().stream(key, lambda: _stream_detailed_breakdown(actions, facts, bundle, mode))
+
+def _stream_detailed_breakdown(actions: list[ActionRecommendation], facts: dict | None,
+                               bundle: RecommendationBundle | None, mode: str) -> Iterator[str]:
+    if mode != "offline":
+        _token()
+    if mode == "llm" and facts is None:
+        facts = _executive_facts(bundle)
+    template = load_template("detailed_prompt")
+    for i, action in enumerate(actions):
+        if i:
+            yield "\n\n"
+        if mode == "llm":
+            yield from _stream(*_detailed_request(action, facts), name="detailed")
+            continue
+        values = _detail_values(action)
+        if mode == "template":
+            values["rationale"] = _inline(_stream(*_detailed_narrative_request(values, i + 1, len(actions)),
+                                                  name="detailed"))
+        else:
+            values["rationale"] = _offline_detailed_rationale(values, i + 1, len(actions))
+        yield from template.render_iter(values)
+
+def stream_followup_response(question: str, bundle: RecommendationBundle,
+                             context: FollowupContext | None = None) -> Iterator[str]:
+    _require_online()
+    _token()
+    messages, cache_facts, creative = _followup_prompt(question, bundle, context)
+    parts = []
+    for chunk in _stream(messages, 300, cache_facts, FOLLOWUP_TEMPLATE, bypass_cache=creative, name="followup"):
+        parts.append(chunk)
+        yield chunk
+    if context is not None:
+        context.record(question, "".join(parts))
+
+# Sync wrappers for the CLI and Streamlit
+
+def generate_executive_summary(bundle: RecommendationBundle, facts: dict) -> str:
+    return _run(generate_executive_summary_async(bundle, facts))
+
+def generate_detailed_breakdown(actions: list[ActionRecommendation], facts: dict) -> str:
+    return _run(generate_detailed_breakdown_async(actions, facts))
+
+def synthesize_recommendations(bundle: RecommendationBundle, mode: str | None = None) -> dict:
+    # Coalesce across threads (each _run() has its own event loop)
+    key = ("synthesize", _render_mode(mode), content_key(bundle))
+    return get_single_flight().do(key, lambda: _run(synthesize_recommendations_async(bundle, mode)))
+
+def followup_response(question: str, bundle: RecommendationBundle, context: FollowupContext | None = None) -> str:
+    return _run(followup_response_async(question, bundle, context))
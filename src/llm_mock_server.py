@@ -0,0 +1,156 @@
+# Local OpenAI-compatible stand-in for the chat completions endpoint.
+# Replays canned completions with configurable time-to-first-token, token
+# throughput, server-side concurrency (requests beyond it queue, like GPU slots)
+# and an optional error rate, so load tests and offline runs need no quota.
+#
+#   python -m src.llm_mock_server --port 8080 --ttft 0.3 --tokens-per-second 40
+#   LLM_BASE_URL=http://127.0.0.1:8080 streamlit run examples/ui.py
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .llm_backend import CANNED_REPLIES, canned_reply, split_tokens
+
+class MockLLMServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ttft_s: float = 0.2,
+                 tokens_per_s: float | None = 50.0, max_concurrency: int | None = None,
+                 error_rate: float = 0.0, replies=CANNED_REPLIES):
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.replies = tuple(replies)
+        self.requests = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._count_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self) -> None:
+        with self._count_lock:
+            self.requests += 1
+
+def _chunk_event(model: str, delta: dict, finish_reason=None) -> bytes:
+    event = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+             "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+    return f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+def _handler(server: MockLLMServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.rstrip("/") in ("/health", "/v1/models"):
+                self._send_json(200, {"status": "ok", "requests": server.requests})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": "not found"})
+                return
+            server._count()
+            if server.error_rate and random.random() < server.error_rate:
+                self._send_json(503, {"error": "overloaded"})
+                return
+            if server._slots is not None:
+                server._slots.acquire()
+            try:
+                self._complete(body)
+            finally:
+                if server._slots is not None:
+                    server._slots.release()
+
+        def _complete(self, body: dict) -> None:
+            model = body.get("model") or "mock"
+            tokens = split_tokens(canned_reply(body.get("messages") or [], server.replies), body.get("max_tokens"))
+            per_token = 1.0 / server.tokens_per_s if server.tokens_per_s else 0.0
+            time.sleep(server.ttft_s)
+            if not body.get("stream"):
+                time.sleep(per_token * len(tokens))
+                text = "".join(tokens)
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+                })
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(per_token)
+                self._write_chunk(_chunk_event(model, {"role": "assistant", "content": token}))
+            self._write_chunk(_chunk_event(model, {}, "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+    return Handler
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="0 for instant completions")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Requests served at once; the rest queue")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+    server = MockLLMServer(args.host, args.port, args.ttft, args.tokens_per_second or None,
+                           args.max_concurrency, args.error_rate)
+    print(f"Mock LLM server on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
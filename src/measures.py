@@ -0,0 +1,216 @@
+# Declarative measure catalog evaluated over whole portfolios.
+# Each MeasureSpec names the customer facts it needs, a batch calculator (array
+# in, array out, built on engine/batch.py), its constants, the conditions under
+# which it applies, and its action type, which is the key into the UK rule
+# table and SECTOR_MULTIPLIERS. evaluate_measures() runs every measure once over
+# the customers it applies to, applies the rules in the same batch and returns
+# an ActionTable; the cost per extra measure is a few array operations, not a
+# Python call chain per customer.
+
+import string
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .action_table import ActionTable, CATEGORICAL_FIELDS, default_pools
+from .engine.batch import co2_from_kwh_batch, lighting_retrofit_savings_batch, payback_months_batch
+from .engine.calculations import get_grid_carbon
+from .rules.engine import Condition, RuleSet, conditions_mask
+from .rules.uk_rules import ACTION_TYPES, UK_RULESET
+from .telemetry import traced
+
+MIN_RATE_GBP_PER_KWH = 0.0001  # Floor for converting £ savings back to kWh
+
+# Calculators: (input columns at the applicable customers, params) -> annual kWh and £ saved
+
+def lighting_retrofit(cols: dict, current_w_per_fixture: float, new_w_per_fixture: float,
+                      n_fixtures: float) -> tuple[np.ndarray, np.ndarray]:
+    out = lighting_retrofit_savings_batch(current_w_per_fixture, new_w_per_fixture, n_fixtures,
+                                          cols["operating_hours_per_day"], cols["unit_rate_p_per_kwh"])
+    return out["annual_kwh_saved"], out["annual_savings_gbp"]
+
+def fixed_savings(cols: dict, annual_savings_gbp: float) -> tuple[np.ndarray, np.ndarray]:
+    """A flat £ estimate; kWh saved is the £ figure at the customer's unit rate."""
+    rate_gbp = np.maximum(cols["unit_rate_p_per_kwh"] / 100.0, MIN_RATE_GBP_PER_KWH)
+    savings = np.full(len(rate_gbp), float(annual_savings_gbp))
+    return savings / rate_gbp, savings
+
+@dataclass(frozen=True, slots=True)
+class MeasureSpec:
+    title: str
+    category: str  # "no-capex", "capex"
+    action_type: str  # Rule-table and SECTOR_MULTIPLIERS key (see ACTION_TYPES)
+    calculator: Callable
+    inputs: tuple[str, ...]  # Fact columns the calculator reads
+    capex_gbp: float
+    params: dict = field(default_factory=dict)
+    when: tuple[Condition, ...] = ()  # Customers the measure applies to
+    short_term_impact: str = ""
+    long_term_impact: str = ""
+    operational_disruption: str = "Low"
+    confidence: float | None = None  # None: 1.0 less 0.2 per missing/defaulted input (confidence_score)
+    assumptions: tuple[str, ...] = ()  # May reference fact columns, e.g. "{operating_hours_per_day:g} hours/day"
+
+MEASURE_CATALOG = (
+    MeasureSpec(
+        title="LED Lighting Retrofit",
+        category="capex",
+        action_type="lighting",
+        calculator=lighting_retrofit,
+        inputs=("operating_hours_per_day", "unit_rate_p_per_kwh"),
+        capex_gbp=1600,
+        params={"current_w_per_fixture": 50, "new_w_per_fixture": 12, "n_fixtures": 40},
+        short_term_impact="Energy savings from day 1, capex paid in 19 months",
+        long_term_impact="Ongoing savings, LED lifespan 10+ years",
+        operational_disruption="Low",
+        assumptions=("Unit rate derived from bill", "{operating_hours_per_day:g} hours/day operation"),
+    ),
+    MeasureSpec(
+        title="Smart HVAC Tuning",
+        category="no-capex",
+        action_type="hvac",
+        calculator=fixed_savings,
+        inputs=("unit_rate_p_per_kwh",),
+        capex_gbp=200,
+        params={"annual_savings_gbp": 600.0},
+        short_term_impact="Immediate tuning benefits",
+        long_term_impact="Sustained efficiency",
+        operational_disruption="Low",
+        confidence=0.9,
+        assumptions=("Conservative savings estimate",),
+    ),
+    MeasureSpec(
+        title="Solar Panel Installation",
+        category="capex",
+        action_type="solar",
+        calculator=fixed_savings,
+        inputs=("unit_rate_p_per_kwh",),
+        capex_gbp=10000,
+        params={"annual_savings_gbp": 1200.0},
+        # Sites with interval data get a sized installation from engine/sizing.py instead
+        when=(Condition("has_intervals", "!=", 1),),
+        short_term_impact="Installation period",
+        long_term_impact="Long-term clean energy",
+        operational_disruption="Medium",
+        confidence=0.8,
+        assumptions=("Based on average UK solar incentives",),
+    ),
+)
+
+@dataclass
+class MeasureResult:
+    table: ActionTable  # One row per (customer, applicable measure), rules applied
+    annual_kwh_saved: np.ndarray  # Per row; CO₂ basis
+    measure: np.ndarray  # int32 per row: index into the catalog
+
+def _check_catalog(catalog) -> None:
+    for spec in catalog:
+        known = ACTION_TYPES.get(spec.title)
+        if known is not None and known != spec.action_type:
+            raise ValueError(f"{spec.title}: action type {spec.action_type!r} but ACTION_TYPES says {known!r}")
+
+_check_catalog(MEASURE_CATALOG)
+
+def _grid_intensity(facts: dict, n: int) -> np.ndarray:
+    """get_grid_carbon() of each customer's postcode or region label ("EU", "India", ...),
+    called once per distinct value so the batch and the pipeline agree.
+    """
+    location = facts.get("postcode")
+    if location is None:
+        return np.full(n, get_grid_carbon(None))
+    codes, uniques = pd.factorize(pd.Series(location, dtype=object), use_na_sentinel=False)
+    per_value = np.array([get_grid_carbon(u if isinstance(u, str) else None) for u in uniques], dtype=np.float64)
+    return np.broadcast_to(per_value[codes], (n,))
+
+def _assumption_codes(template: str, facts: dict, cust: np.ndarray, pool) -> np.ndarray:
+    """Pool codes of a (possibly templated) assumption for each row; each distinct value is formatted once."""
+    names = [f for _, f, _, _ in string.Formatter().parse(template) if f]
+    if not names:
+        return np.full(len(cust), pool.code(template), dtype=np.int32)
+    codes, uniques = zip(*(pd.factorize(pd.Series(facts[f][cust], dtype=object), use_na_sentinel=False)
+                           for f in names))
+    combos, inverse = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+    texts = [template.format(**{f: uniques[j][c] for j, (f, c) in enumerate(zip(names, combo))})
+             for combo in combos.tolist()]
+    return pool.codes(texts)[inverse.reshape(-1)]
+
+@traced()
+def evaluate_measures(facts: dict, catalog=MEASURE_CATALOG, ruleset: RuleSet = UK_RULESET,
+                      effects=("eligibility", "multiplier", "grant", "tag"), grid_gco2_per_kwh=None) -> MeasureResult:
+    """Every applicable catalog measure for every customer in `facts` (see build_facts).
+
+    Missing inputs are filled by the rule set's conservative defaults. `effects` selects
+    which rule effects to apply (the pipeline passes () and applies rules in later
+    stages); ineligible rows are dropped and multipliers scale savings. CO₂ uses
+    `grid_gco2_per_kwh` (scalar or per customer), else get_grid_carbon() of each customer's postcode.
+    """
+    n = max((len(v) for v in facts.values()), default=1)
+    filled, defaulted = ruleset.fill_defaults(facts)
+    defaulted_fields = {ruleset.rules[i].field: hit for i, hit in defaulted.items()}
+    grid = (_grid_intensity(filled, n) if grid_gco2_per_kwh is None
+            else np.broadcast_to(np.asarray(grid_gco2_per_kwh, dtype=np.float64), (n,)))
+
+    pools = default_pools()
+    customer, measure, kwh, savings, capex, confidence = [], [], [], [], [], []
+    assumption_counts, assumption_codes = [], []
+    for m, spec in enumerate(catalog):
+        rows = np.flatnonzero(conditions_mask(spec.when, filled, n))
+        if not len(rows):
+            continue
+        cols = {name: filled[name][rows] for name in spec.inputs}
+        k, s = spec.calculator(cols, **spec.params)
+        customer.append(rows)
+        measure.append(np.full(len(rows), m, dtype=np.int32))
+        kwh.append(np.asarray(k, dtype=np.float64))
+        savings.append(np.asarray(s, dtype=np.float64))
+        capex.append(np.full(len(rows), float(spec.capex_gbp)))
+        if spec.confidence is not None:
+            confidence.append(np.full(len(rows), float(spec.confidence)))
+        else:
+            missing = sum((defaulted_fields.get(name, np.zeros(n, dtype=bool))[rows].astype(np.int64)
+                           for name in spec.inputs), np.zeros(len(rows), dtype=np.int64))
+            confidence.append(np.maximum(0.0, np.round(1.0 - 0.2 * missing, 2)))
+        codes = [_assumption_codes(t, filled, rows, pools["assumptions_list"]) for t in spec.assumptions]
+        assumption_counts.append(np.full(len(rows), len(codes), dtype=np.int64))
+        assumption_codes.append(np.column_stack(codes).ravel() if codes else np.empty(0, dtype=np.int32))
+
+    if not customer:
+        empty = np.empty(0, dtype=np.int32)
+        return MeasureResult(ActionTable.from_actions([]), np.empty(0), empty)
+    customer, measure = np.concatenate(customer), np.concatenate(measure)
+    kwh, savings, capex = np.concatenate(kwh), np.concatenate(savings), np.concatenate(capex)
+
+    evaluation = ruleset.evaluate(filled, measure, customer, effects=effects,
+                                  types=[spec.action_type for spec in catalog])
+    savings = savings * evaluation.multiplier
+    rule_codes = pools["rule_ids_applied"].codes([r.rule_id for r in ruleset.rules])
+    codes = {}
+    for f in CATEGORICAL_FIELDS:
+        per_measure = np.array([pools[f].code(getattr(spec, f)) for spec in catalog], dtype=np.int32)
+        codes[f] = per_measure[measure]
+    table = ActionTable(
+        customer=customer.astype(np.int32),
+        numeric={
+            "capex_gbp": capex,
+            "annual_savings_gbp": savings,
+            "payback_months": payback_months_batch(capex, savings),
+            "co2_savings_tonnes_per_year": co2_from_kwh_batch(kwh, grid[customer]),
+            "confidence": np.concatenate(confidence),
+        },
+        codes=codes,
+        list_offsets={
+            "assumptions_list": np.concatenate(([0], np.cumsum(np.concatenate(assumption_counts)))),
+            "rule_ids_applied": evaluation.fired_offsets,
+        },
+        list_codes={
+            "assumptions_list": np.concatenate(assumption_codes).astype(np.int32),
+            "rule_ids_applied": rule_codes[evaluation.fired_codes] if len(rule_codes) else evaluation.fired_codes,
+        },
+        pools=pools,
+    )
+    keep = evaluation.eligible
+    if keep.all():
+        return MeasureResult(table, kwh, measure)
+    return MeasureResult(table.take(keep), kwh[keep], measure[keep])
@@ -0,0 +1,262 @@
+# Staged recommendation pipeline shared by the CLI and the Streamlit app.
+#
+#   ingest -> bill -> measures -> carbon(region) -> industry -> rules -> rank [-> llm]
+#
+# Each stage's output is memoised under a key chained from its upstream key and
+# its own parameters, so changing the industry only re-applies the multipliers
+# and re-ranks, changing the region re-costs CO₂ from there on, and the expensive
+# parsing and solar/battery sizing run once per input file.
+
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+
+import pandas as pd
+
+from .schemas import ActionRecommendation, BillRecord, IntervalData, RecommendationBundle
+from .ingest import CONSUMPTION_COLUMN, TIME_COLUMN, interval_data_from_frame, is_xlsx, load_interval_data
+from .engine.calculations import co2_from_kwh, derive_unit_rate, get_grid_carbon, payback_months
+from .engine.tariff import SAMPLE_GRID_TOU, Tariff, bill_from_intervals
+from .engine.sizing import SizingResult, size_solar, solar_installation_action
+from .engine.storage import BatterySizing, battery_storage_action, size_battery
+from .engine.carbon import intensity_for
+from .measures import evaluate_measures
+from .rules.engine import RuleEvaluation, build_facts
+from .rules.uk_rules import UK_RULESET, action_type
+from .scoring import DEFAULT_WEIGHTS, filter_feasible, rank_actions
+from .singleflight import content_key
+from .telemetry import count, span
+
+STAGES = ("ingest", "bill", "measures", "carbon", "industry", "rules", "rank", "llm")
+DEFAULT_STAGE_CACHE_SIZE = 8
+
+@dataclass(slots=True)
+class SiteProfile:
+    floor_area_m2: float = 120
+    operating_hours_per_day: float = 12
+
+@dataclass(slots=True)
+class Ingested:
+    intervals: IntervalData | None  # Interval (Time slot) files
+    frame: pd.DataFrame | None  # kwh/cost_gbp summary files
+
+@dataclass(slots=True)
+class BillStage:
+    bill: BillRecord
+    unit_rate_p_per_kwh: float
+
+@dataclass(slots=True)
+class Measure:
+    action: ActionRecommendation  # CO₂ is filled in by the carbon stage
+    annual_kwh_saved: float = 0.0  # CO₂ basis for measures without an interval profile
+
+@dataclass(slots=True)
+class BaseMeasures:
+    measures: list[Measure]
+    solar: SizingResult | None = None
+    battery: BatterySizing | None = None
+
+@dataclass(slots=True)
+class StageTiming:
+    stage: str
+    seconds: float
+    cached: bool
+
+@dataclass(slots=True)
+class PipelineResult:
+    bundle: RecommendationBundle
+    bill: BillRecord
+    unit_rate_p_per_kwh: float
+    grid_gco2_per_kwh: float
+    timings: list[StageTiming]
+
+# Stage functions: plain inputs in, typed outputs out
+
+def ingest(source) -> Ingested:
+    """Read a bill: a CSV/XLSX path, the raw bytes of an upload, or an already-loaded DataFrame.
+    Interval files go through the parsed-input cache, so re-reading the same content is a memory map.
+    """
+    if isinstance(source, pd.DataFrame):
+        if TIME_COLUMN in source.columns and CONSUMPTION_COLUMN in source.columns:
+            return Ingested(interval_data_from_frame(source), None)
+        return Ingested(None, source)
+    if is_xlsx(source):
+        return Ingested(load_interval_data(source), None)
+    readable = io.BytesIO(source) if isinstance(source, bytes) else source
+    header = pd.read_csv(readable, nrows=0, encoding="utf-8-sig").columns
+    if TIME_COLUMN in header and CONSUMPTION_COLUMN in header:
+        return Ingested(load_interval_data(source), None)
+    if isinstance(readable, io.BytesIO):
+        readable.seek(0)
+    return Ingested(None, pd.read_csv(readable, encoding="utf-8-sig"))
+
+def price_bill(data: Ingested, tariff: Tariff = SAMPLE_GRID_TOU) -> BillStage:
+    if data.intervals is not None:
+        bill = bill_from_intervals(data.intervals, tariff)
+    elif data.frame is not None and "kwh" in data.frame.columns and "cost_gbp" in data.frame.columns:
+        df = data.frame
+        bill = BillRecord(
+            total_kwh=df['kwh'].sum(),
+            total_cost_gbp=df['cost_gbp'].sum(),
+            standing_charge_per_day=tariff.standing_charge_gbp_per_day,
+            start_date=pd.to_datetime(df['date'].min()).date() if 'date' in df.columns else date.today().replace(day=1, month=1),
+            end_date=pd.to_datetime(df['date'].max()).date() if 'date' in df.columns else date.today()
+        )
+    else:
+        raise ValueError("CSV must have 'kwh' and 'cost_gbp' or 'Consumption (kWh)' and 'Time slot'.")
+    return BillStage(bill, derive_unit_rate(bill))
+
+def base_measures(data: Ingested, bill: BillStage, site: SiteProfile, tariff: Tariff = SAMPLE_GRID_TOU) -> BaseMeasures:
+    """Region- and industry-independent savings: kWh and £ before multipliers, plus sizing."""
+    facts = build_facts(unit_rate_p_per_kwh=bill.unit_rate_p_per_kwh, floor_area_m2=site.floor_area_m2,
+                        operating_hours_per_day=site.operating_hours_per_day, has_intervals=data.intervals is not None)
+    # Rules run in their own stages so changing the industry does not re-evaluate the catalog
+    result = evaluate_measures(facts, effects=(), grid_gco2_per_kwh=0.0)
+    measures = [Measure(a, k) for a, k in zip(result.table.to_actions(), result.annual_kwh_saved.tolist())]
+    if data.intervals is not None:
+        # Size panels and battery on the actual interval profile; the carbon stage prices CO₂
+        return BaseMeasures(measures, size_solar(data.intervals, tariff), size_battery(data.intervals, tariff))
+    return BaseMeasures(measures)
+
+def apply_carbon(data: Ingested, base: BaseMeasures, region: str,
+                 tariff: Tariff = SAMPLE_GRID_TOU) -> tuple[float, list[ActionRecommendation]]:
+    """CO₂ for every measure at the region's grid intensity (per interval where available)."""
+    grid = get_grid_carbon(region)
+    actions = [replace(m.action, co2_savings_tonnes_per_year=co2_from_kwh(m.annual_kwh_saved, grid))
+               for m in base.measures]
+    if data.intervals is not None:
+        intensity = intensity_for(data.intervals.timestamps, region)
+        actions.append(solar_installation_action(data.intervals, intensity, grid_tariff=tariff, sizing=base.solar))
+        actions.append(battery_storage_action(data.intervals, intensity, tariff, sizing=base.battery))
+    return grid, actions
+
+def _evaluate_rules(actions: list[ActionRecommendation], effects: tuple, **facts) -> RuleEvaluation:
+    types = [action_type(a.title) for a in actions]
+    return UK_RULESET.evaluate(build_facts(**facts), types, effects=effects)
+
+def _with_rule_ids(action: ActionRecommendation, rule_ids: list[str]) -> ActionRecommendation:
+    merged = list(dict.fromkeys(action.rule_ids_applied + rule_ids))
+    return action if merged == action.rule_ids_applied else replace(action, rule_ids_applied=merged)
+
+def apply_industry(actions: list[ActionRecommendation], industry: str) -> list[ActionRecommendation]:
+    """Sector multipliers from the rule table, applied to annual savings."""
+    evaluation = _evaluate_rules(actions, ("multiplier",), industry=industry or "")
+    out = []
+    for a, m, rule_ids in zip(actions, evaluation.multiplier.tolist(), evaluation.rule_id_lists()):
+        if m != 1.0:
+            savings = a.annual_savings_gbp * m
+            a = replace(a, annual_savings_gbp=savings, payback_months=payback_months(a.capex_gbp, savings),
+                        rule_ids_applied=list(dict.fromkeys(a.rule_ids_applied + rule_ids)))
+        out.append(a)
+    return out
+
+def apply_rules(actions: list[ActionRecommendation], site: SiteProfile | None = None,
+                industry: str | None = None, postcode: str | None = None) -> list[ActionRecommendation]:
+    """Drop measures the site is not eligible for and attribute eligibility, grant and tag rules.
+    `postcode` may be a UK postcode (country-specific grants) or a region label.
+    """
+    site = site or SiteProfile()
+    evaluation = _evaluate_rules(actions, ("eligibility", "grant", "tag"), floor_area_m2=site.floor_area_m2,
+                                 operating_hours_per_day=site.operating_hours_per_day, industry=industry or "",
+                                 postcode=postcode or "")
+    return [_with_rule_ids(a, rule_ids)
+            for a, eligible, rule_ids in zip(actions, evaluation.eligible.tolist(), evaluation.rule_id_lists())
+            if eligible]
+
+def rank(actions: list[ActionRecommendation], weights=None) -> list[ActionRecommendation]:
+    return rank_actions(filter_feasible(actions), weights)
+
+def _source_key(source) -> str:
+    if isinstance(source, pd.DataFrame):
+        return content_key("frame", pd.util.hash_pandas_object(source, index=True).values.tobytes().hex())
+    if isinstance(source, bytes):
+        return content_key("bytes", hashlib.sha256(source).hexdigest())
+    st = os.stat(source)
+    return content_key("file", os.path.abspath(source), st.st_size, st.st_mtime_ns)
+
+class Pipeline:
+    """Runs the stages with per-stage memoisation (a small LRU per stage) and timings.
+    Safe to share between threads; two threads missing the same stage at once both compute it.
+    """
+
+    def __init__(self, site: SiteProfile | None = None, tariff: Tariff = SAMPLE_GRID_TOU,
+                 weights: dict | None = None, cache_size: int = DEFAULT_STAGE_CACHE_SIZE):
+        self.site = site or SiteProfile()
+        self.tariff = tariff
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.cache_size = cache_size
+        self._memo = {stage: OrderedDict() for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def _stage(self, stage: str, key: str, timings: list, fn, *args):
+        memo = self._memo[stage]
+        with self._lock:
+            if key in memo:
+                memo.move_to_end(key)
+                timings.append(StageTiming(stage, 0.0, True))
+                count("pipeline_stage_runs", stage=stage, cached="true")
+                return memo[key]
+        count("pipeline_stage_runs", stage=stage, cached="false")
+        start = time.perf_counter()
+        with span(f"pipeline.{stage}"):
+            value = fn(*args)
+        timings.append(StageTiming(stage, time.perf_counter() - start, False))
+        with self._lock:
+            memo[key] = value
+            if len(memo) > self.cache_size:
+                memo.popitem(last=False)
+        return value
+
+    def run(self, source, region: str, industry: str, bill_source: str | None = None) -> PipelineResult:
+        """Build the ranked recommendation bundle for a bill (see ingest() for accepted sources).
+        `region` is a label (UK, EU, India, Other) or a UK postcode, which selects the regional
+        grid carbon intensity and country-specific grants.
+        """
+        with span("pipeline.run", region=region, industry=industry):
+            return self._run(source, region, industry, bill_source)
+
+    def _run(self, source, region: str, industry: str, bill_source: str | None) -> PipelineResult:
+        timings: list[StageTiming] = []
+        k_in = _source_key(source)
+        data = self._stage("ingest", k_in, timings, ingest, source)
+        k_bill = content_key("bill", k_in, self.tariff)  # Bands and standing charge, not just the name
+        bill = self._stage("bill", k_bill, timings, price_bill, data, self.tariff)
+        k_base = content_key("measures", k_bill, self.site)
+        base = self._stage("measures", k_base, timings, base_measures, data, bill, self.site, self.tariff)
+        k_carbon = content_key("carbon", k_base, region)
+        grid, actions = self._stage("carbon", k_carbon, timings, apply_carbon, data, base, region, self.tariff)
+        k_industry = content_key("industry", k_carbon, industry)
+        actions = self._stage("industry", k_industry, timings, apply_industry, actions, industry)
+        k_rules = content_key("rules", k_industry)
+        actions = self._stage("rules", k_rules, timings, apply_rules, actions, self.site, industry, region)
+        k_rank = content_key("rank", k_rules, self.weights)
+        ranked = self._stage("rank", k_rank, timings, rank, actions, self.weights)
+
+        bundle = RecommendationBundle(
+            customer_id=f"User from {region}",
+            generated_at=str(datetime.now()),
+            executive_summary={},
+            detailed=list(ranked),
+            scoring_weights=dict(self.weights),
+            provenance={
+                "bill_source": bill_source or (os.fspath(source) if isinstance(source, (str, os.PathLike)) else "uploaded"),
+                "calculations": "deterministic",
+                "industry": industry,
+                "region": region,
+            }
+        )
+        return PipelineResult(bundle, bill.bill, bill.unit_rate_p_per_kwh, grid, timings)
+
+    def synthesize(self, result: PipelineResult, mode: str | None = None) -> dict:
+        """LLM stage: executive summary and detailed breakdown for a run's bundle."""
+        from .llm_layer import synthesize_recommendations
+        key = content_key("llm", result.bundle, mode)
+        return self._stage("llm", key, result.timings, synthesize_recommendations, result.bundle, mode)
+
+def format_timings(timings: list[StageTiming]) -> str:
+    return ", ".join(f"{t.stage} {'cached' if t.cached else f'{t.seconds * 1000:.1f} ms'}" for t in timings)
@@ -0,0 +1,138 @@
+# Budget-constrained selection of action sets on top of the scored actions.
+# A 0/1 knapsack over capex (discretised into capex steps) is solved with one
+# vectorised DP row update per candidate, so a site with hundreds of measures
+# costs O(n_actions x budget_steps) array work rather than 2^n enumeration.
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .schemas import ActionRecommendation
+from .action_table import ActionTable, DISRUPTION_LEVELS
+
+OBJECTIVES = {"savings": "annual_savings_gbp", "co2": "co2_savings_tonnes_per_year"}
+DEFAULT_CAPEX_STEP_GBP = 50.0
+MAX_BUDGET_STEPS = 20_000  # Coarsen the capex step beyond this to bound DP memory
+
+@dataclass
+class PortfolioSelection:
+    indices: list[int]  # Positions in the input actions/rows
+    capex_gbp: float
+    annual_savings_gbp: float
+    co2_savings_tonnes_per_year: float
+
+def _columns(actions) -> dict:
+    table = actions if isinstance(actions, ActionTable) else ActionTable.from_actions(list(actions))
+    levels = np.array([DISRUPTION_LEVELS.index(v) if v in DISRUPTION_LEVELS else 1
+                       for v in table.pools["operational_disruption"].values], dtype=np.int64)
+    return {
+        "capex_gbp": np.maximum(np.nan_to_num(table.capex_gbp, nan=0.0), 0.0),
+        "annual_savings_gbp": table.annual_savings_gbp,
+        "co2_savings_tonnes_per_year": table.co2_savings_tonnes_per_year,
+        "payback_months": table.payback_months,
+        "disruption": levels[table.operational_disruption] if len(table) else np.empty(0, dtype=np.int64),
+    }
+
+def _eligible(cols: dict, objective: str, max_payback_months: float | None, max_disruption: str) -> np.ndarray:
+    ok = cols[OBJECTIVES[objective]] > 0
+    ok &= cols["disruption"] <= DISRUPTION_LEVELS.index(max_disruption)
+    if max_payback_months is not None:
+        ok &= cols["payback_months"] <= max_payback_months
+    return ok
+
+def _selection(cols: dict, idx) -> PortfolioSelection:
+    idx = sorted(int(i) for i in idx)
+    return PortfolioSelection(
+        indices=idx,
+        capex_gbp=float(cols["capex_gbp"][idx].sum()),
+        annual_savings_gbp=float(cols["annual_savings_gbp"][idx].sum()),
+        co2_savings_tonnes_per_year=float(cols["co2_savings_tonnes_per_year"][idx].sum()),
+    )
+
+def _knapsack(weights: np.ndarray, values: np.ndarray, capacity: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return (best value for each capacity 0..capacity, take matrix) for a 0/1 knapsack."""
+    best = np.zeros(capacity + 1)
+    take = np.zeros((len(weights), capacity + 1), dtype=bool)
+    for i, (w, v) in enumerate(zip(weights.tolist(), values.tolist())):
+        if w > capacity:
+            continue
+        candidate = best[:capacity + 1 - w] + v  # Built from the previous row before updating
+        improved = candidate > best[w:]
+        take[i, w:] = improved
+        best[w:] = np.where(improved, candidate, best[w:])
+    return best, take
+
+def _reconstruct(take: np.ndarray, weights: np.ndarray, capacity: int) -> list[int]:
+    chosen, b = [], capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if take[i, b]:
+            chosen.append(i)
+            b -= int(weights[i])
+    return chosen
+
+def _discretise(capex: np.ndarray, budget: float, step: float) -> tuple[np.ndarray, int]:
+    step = max(step, budget / MAX_BUDGET_STEPS)
+    # Round capex up so a selection never exceeds the real budget
+    return np.ceil(capex / step - 1e-9).astype(np.int64), int(math.floor(budget / step + 1e-9))
+
+def select_portfolio(actions, budget_gbp: float, objective: str = "savings",
+                     max_payback_months: float | None = None, max_disruption: str = "High",
+                     capex_step_gbp: float = DEFAULT_CAPEX_STEP_GBP) -> PortfolioSelection:
+    """Pick the subset of actions maximising annual savings (objective="savings") or CO₂
+    (objective="co2") with total capex within `budget_gbp`. Actions above `max_payback_months`
+    or more disruptive than `max_disruption` are excluded. Accepts a list of
+    ActionRecommendation or an ActionTable for one site.
+    """
+    if not budget_gbp >= 0:
+        raise ValueError(f"budget_gbp must be a non-negative number, got {budget_gbp!r}")
+    cols = _columns(actions)
+    ok = np.flatnonzero(_eligible(cols, objective, max_payback_months, max_disruption))
+    capex = cols["capex_gbp"][ok]
+    values = cols[OBJECTIVES[objective]][ok]
+    if capex.sum() <= budget_gbp:
+        return _selection(cols, ok)  # Everything eligible fits
+    weights, capacity = _discretise(capex, budget_gbp, capex_step_gbp)
+    _, take = _knapsack(weights, values, capacity)
+    return _selection(cols, ok[_reconstruct(take, weights, capacity)])
+
+def pareto_frontier(actions, max_budget_gbp: float | None = None,
+                    max_payback_months: float | None = None, max_disruption: str = "High",
+                    capex_step_gbp: float = DEFAULT_CAPEX_STEP_GBP) -> list[PortfolioSelection]:
+    """Cost vs. carbon frontier: for each capex level, the action set with the most CO₂ saved.
+    Returns selections in increasing capex where each one saves strictly more CO₂ than the last.
+    """
+    cols = _columns(actions)
+    ok = np.flatnonzero(_eligible(cols, "co2", max_payback_months, max_disruption))
+    capex = cols["capex_gbp"][ok]
+    values = cols["co2_savings_tonnes_per_year"][ok]
+    budget = float(capex.sum()) if max_budget_gbp is None else max_budget_gbp
+    if len(ok) == 0:
+        return [_selection(cols, [])]
+    weights, capacity = _discretise(capex, max(budget, 0.0), capex_step_gbp)
+    best, take = _knapsack(weights, values, capacity)
+    levels = np.flatnonzero(np.concatenate(([True], best[1:] > best[:-1] + 1e-12)))
+    return [_selection(cols, ok[_reconstruct(take, weights, int(b))]) for b in levels]
+
+def select_portfolios(table: ActionTable, budget_gbp, objective: str = "savings",
+                      max_payback_months: float | None = None, max_disruption: str = "High",
+                      capex_step_gbp: float = DEFAULT_CAPEX_STEP_GBP) -> dict:
+    """select_portfolio() for every customer in a table. `budget_gbp` is a scalar or a
+    per-customer mapping/array indexed by customer. Returns {customer: PortfolioSelection}
+    with indices referring to rows of `table`.
+    """
+    order = np.argsort(table.customer, kind="stable")
+    cust = table.customer[order]
+    bounds = np.flatnonzero(np.concatenate(([True], cust[1:] != cust[:-1], [True]))) if len(cust) else []
+    out = {}
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        rows = order[start:stop]
+        c = int(cust[start])
+        budget = budget_gbp if np.isscalar(budget_gbp) else budget_gbp[c]
+        sel = select_portfolio(table.take(rows), budget, objective, max_payback_months, max_disruption, capex_step_gbp)
+        sel.indices = rows[sel.indices].tolist()
+        out[c] = sel
+    return out
+
+def selected_actions(actions: list[ActionRecommendation], selection: PortfolioSelection) -> list[ActionRecommendation]:
+    return [actions[i] for i in selection.indices]
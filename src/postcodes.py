@@ -0,0 +1,204 @@
+# UK postcode -> country, DNO licence area, carbon-intensity region and grant
+# schemes. The bundled table (data/uk_postcode_areas.csv) has one row per
+# postcode area ("SW") plus district rows ("SY16") where a district differs
+# from its area. It is compiled once into sorted fixed-width keys and small
+# integer code columns, stored as .npy files keyed by the CSV's content hash,
+# and memory-mapped on later loads. Lookups are a binary search on the district
+# and then the area (about a microsecond); single lookups are also memoised,
+# and bulk lookups are vectorised.
+
+import bisect
+import functools
+import os
+import re
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .ingest_cache import content_hash
+from .telemetry import traced
+
+POSTCODE_FILE = os.getenv(
+    "POSTCODE_INDEX_FILE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "uk_postcode_areas.csv")),
+)
+POSTCODE_CACHE_DIR = os.getenv(
+    "POSTCODE_INDEX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ener-gpt", "postcodes"))
+# Bump when the compiled layout changes
+INDEX_FORMAT_VERSION = 1
+KEY_DTYPE = "S4"  # Longest outward code, e.g. "SW1A"
+
+# Fixed vocabularies; the CSV must use these names
+COUNTRIES = ("England", "Scotland", "Wales", "Northern Ireland")
+DNO_REGIONS = ("North Scotland", "South Scotland", "North West", "North East", "Yorkshire",
+               "Merseyside & North Wales", "South Wales", "West Midlands", "East Midlands", "Eastern",
+               "South West", "Southern", "London", "South East", "Northern Ireland")
+# Regions of the GB Carbon Intensity API, plus Northern Ireland (separate grid)
+CARBON_REGIONS = ("North Scotland", "South Scotland", "North West England", "North East England", "Yorkshire",
+                  "North Wales & Merseyside", "South Wales", "West Midlands", "East Midlands", "East England",
+                  "South West England", "South England", "London", "South East England", "Northern Ireland")
+GRANT_SCHEMES = ("boiler-upgrade-scheme", "home-energy-scotland")  # Bit i of the grants column
+
+CODE_COLUMNS = {"country": COUNTRIES, "dno_region": DNO_REGIONS, "carbon_region": CARBON_REGIONS}
+INDEX_COLUMNS = ("keys", *CODE_COLUMNS, "grants")
+
+# Area letters, optional district, optional inward code (spaces removed first)
+_POSTCODE_RE = r"([A-Z]{1,2})(\d[A-Z\d]?)?(\d[A-Z]{2})?"
+_POSTCODE = re.compile(_POSTCODE_RE)
+
+@dataclass(frozen=True, slots=True)
+class PostcodeInfo:
+    prefix: str  # Matched table row: a district ("SY16") or an area ("SY")
+    country: str
+    dno_region: str
+    carbon_region: str
+    grants: tuple[str, ...]
+
+def outward_code(postcode: str) -> tuple[str, str] | None:
+    """(area, outward code) of a postcode or outward code, or None if it does not parse."""
+    m = _POSTCODE.fullmatch("".join((postcode or "").upper().split()))
+    if m is None:
+        return None
+    return m.group(1), m.group(1) + (m.group(2) or "")
+
+def _compile(path: str) -> dict[str, np.ndarray]:
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df["prefix"] = df["prefix"].str.strip().str.upper()
+    df = df.sort_values("prefix", kind="stable")
+    if df["prefix"].duplicated().any():
+        raise ValueError(f"{path}: duplicate prefixes {sorted(set(df['prefix'][df['prefix'].duplicated()]))}")
+    arrays = {"keys": df["prefix"].to_numpy().astype(KEY_DTYPE)}
+    for name, vocab in CODE_COLUMNS.items():
+        unknown = set(df[name]) - set(vocab)
+        if unknown:
+            raise ValueError(f"{path}: unknown {name} {sorted(unknown)}")
+        arrays[name] = np.array([vocab.index(v) for v in df[name]], dtype=np.int8)
+    grants = np.zeros(len(df), dtype=np.uint8)
+    for i, cell in enumerate(df["grants"]):
+        for scheme in filter(None, (s.strip() for s in cell.split(";"))):
+            if scheme not in GRANT_SCHEMES:
+                raise ValueError(f"{path}: unknown grant scheme {scheme!r}")
+            grants[i] |= 1 << GRANT_SCHEMES.index(scheme)
+    arrays["grants"] = grants
+    return arrays
+
+def _store(entry: str, arrays: dict) -> None:
+    tmp = f"{entry}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(tmp)
+        for name in INDEX_COLUMNS:
+            np.save(os.path.join(tmp, f"{name}.npy"), arrays[name])
+        os.rename(tmp, entry)
+    except OSError:
+        # Read-only home, or another process compiled it first; the arrays are still usable
+        shutil.rmtree(tmp, ignore_errors=True)
+
+class PostcodeIndex:
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.keys = arrays["keys"]
+        self.codes = {name: arrays[name] for name in CODE_COLUMNS}
+        self.grant_bits = arrays["grants"]
+        self._key_list = self.keys.tolist()  # bisect on a list beats searchsorted for one key
+        # Names per code with a trailing None for "not found" (index -1)
+        self._names = {name: np.asarray(vocab + (None,), dtype=object) for name, vocab in CODE_COLUMNS.items()}
+
+    @classmethod
+    def load(cls, path: str = POSTCODE_FILE, cache_dir: str | None = POSTCODE_CACHE_DIR) -> "PostcodeIndex":
+        """Memory-map the compiled index for `path`, compiling it on first use."""
+        if cache_dir is None:
+            return cls(_compile(path))
+        entry = os.path.join(cache_dir, content_hash(path, "postcodes", INDEX_FORMAT_VERSION))
+        try:
+            return cls({name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r") for name in INDEX_COLUMNS})
+        except (FileNotFoundError, ValueError):
+            pass
+        arrays = _compile(path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            return cls(arrays)
+        _store(entry, arrays)
+        return cls(arrays)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _find(self, queries: np.ndarray) -> np.ndarray:
+        i = np.searchsorted(self.keys, queries)
+        hit = self.keys[np.minimum(i, len(self.keys) - 1)] == queries
+        return np.where(hit, i, -1)
+
+    def row(self, postcode: str) -> int:
+        """Table row for one postcode (district row if present, else area row), or -1."""
+        parsed = outward_code(postcode)
+        if parsed is None or len(parsed[1]) > 4:
+            return -1
+        area, outward = (s.encode("ascii") for s in parsed)
+        for key in (outward, area):
+            i = bisect.bisect_left(self._key_list, key)
+            if i < len(self._key_list) and self._key_list[i] == key:
+                return i
+        return -1
+
+    def info(self, row: int) -> PostcodeInfo | None:
+        if row < 0:
+            return None
+        bits = int(self.grant_bits[row])
+        return PostcodeInfo(
+            self.keys[row].decode("ascii"),
+            *(vocab[self.codes[name][row]] for name, vocab in CODE_COLUMNS.items()),
+            tuple(s for b, s in enumerate(GRANT_SCHEMES) if bits >> b & 1),
+        )
+
+    def lookup(self, postcode: str) -> PostcodeInfo | None:
+        return self.info(self.row(postcode))
+
+    @traced()
+    def lookup_many(self, postcodes) -> np.ndarray:
+        """Table rows (-1 where unknown) for a sequence of postcodes; each distinct value is parsed once."""
+        codes, uniques = pd.factorize(pd.Series(postcodes, dtype=object), use_na_sentinel=True)
+        if not len(uniques):
+            return np.full(len(codes), -1, dtype=np.int64)
+        cleaned = pd.Series(uniques, dtype=object).astype(str).str.upper().str.replace(r"\s+", "", regex=True)
+        parts = cleaned.str.extract(f"^{_POSTCODE_RE}$")
+        area = parts[0].fillna("")
+        outward = area + parts[1].fillna("")
+        valid = (area != "") & (outward.str.len() <= 4)
+        rows = self._find(outward.to_numpy().astype(KEY_DTYPE))
+        rows = np.where(rows >= 0, rows, self._find(area.to_numpy().astype(KEY_DTYPE)))
+        rows = np.where(valid.to_numpy(), rows, -1)
+        return np.where(codes >= 0, rows[codes], -1)
+
+    def columns(self, postcodes) -> dict[str, np.ndarray]:
+        """country, dno_region, carbon_region and grants (";"-joined) per postcode; None where unknown."""
+        rows = self.lookup_many(postcodes)
+        found = rows >= 0
+        out = {name: self._names[name][np.where(found, self.codes[name][rows].astype(np.int64), -1)]
+               for name in CODE_COLUMNS}
+        labels = np.asarray([";".join(s for b, s in enumerate(GRANT_SCHEMES) if bits >> b & 1)
+                             for bits in range(1 << len(GRANT_SCHEMES))] + [None], dtype=object)
+        out["grants"] = labels[np.where(found, self.grant_bits[rows].astype(np.int64), -1)]
+        return out
+
+_default_index: PostcodeIndex | None = None
+_default_index_lock = threading.Lock()
+
+def get_postcode_index() -> PostcodeIndex:
+    """Process-wide index for POSTCODE_INDEX_FILE (compiled under POSTCODE_INDEX_CACHE_DIR)."""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = PostcodeIndex.load()
+    return _default_index
+
+@functools.lru_cache(maxsize=65_536)
+def lookup_postcode(postcode: str) -> PostcodeInfo | None:
+    return get_postcode_index().lookup(postcode)
+
+def lookup_postcodes(postcodes) -> dict[str, np.ndarray]:
+    return get_postcode_index().columns(postcodes)
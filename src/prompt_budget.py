@@ -0,0 +1,186 @@
+# Compact prompt serialisation and input-token budgeting for the LLM layer.
+# Facts are written as short "key: value" lines (records as a pipe table)
+# instead of Python reprs, prompts are assembled from prioritised parts that are
+# dropped or truncated to fit a token budget, and follow-up chats keep a
+# byte-stable context prefix with a trimmed turn history.
+
+import math
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from .llm_backend import LLM_MODEL
+
+DEFAULT_INPUT_BUDGET_TOKENS = 2000
+DEFAULT_HISTORY_TURNS = 6
+FLOAT_DECIMALS = 2
+# Tokenizer used for budgets: a Hugging Face model id, a local tokenizer.json, or "estimate"
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", LLM_MODEL)
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+def _load_tokenizer(download: bool):
+    from tokenizers import Tokenizer
+    if os.path.isfile(LLM_TOKENIZER):
+        return Tokenizer.from_file(LLM_TOKENIZER)
+    from huggingface_hub import hf_hub_download
+    # Only tokenizer.json is fetched, into the Hugging Face cache
+    path = hf_hub_download(LLM_TOKENIZER, "tokenizer.json", token=os.getenv("HF_TOKEN"),
+                           local_files_only=not download)
+    return Tokenizer.from_file(path)
+
+_fetched: list = []  # Filled by the background download
+
+def _fetch_tokenizer() -> None:
+    try:
+        _fetched.append(_load_tokenizer(download=True))
+    except Exception:  # Offline, gated model without HF_TOKEN, or tokenizers not installed
+        pass
+
+@lru_cache(maxsize=1)
+def _cached_encoder():
+    if LLM_TOKENIZER == "estimate":
+        return None
+    try:
+        return _load_tokenizer(download=False)
+    except Exception:
+        # Not cached yet: download once in the background rather than stall a prompt on the network
+        threading.Thread(target=_fetch_tokenizer, daemon=True).start()
+        return None
+
+def _encoder():
+    """The configured model's tokenizer, or None while (or if) it is unavailable."""
+    enc = _cached_encoder()
+    if enc is None and _fetched:
+        enc = _fetched[0]
+    return enc
+
+def count_tokens(text: str) -> int:
+    """Token count with the model's tokenizer (LLM_TOKENIZER, default LLM_MODEL). Until it is
+    in the local cache, or when it cannot be loaded at all (offline, gated model without
+    HF_TOKEN, tokenizers missing), a word/punctuation estimate is used instead: BPE
+    tokenizers average about 1.3 tokens per word on English prose.
+    """
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text, add_special_tokens=False).ids)
+    return max(math.ceil(len(_WORD_RE.findall(text)) * 1.3), math.ceil(len(text) / 4))
+
+def _scalar(value) -> str:
+    if hasattr(value, "item"):  # NumPy scalars
+        value = value.item()
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{round(value, FLOAT_DECIMALS):g}" if abs(value) < 1e6 else f"{value:.0f}"
+    if isinstance(value, (list, tuple)):
+        return "; ".join(_scalar(v) for v in value)
+    if isinstance(value, dict):
+        return ", ".join(f"{k}={_scalar(v)}" for k, v in value.items())
+    return " ".join(str(value).split())
+
+def compact_records(records: list[dict], columns: list[str] | None = None) -> str:
+    """Pipe table: one header line, then one line per record."""
+    if not records:
+        return ""
+    columns = columns or list(records[0])
+    lines = ["|".join(columns)]
+    lines += ["|".join(_scalar(r.get(c, "")).replace("|", "/") for c in columns) for r in records]
+    return "\n".join(lines)
+
+def compact_facts(facts: dict) -> str:
+    """Stable "key: value" lines in insertion order; lists of dicts become pipe tables."""
+    lines = []
+    for key, value in facts.items():
+        if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+            lines.append(f"{key}:\n{compact_records(list(value))}")
+        else:
+            lines.append(f"{key}: {_scalar(value)}")
+    return "\n".join(lines)
+
+@dataclass(slots=True)
+class PromptPart:
+    name: str
+    text: str
+    priority: int = 0  # Lower priorities are trimmed first
+    required: bool = False
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoder()
+    if enc is not None:
+        return enc.decode(enc.encode(text)[:max_tokens]).rstrip() + " …"
+    lo, hi = 0, len(text)
+    while lo < hi:  # Longest prefix within budget
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + " …"
+
+def fit_parts(parts: list[PromptPart], budget_tokens: int, separator: str = "\n\n") -> tuple[str, list[str]]:
+    """Join parts in order within `budget_tokens`, truncating or dropping optional parts from
+    the lowest priority up. Returns (prompt, names of the parts that were trimmed).
+    """
+    texts = {i: p.text for i, p in enumerate(parts) if p.text}
+    sizes = {i: count_tokens(t) for i, t in texts.items()}
+    sep_tokens = count_tokens(separator)
+    total = sum(sizes.values()) + sep_tokens * max(len(texts) - 1, 0)
+    trimmed = []
+    for i in sorted((i for i in texts if not parts[i].required), key=lambda i: parts[i].priority):
+        if total <= budget_tokens:
+            break
+        over = total - budget_tokens
+        if sizes[i] > over + 8:
+            # Truncating this part is enough
+            texts[i] = _truncate(texts[i], sizes[i] - over)
+            total -= sizes[i] - count_tokens(texts[i])
+        else:
+            del texts[i]
+            total -= sizes[i] + sep_tokens
+        trimmed.append(parts[i].name)
+    return separator.join(texts[i] for i in sorted(texts)), trimmed
+
+@dataclass
+class FollowupContext:
+    """Per-conversation follow-up state: a system prefix built once from the bundle and
+    kept byte-identical across turns (so servers with prefix caching reuse it), plus the
+    most recent question/answer turns, trimmed to the input budget oldest first.
+    """
+    prefix: str
+    facts: dict
+    max_turns: int = DEFAULT_HISTORY_TURNS
+    history: deque = field(default_factory=deque)
+
+    def messages(self, question: str, budget_tokens: int = DEFAULT_INPUT_BUDGET_TOKENS,
+                 instruction: str = "") -> tuple[list[dict], list[tuple[str, str]]]:
+        """Chat messages for one turn and the history turns included in them."""
+        user = f"{instruction}{question}"
+        remaining = budget_tokens - count_tokens(self.prefix) - count_tokens(user)
+        turns: list[tuple[str, str]] = []
+        for q, a in reversed(self.history):
+            cost = count_tokens(q) + count_tokens(a)
+            if cost > remaining:
+                break
+            turns.append((q, a))
+            remaining -= cost
+        turns.reverse()
+        messages = [{"role": "system", "content": self.prefix}]
+        for q, a in turns:
+            messages += [{"role": "user", "content": q}, {"role": "assistant", "content": a}]
+        messages.append({"role": "user", "content": user})
+        return messages, turns
+
+    def record(self, question: str, answer: str) -> None:
+        self.history.append((question, answer))
+        while len(self.history) > self.max_turns:
+            self.history.popleft()
@@ -0,0 +1,293 @@
+# Declarative rules, compiled once and evaluated over whole portfolios.
+# A rule is data: the action types it covers, conditions on customer facts
+# (profile, bill and asset columns) and one effect. compile_rules() indexes the
+# rules by action type; RuleSet.evaluate() computes each rule's predicate once
+# per customer column with NumPy and gathers it onto the (customer, action) rows,
+# so the cost grows with rules x customers, not rules x customers x measures.
+# Which rules fired on each row is kept in the same offsets + codes (CSR)
+# layout as ActionTable's list fields.
+
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from ..engine.batch import days_in_period_batch, derive_unit_rate_batch
+from ..postcodes import lookup_postcodes
+from ..schemas import AssetRecord, BillRecord, CustomerProfile
+from ..telemetry import traced
+
+# default: fill `field` with `value` where it is missing (runs before everything else)
+# eligibility: the action is only offered where the conditions hold; `reason` explains a failure
+# multiplier: scale annual savings by `value` where the conditions hold
+# grant: `value` is a grant/scheme ID attached where the conditions hold
+# tag: attribution only (e.g. the methodology rule behind a measure)
+EFFECTS = ("default", "eligibility", "multiplier", "grant", "tag")
+ALL_ACTIONS = "*"
+
+OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+    "in": lambda col, values: pd.Series(col).isin(list(values)).to_numpy(),
+    "not in": lambda col, values: ~pd.Series(col).isin(list(values)).to_numpy(),
+    "missing": lambda col, _: _missing(col),
+    "present": lambda col, _: ~_missing(col),
+}
+
+@dataclass(frozen=True, slots=True)
+class Condition:
+    field: str  # Fact column, e.g. "floor_area_m2", "industry", "total_kwh"
+    op: str  # One of OPS
+    value: object = None
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    rule_id: str
+    effect: str  # One of EFFECTS
+    actions: tuple[str, ...] = (ALL_ACTIONS,)  # Action types, see ACTION_TYPES in uk_rules.py
+    when: tuple[Condition, ...] = ()  # All must hold; strings compare lower-cased
+    value: object = None  # Multiplier, grant ID or default value
+    field: str | None = None  # Fact column filled by a default rule
+    reason: str = ""
+
+def _missing(col: np.ndarray) -> np.ndarray:
+    if col.dtype.kind == "f":
+        return np.isnan(col)
+    if col.dtype.kind == "O":
+        return pd.isna(col) | (col == "")
+    return np.zeros(len(col), dtype=bool)
+
+def _normalise(value):
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value)(_normalise(v) for v in value)
+    return value
+
+def _column(values) -> np.ndarray:
+    arr = np.asarray(values)
+    if arr.dtype.kind in "biuf":
+        return arr.astype(np.float64, copy=False)
+    # Strings: object array, lower-cased so "HORECA" and "horeca" match
+    return np.array([v.strip().lower() if isinstance(v, str) else v for v in arr.tolist()], dtype=object)
+
+def conditions_mask(conditions, facts: dict, n: int | None = None) -> np.ndarray:
+    """Customers (fact rows) for which every condition holds."""
+    n = _n_customers(facts) if n is None else n
+    mask = np.ones(n, dtype=bool)
+    for c in conditions:
+        col = facts.get(c.field)
+        if col is None:
+            col = np.full(n, np.nan)  # Unknown fact: behaves like a missing value for every customer
+        with np.errstate(invalid="ignore"):
+            mask &= np.asarray(OPS[c.op](col, _normalise(c.value)), dtype=bool)
+    return mask
+
+def build_facts(profiles: list[CustomerProfile] | None = None, bills: list[BillRecord] | None = None,
+                assets: list[list[AssetRecord]] | None = None, **columns) -> dict[str, np.ndarray]:
+    """Per-customer fact columns for evaluate(). Lists are aligned by customer; extra
+    columns (scalars broadcast to every customer) override derived ones.
+
+    Profiles give customer_type, postcode, floor_area_m2, operating_hours_per_day and
+    industry (business_category); bills give total_kwh, total_cost_gbp and
+    unit_rate_p_per_kwh (as derive_unit_rate() computes it); asset lists give usage_kwh_per_day (summed), efficiency
+    (mean) and asset_types (space-separated). A postcode column adds country,
+    dno_region, carbon_region and grants from the postcode index. Missing values
+    are NaN/None.
+    """
+    facts: dict = {}
+    if profiles is not None:
+        facts["customer_type"] = [p.type for p in profiles]
+        facts["postcode"] = [p.postcode for p in profiles]
+        facts["floor_area_m2"] = [math.nan if p.floor_area_m2 is None else p.floor_area_m2 for p in profiles]
+        facts["operating_hours_per_day"] = [math.nan if p.operating_hours_per_day is None else p.operating_hours_per_day
+                                            for p in profiles]
+        facts["industry"] = [p.business_category for p in profiles]
+    if bills is not None:
+        facts["total_kwh"] = [b.total_kwh for b in bills]
+        facts["total_cost_gbp"] = [b.total_cost_gbp for b in bills]
+        provided = [math.nan if b.unit_rate_p_per_kwh is None else b.unit_rate_p_per_kwh for b in bills]
+        days = days_in_period_batch([b.start_date for b in bills], [b.end_date for b in bills])
+        facts["unit_rate_p_per_kwh"] = derive_unit_rate_batch(
+            facts["total_kwh"], facts["total_cost_gbp"], [b.standing_charge_per_day for b in bills], days, provided)
+    if assets is not None:
+        facts["usage_kwh_per_day"] = [sum(a.usage_kwh_per_day for a in site) if site else math.nan for site in assets]
+        facts["efficiency"] = [sum(a.efficiency for a in site) / len(site) if site else math.nan for site in assets]
+        facts["asset_types"] = [" ".join(sorted({a.asset_type for a in site})) for site in assets]
+    n = max((len(v) for v in facts.values()), default=1)
+    for name, value in columns.items():
+        facts[name] = [value] * n if np.ndim(value) == 0 else value
+    if "postcode" in facts:
+        # One bulk lookup; explicit columns win
+        for name, values in lookup_postcodes(facts["postcode"]).items():
+            facts.setdefault(name, values)
+    return {name: _column(values) for name, values in facts.items()}
+
+@dataclass
+class RuleEvaluation:
+    rules: tuple[Rule, ...]
+    eligible: np.ndarray  # bool per row
+    multiplier: np.ndarray  # float64 per row, product of fired multipliers
+    blocked_by: np.ndarray  # int32 per row: first failing eligibility rule, -1 if eligible
+    fired_offsets: np.ndarray  # int64, len n_rows + 1
+    fired_codes: np.ndarray  # int32 indices into rules, in rule-table order per row
+    facts: dict = field(default_factory=dict)  # Facts after defaults were filled
+
+    def __len__(self) -> int:
+        return len(self.eligible)
+
+    def fired(self, row: int) -> list[Rule]:
+        return [self.rules[c] for c in self.fired_codes[self.fired_offsets[row]:self.fired_offsets[row + 1]]]
+
+    def rule_ids(self, row: int) -> list[str]:
+        return [r.rule_id for r in self.fired(row)]
+
+    def rule_id_lists(self) -> list[list[str]]:
+        """Fired rule IDs for every row (one pass; cheaper than rule_ids() per row)."""
+        ids = [r.rule_id for r in self.rules]
+        codes, offsets = self.fired_codes.tolist(), self.fired_offsets.tolist()
+        return [[ids[c] for c in codes[a:b]] for a, b in zip(offsets, offsets[1:])]
+
+    def grants(self, row: int) -> list[str]:
+        return [r.value for r in self.fired(row) if r.effect == "grant"]
+
+    def reason(self, row: int) -> str:
+        b = self.blocked_by[row]
+        return "" if b < 0 else (self.rules[b].reason or self.rules[b].rule_id)
+
+    def counts(self) -> dict[str, int]:
+        """How many rows each rule fired on (failed eligibility rules are not counted)."""
+        hits = np.bincount(self.fired_codes, minlength=len(self.rules))
+        return {r.rule_id: int(n) for r, n in zip(self.rules, hits)}
+
+class RuleSet:
+    """A compiled rule table: rules validated and indexed by action type."""
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        for r in self.rules:
+            if r.effect not in EFFECTS:
+                raise ValueError(f"{r.rule_id}: unknown effect {r.effect!r}")
+            for c in r.when:
+                if c.op not in OPS:
+                    raise ValueError(f"{r.rule_id}: unknown operator {c.op!r}")
+            if r.effect == "default" and not r.field:
+                raise ValueError(f"{r.rule_id}: default rules need a field")
+        self._when = [tuple(Condition(c.field, c.op, _normalise(c.value)) for c in r.when) for r in self.rules]
+        self.defaults = tuple(i for i, r in enumerate(self.rules) if r.effect == "default")
+        wildcard = [i for i, r in enumerate(self.rules) if ALL_ACTIONS in r.actions and r.effect != "default"]
+        self.action_types = tuple(dict.fromkeys(t for r in self.rules for t in r.actions if t != ALL_ACTIONS))
+        self.index: dict[str, tuple[int, ...]] = {
+            t: tuple(sorted(set(wildcard) | {i for i, r in enumerate(self.rules)
+                                             if t in r.actions and r.effect != "default"}))
+            for t in self.action_types
+        }
+        self._wildcard = tuple(wildcard)
+
+    def rules_for(self, action_type: str | None) -> tuple[int, ...]:
+        return self.index.get(action_type, self._wildcard)
+
+    def _predicate(self, i: int, facts: dict, n: int) -> np.ndarray:
+        return conditions_mask(self._when[i], facts, n)
+
+    def fill_defaults(self, facts: dict) -> tuple[dict, dict[int, np.ndarray]]:
+        """Facts with default rules applied, and the customers each default fired for."""
+        facts = dict(facts)
+        n = _n_customers(facts)
+        fired = {}
+        for i in self.defaults:
+            r = self.rules[i]
+            col = facts.get(r.field)
+            numeric = isinstance(r.value, (int, float))
+            if col is None:
+                col = np.full(n, np.nan) if numeric else np.full(n, None, dtype=object)
+            hit = _missing(col) & self._predicate(i, facts, n)
+            if hit.any():
+                col = col.astype(np.float64 if numeric and col.dtype.kind == "f" else object)  # Copy; callers' facts are untouched
+                col[hit] = _normalise(r.value)
+            facts[r.field] = col
+            fired[i] = hit
+        return facts, fired
+
+    @traced("rules.evaluate")
+    def evaluate(self, facts: dict, action_type, customer=None, effects=None, types=None) -> RuleEvaluation:
+        """Evaluate the rules for each (customer, action) row.
+
+        `facts` holds per-customer columns (see build_facts); `action_type` is one type
+        for every row, an array of types, or (with `types`) integer codes into `types`,
+        which skips hashing millions of strings. `customer` maps rows to fact rows
+        (default: row i is customer i, or customer 0 when there is one customer).
+        `effects` restricts evaluation to some effects; defaults are always filled, but
+        only reported as fired when "default" is among them.
+        """
+        n_customers = _n_customers(facts)
+        if types is not None:
+            type_codes, types = np.asarray(action_type, dtype=np.intp), list(types)
+        elif isinstance(action_type, str) or action_type is None:
+            n = len(customer) if customer is not None else n_customers
+            type_codes, types = np.zeros(n, dtype=np.intp), [action_type]
+        else:
+            type_codes, types = pd.factorize(np.asarray(action_type, dtype=object), use_na_sentinel=False)
+        n = len(type_codes)
+        if customer is None:
+            customer = np.zeros(n, dtype=np.intp) if n_customers == 1 else np.arange(n)
+        customer = np.asarray(customer, dtype=np.intp)
+        effects = set(EFFECTS if effects is None else effects)
+
+        facts, defaulted = self.fill_defaults(facts)
+        masks: dict[int, np.ndarray] = {}
+        eligible = np.ones(n, dtype=bool)
+        multiplier = np.ones(n, dtype=np.float64)
+        blocked_by = np.full(n, -1, dtype=np.int32)
+        fired_counts = np.zeros(n, dtype=np.int64)
+        groups = []
+
+        # Group rows by action type (codes are contiguous after a stable argsort)
+        small = type_codes.astype(np.int16) if len(types) < 2 ** 15 else type_codes  # Radix sort for small ints
+        order = np.argsort(small, kind="stable")
+        bounds = np.searchsorted(type_codes[order], np.arange(len(types) + 1))
+        for t, action in enumerate(types):
+            rows = order[bounds[t]:bounds[t + 1]]
+            indices = [i for i in self.rules_for(action) if self.rules[i].effect in effects]
+            if "default" in effects:
+                indices += [i for i in self.defaults
+                            if ALL_ACTIONS in self.rules[i].actions or action in self.rules[i].actions]
+            if not len(rows) or not indices:
+                continue
+            indices.sort()
+            cust = customer[rows]
+            hits = np.empty((len(rows), len(indices)), dtype=bool)  # Row-major: a row's rules are adjacent
+            for j, i in enumerate(indices):
+                r = self.rules[i]
+                if i not in masks:
+                    masks[i] = defaulted[i] if r.effect == "default" else self._predicate(i, facts, n_customers)
+                hit = hits[:, j] = masks[i][cust]
+                if r.effect == "eligibility":
+                    failed = ~hit & (blocked_by[rows] < 0)
+                    blocked_by[rows[failed]] = i
+                    eligible[rows] &= hit
+                elif r.effect == "multiplier":
+                    multiplier[rows[hit]] *= float(r.value)
+            fired_counts[rows] = hits.sum(axis=1)
+            groups.append((rows, np.asarray(indices, dtype=np.int32), hits))
+
+        # Scatter each group's fired rules into CSR slots (no global sort)
+        offsets = np.concatenate(([0], np.cumsum(fired_counts)))
+        codes = np.empty(offsets[-1], dtype=np.int32)
+        for rows, indices, hits in groups:
+            local_row, col = np.nonzero(hits)
+            counts = fired_counts[rows]
+            first = np.cumsum(counts) - counts  # Position of each row's first hit in local_row
+            codes[offsets[rows][local_row] + np.arange(len(local_row)) - first[local_row]] = indices[col]
+        return RuleEvaluation(self.rules, eligible, multiplier, blocked_by, offsets, codes, facts)
+
+def compile_rules(rules) -> RuleSet:
+    return RuleSet(rules)
+
+def _n_customers(facts: dict) -> int:
+    return max((len(v) for v in facts.values()), default=1)
@@ -1,47 +1,99 @@
-# UK-specific rules and heuristics
+# UK-specific rules and heuristics, as a declarative table compiled by
+# src/rules/engine.py. Add a rule by appending a Rule to UK_RULES; evaluate a
+# portfolio with UK_RULESET.evaluate(build_facts(...), action_types, customer).
+
+from .engine import Condition, Rule, build_facts, compile_rules
+
+# Measure title -> action type used to index the rule table
+ACTION_TYPES = {
+    "LED Lighting Retrofit": "lighting",
+    "Smart HVAC Tuning": "hvac",
+    "Solar Panel Installation": "solar",
+    "Battery Storage": "battery",
+    "Heat Pump Installation": "heat_pump",
+    "Switch to time-of-use tariff": "tariff",
+}
 
 UK_HEAT_PUMP_ELIGIBILITY = {
     "min_floor_area_m2": 50,
-    "max_age_years": 20,  # Building age
+    "max_age_years": 20,  # Building age (not yet captured in CustomerProfile)
     "grants_available": True
 }
 
-def is_heat_pump_eligible(profile, asset):
-    # Simple check
-    if profile.floor_area_m2 < UK_HEAT_PUMP_ELIGIBILITY["min_floor_area_m2"]:
-        return False, "Floor area too small"
-    return True, ""
-
-def apply_conservative_defaults(missing_fields: dict) -> dict:
-    defaults = {
-        "usage_kwh_per_day": 10.0,  # Conservative low
-        "efficiency": 0.8,
-        "operating_hours_per_day": 8.0
-    }
-    for field, default in defaults.items():
-        if field in missing_fields and missing_fields[field]:
-            missing_fields[field] = False  # Mark as filled
-            # In real code, set the value in data
-    return missing_fields
-
-def get_rule_ids_for_action(action_title: str) -> list[str]:
-    # Placeholder mapping
-    rules = {
-        "LED Lighting Retrofit": ["rule-uk-lighting-efficiency-2024"],
-        "Heat Pump Installation": ["rule-uk-heatpump-elig-2024", "rule-uk-grants-bus-2024"]
-    }
-    return rules.get(action_title, [])
+# Conservative low values used when a fact is missing
+CONSERVATIVE_DEFAULTS = {
+    "usage_kwh_per_day": 10.0,
+    "efficiency": 0.8,
+    "operating_hours_per_day": 8.0,
+}
+
+# Savings multipliers by sector; values are conservative
+SECTOR_MULTIPLIERS = {
+    "horeca": {"lighting": 1.15, "hvac": 1.10, "solar": 1.00},
+    "office": {"lighting": 1.10, "hvac": 1.20, "solar": 1.00},
+    "retail": {"lighting": 1.12, "hvac": 1.10, "solar": 1.05},
+}
+
+UK_RULES = (
+    *(Rule(f"rule-uk-default-{name.replace('_', '-')}", "default", field=name, value=value,
+           reason=f"{name} missing, assumed {value:g}")
+      for name, value in CONSERVATIVE_DEFAULTS.items()),
+    Rule("rule-uk-lighting-efficiency-2024", "tag", actions=("lighting",)),
+    Rule("rule-uk-heatpump-elig-2024", "eligibility", actions=("heat_pump",),
+         when=(Condition("floor_area_m2", ">=", UK_HEAT_PUMP_ELIGIBILITY["min_floor_area_m2"]),),
+         reason="Floor area too small"),
+    *((
+        # England and Wales; also attached when the postcode is unknown
+        Rule("rule-uk-grants-bus-2024", "grant", actions=("heat_pump",), value="boiler-upgrade-scheme",
+             when=(Condition("country", "not in", ("Scotland", "Northern Ireland")),)),
+        Rule("rule-uk-grants-hes-2024", "grant", actions=("heat_pump",), value="home-energy-scotland",
+             when=(Condition("country", "==", "Scotland"),)),
+    ) if UK_HEAT_PUMP_ELIGIBILITY["grants_available"] else ()),
+    *(Rule(f"rule-uk-sector-{sector}-{action}", "multiplier", actions=(action,),
+           when=(Condition("industry", "==", sector),), value=m)
+      for sector, by_action in SECTOR_MULTIPLIERS.items() for action, m in by_action.items() if m != 1.0),
+)
 
+UK_RULESET = compile_rules(UK_RULES)
+
+def action_type(title: str) -> str | None:
+    return ACTION_TYPES.get(title)
+
+def is_heat_pump_eligible(profile, asset=None):
+    evaluation = UK_RULESET.evaluate(build_facts([profile]), "heat_pump", effects=("eligibility",))
+    return bool(evaluation.eligible[0]), evaluation.reason(0)
+
+def apply_conservative_defaults(values: dict) -> dict:
+    """Copy of `values` with missing (None/NaN) usage, efficiency and operating hours
+    set to CONSERVATIVE_DEFAULTS, plus a "<field>_missing" flag per field (the flags
+    are what confidence_score() expects).
+    """
+    facts = build_facts(**{k: [values.get(k)] for k in CONSERVATIVE_DEFAULTS})
+    filled, fired = UK_RULESET.fill_defaults(facts)
+    out = dict(values)
+    for i, hit in fired.items():
+        name = UK_RULES[i].field
+        out[name] = float(filled[name][0])
+        out[f"{name}_missing"] = bool(hit[0])
+    return out
+
+def get_rule_ids_for_action(action_title: str, postcode: str | None = None, profile=None) -> list[str]:
+    """Eligibility, tag and grant rule IDs for a measure, as pipeline.apply_rules attributes them
+    (unknown location: England and Wales rules). Eligibility rules are listed when `profile`
+    passes them; without a profile eligibility is unknown and they are listed as applying.
+    """
+    kind = action_type(action_title)
+    # An explicit postcode overrides the profile's
+    location = {} if postcode is None and profile is not None else {"postcode": postcode}
+    facts = build_facts([profile] if profile is not None else None, **location)
+    evaluation = UK_RULESET.evaluate(facts, kind, effects=("eligibility", "tag", "grant"))
+    fired = {r.rule_id for r in evaluation.fired(0)}
+    return [r.rule_id for i, r in enumerate(UK_RULES) if r.rule_id in fired
+            or (profile is None and r.effect == "eligibility" and i in UK_RULESET.rules_for(kind))]
 
 def industry_multipliers(industry: str) -> dict:
     """Return simple multipliers to reflect sectoral differences.
     Applied to annual savings for actions; values are conservative.
     """
-    key = (industry or "").strip().lower()
-    if key == "horeca":
-        return {"lighting": 1.15, "hvac": 1.10, "solar": 1.00}
-    if key == "office":
-        return {"lighting": 1.10, "hvac": 1.20, "solar": 1.00}
-    if key == "retail":
-        return {"lighting": 1.12, "hvac": 1.10, "solar": 1.05}
-    return {"lighting": 1.00, "hvac": 1.00, "solar": 1.00}
\ No newline at end of file
+    by_action = SECTOR_MULTIPLIERS.get((industry or "").strip().lower(), {})
+    return {action: by_action.get(action, 1.00) for action in ("lighting", "hvac", "solar")}
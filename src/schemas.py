@@ -2,7 +2,9 @@ from dataclasses import dataclass
 from datetime import date
 from typing import Optional
 
-@dataclass
+import numpy as np
+
+@dataclass(slots=True)
 class BillRecord:
     total_kwh: float
     total_cost_gbp: float
@@ -11,7 +13,24 @@ class BillRecord:
     end_date: date
     unit_rate_p_per_kwh: Optional[float] = None  # pence/kWh if provided
 
-@dataclass
+@dataclass(slots=True)
+class IntervalData:
+    timestamps: np.ndarray  # datetime64[s], interval start
+    consumption_kwh: np.ndarray  # float64, kWh per interval
+    wind_kwh_per_mw: np.ndarray  # float64, zeros if not supplied
+    solar_kwh_per_mwp: np.ndarray  # float64, zeros if not supplied
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def interval_hours(self) -> float:
+        if len(self.timestamps) < 2:
+            return 0.25  # Assume 15-minute data
+        step = np.median(np.diff(self.timestamps[:97]).astype('timedelta64[s]').astype(np.int64))
+        return float(step) / 3600.0
+
+@dataclass(slots=True)
 class AssetRecord:
     asset_type: str  # e.g., "lighting", "boiler"
     capacity_kw: float
@@ -20,7 +39,7 @@ class AssetRecord:
     opex_per_year_gbp: float
     capex_estimate_gbp: float
 
-@dataclass
+@dataclass(slots=True)
 class CustomerProfile:
     type: str  # "household" or "SME"
     postcode: str
@@ -28,7 +47,7 @@ class CustomerProfile:
     operating_hours_per_day: float
     business_category: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class ActionRecommendation:
     title: str
     category: str  # "no-capex", "capex"
@@ -43,7 +62,7 @@ class ActionRecommendation:
     assumptions_list: list[str]
     rule_ids_applied: list[str]
 
-@dataclass
+@dataclass(slots=True)
 class RecommendationBundle:
     customer_id: str
     generated_at: str
@@ -1,16 +1,23 @@
+import numpy as np
+
 from .schemas import ActionRecommendation
+from .action_table import ActionTable
+from .telemetry import traced
+
+DEFAULT_WEIGHTS = {"roi": 0.6, "carbon": 0.2, "disruption": 0.1, "confidence": 0.1}
+DISRUPTION_SCORES = {"Low": 1.0, "Medium": 0.6, "High": 0.2}
+DEFAULT_DISRUPTION_SCORE = 0.6
 
 def compute_score(action: ActionRecommendation, weights=None) -> float:
     if weights is None:
-        weights = {"roi": 0.6, "carbon": 0.2, "disruption": 0.1, "confidence": 0.1}
+        weights = DEFAULT_WEIGHTS
     capex = max(action.capex_gbp or 0.0, 1.0)  # Avoid div by zero
     roi_metric = action.annual_savings_gbp / capex
     roi_score = min(1.0, roi_metric / 1.0)  # Cap at 1 for 100% annual ROI
 
     carbon_score = min(1.0, action.co2_savings_tonnes_per_year / 1.0)
 
-    disruption_map = {"Low": 1.0, "Medium": 0.6, "High": 0.2}
-    disruption_score = disruption_map.get(action.operational_disruption, 0.6)
+    disruption_score = DISRUPTION_SCORES.get(action.operational_disruption, DEFAULT_DISRUPTION_SCORE)
 
     confidence = action.confidence
 
@@ -23,6 +30,7 @@ def compute_score(action: ActionRecommendation, weights=None) -> float:
         raw_score *= 0.5
     return round(raw_score, 3)
 
+@traced()
 def rank_actions(actions: list[ActionRecommendation], weights=None) -> list[ActionRecommendation]:
     scored = [(compute_score(a, weights), a) for a in actions]
     scored.sort(key=lambda x: x[0], reverse=True)
@@ -30,4 +38,83 @@ def rank_actions(actions: list[ActionRecommendation], weights=None) -> list[Acti
 
 def filter_feasible(actions: list[ActionRecommendation]) -> list[ActionRecommendation]:
     # Placeholder: exclude if payback inf or negative savings
-    return [a for a in actions if a.payback_months != float('inf') and a.annual_savings_gbp > 0]
\ No newline at end of file
+    return [a for a in actions if a.payback_months != float('inf') and a.annual_savings_gbp > 0]
+
+def _disruption_lookup(table: ActionTable) -> np.ndarray:
+    # Score per disruption code; unknown labels get the default like compute_score
+    return np.array([DISRUPTION_SCORES.get(v, DEFAULT_DISRUPTION_SCORE)
+                     for v in table.pools["operational_disruption"].values], dtype=np.float64)
+
+@traced()
+def score_table(table: ActionTable, weights=None, feasible_only: bool = False) -> np.ndarray:
+    """Vectorised compute_score() over every row of an ActionTable.
+    With feasible_only=True, rows filter_feasible() would drop score -inf.
+    """
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    capex = np.maximum(np.nan_to_num(table.capex_gbp, nan=0.0), 1.0)
+    savings = table.annual_savings_gbp
+    co2 = table.co2_savings_tonnes_per_year
+    payback = table.payback_months
+
+    score = weights["roi"] * np.minimum(1.0, savings / capex)
+    score += weights["carbon"] * np.minimum(1.0, co2)
+    score += weights["disruption"] * _disruption_lookup(table)[table.operational_disruption]
+    score += weights["confidence"] * table.confidence
+    # Hard rule: if payback >24 months and carbon <1t, penalize
+    score[(payback > 24) & (co2 < 1.0)] *= 0.5
+    score = np.round(score, 3)
+    if feasible_only:
+        score[(payback == np.inf) | ~(savings > 0)] = -np.inf
+    return score
+
+@traced()
+def top_k_per_customer(table: ActionTable, k: int = 3, weights=None, feasible_only: bool = True,
+                       scores: np.ndarray | None = None) -> np.ndarray:
+    """Row indices of each customer's k best actions, best first, in one pass per rank.
+    Rows are grouped by customer (ascending); ties keep table order like rank_actions().
+    Infeasible rows are excluded when feasible_only=True. Only the selected rows need
+    materialising with table.to_actions().
+    """
+    if scores is None:
+        scores = score_table(table, weights, feasible_only)
+    n = len(scores)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    customer = table.customer
+    if np.any(customer[1:] < customer[:-1]):
+        order = np.argsort(customer, kind="stable")
+    else:
+        order = None
+    cust = customer if order is None else customer[order]
+    work = (scores if order is None else scores[order]).astype(np.float64, copy=True)
+    starts = np.flatnonzero(np.concatenate(([True], cust[1:] != cust[:-1])))
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+
+    picks = []
+    for rank in range(k):
+        best = np.maximum.reduceat(work, starts)
+        # First row in each group holding the group max (stable tie-break)
+        hit = np.flatnonzero((work == best[group]) & (work > -np.inf))
+        if len(hit) == 0:
+            break
+        first = hit[np.concatenate(([True], group[hit][1:] != group[hit][:-1]))]
+        picks.append(np.stack([group[first], np.full(len(first), rank), first], axis=1))
+        work[first] = -np.inf
+    if not picks:
+        return np.empty(0, dtype=np.int64)
+    sel = np.concatenate(picks)
+    sel = sel[np.lexsort((sel[:, 1], sel[:, 0]))]
+    rows = sel[:, 2]
+    return rows if order is None else order[rows]
+
+@traced()
+def rank_table(table: ActionTable, k: int = 3, weights=None) -> dict:
+    """Feasibility filter, scoring and per-customer top-k fused into one call.
+    Returns {customer index: [ActionRecommendation, ...]} with at most k actions each.
+    """
+    rows = top_k_per_customer(table, k, weights, feasible_only=True)
+    out: dict[int, list[ActionRecommendation]] = {}
+    for c, action in zip(table.customer[rows].tolist(), table.to_actions(rows)):
+        out.setdefault(c, []).append(action)
+    return out
@@ -0,0 +1,446 @@
+# Headless service and batch runner for the recommendation pipeline.
+# Deterministic stages (ingest → rank) run in a process pool, one Pipeline per
+# worker; the LLM stage runs on a single asyncio loop in a background thread,
+# where llm_layer's per-loop semaphore caps concurrent calls. At most
+# `max_pending` jobs are in flight: the HTTP server answers 503 beyond that and
+# the batch runner blocks, so memory stays bounded however large the input.
+#
+#   python -m src.service serve --port 8000 --workers 4
+#   curl -X POST --data-binary @bill.csv "http://127.0.0.1:8000/v1/bundle?region=UK&industry=retail"
+#   python -m src.service batch bills/ --out bundles.jsonl --region UK --industry retail
+#
+# SIGINT/SIGTERM stop accepting new requests, let in-flight ones finish, then
+# shut the pools down.
+
+import argparse
+import asyncio
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .pipeline import Pipeline, PipelineResult
+from .telemetry import count, get_telemetry, observe
+
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", str(os.cpu_count() or 2)))
+SERVICE_MAX_PENDING = int(os.getenv("SERVICE_MAX_PENDING", "64"))
+SERVICE_REQUEST_TIMEOUT_SECONDS = float(os.getenv("SERVICE_REQUEST_TIMEOUT_SECONDS", "300"))
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+DEFAULT_REGION = "UK"
+DEFAULT_INDUSTRY = "HORECA"
+
+class ServiceBusy(RuntimeError):
+    """Raised when the pending-job limit is reached or the service is shutting down."""
+
+class LLMStageError(RuntimeError):
+    """The deterministic bundle was built but the LLM stage failed."""
+
+@dataclass(slots=True)
+class Job:
+    region: str = DEFAULT_REGION
+    industry: str = DEFAULT_INDUSTRY
+    path: str | None = None  # CSV on disk (batch) ...
+    content: bytes | None = None  # ... or uploaded CSV/XLSX bytes (HTTP)
+    synthesize: bool = False  # Also run the LLM stage
+    mode: str | None = None  # LLM render mode; None uses LLM_RENDER_MODE
+    bill_source: str | None = None
+
+# Process-pool side: one memoising Pipeline per worker process
+
+_worker_pipeline: Pipeline | None = None
+
+def _init_worker() -> None:
+    global _worker_pipeline
+    _worker_pipeline = Pipeline()
+
+def _run_pipeline(job: Job) -> PipelineResult:
+    source = job.path if job.path is not None else job.content
+    return _worker_pipeline.run(source, job.region, job.industry, job.bill_source)
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item"):  # NumPy scalars
+        return value.item()
+    return str(value)
+
+def result_record(result: PipelineResult, report: dict | None = None) -> dict:
+    """JSON-ready form of a pipeline run (plus the LLM report when one was requested)."""
+    record = {
+        "source": result.bundle.provenance.get("bill_source"),
+        "bundle": asdict(result.bundle),
+        "bill": asdict(result.bill),
+        "unit_rate_p_per_kwh": result.unit_rate_p_per_kwh,
+        "grid_gco2_per_kwh": result.grid_gco2_per_kwh,
+        "timings": [asdict(t) for t in result.timings],
+    }
+    if report is not None:
+        record["report"] = report
+    return record
+
+def dumps(record: dict) -> str:
+    return json.dumps(record, default=_json_default, ensure_ascii=False)
+
+class LLMPool:
+    """One asyncio loop on a background thread; coroutines are submitted from any thread."""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-pool", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self, timeout: float = 10.0) -> None:
+        from .llm_layer import close_async_client
+        try:
+            self.submit(close_async_client()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+
+class RecommendationService:
+    """Bounded job runner shared by the HTTP server and the batch CLI."""
+
+    def __init__(self, workers: int = SERVICE_WORKERS, max_pending: int = SERVICE_MAX_PENDING,
+                 request_timeout: float = SERVICE_REQUEST_TIMEOUT_SECONDS):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.request_timeout = request_timeout
+        # spawn, not fork: the LLM loop thread and HTTP threads must not be forked mid-operation
+        self._procs = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+        self._llm: LLMPool | None = None
+        self._llm_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def closing(self) -> bool:
+        return self._closing
+
+    def _llm_pool(self) -> LLMPool:
+        with self._llm_lock:
+            if self._llm is None:
+                self._llm = LLMPool()
+            return self._llm
+
+    def _admit(self, block: bool) -> None:
+        with self._cond:
+            while not self._closing and self._pending >= self.max_pending:
+                if not block:
+                    break
+                self._cond.wait()
+            if self._closing:
+                raise ServiceBusy("Service is shutting down")
+            if self._pending >= self.max_pending:
+                raise ServiceBusy(f"{self._pending} jobs pending (limit {self.max_pending})")
+            self._pending += 1
+
+    def _release(self, _future=None) -> None:
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def submit(self, job: Job, block: bool = False, on_done=None) -> concurrent.futures.Future:
+        """Queue a job; the future resolves to its result_record(). With block=False a full
+        queue raises ServiceBusy, otherwise the caller waits for a free slot. `on_done(future)`
+        runs before the slot is released, so close() also waits for it.
+        """
+        self._admit(block)
+        outer: concurrent.futures.Future = concurrent.futures.Future()
+        if on_done is not None:
+            outer.add_done_callback(on_done)
+        outer.add_done_callback(self._release)
+        try:
+            inner = self._procs.submit(_run_pipeline, job)
+        except BaseException:
+            outer.cancel()
+            raise
+        inner.add_done_callback(lambda f: self._after_pipeline(job, f, outer))
+        return outer
+
+    def _after_pipeline(self, job: Job, inner: concurrent.futures.Future, outer: concurrent.futures.Future) -> None:
+        try:
+            result = inner.result()
+        except BaseException as e:
+            count("service_jobs", outcome="error")
+            outer.set_exception(e)
+            return
+        count("service_jobs", outcome="ok")
+        # Stages ran in a worker process; aggregate their timings here so /metrics sees them
+        for t in result.timings:
+            if not t.cached:
+                observe("pipeline_stage_seconds", t.seconds, stage=t.stage)
+        if not job.synthesize:
+            outer.set_result(result_record(result))
+            return
+        from .llm_layer import synthesize_recommendations_async
+
+        def settle(llm: concurrent.futures.Future) -> None:
+            try:
+                outer.set_result(result_record(result, llm.result()))
+            except BaseException as e:
+                error = LLMStageError(f"LLM stage failed: {e}")
+                error.__cause__ = e
+                outer.set_exception(error)
+
+        self._llm_pool().submit(synthesize_recommendations_async(result.bundle, job.mode)).add_done_callback(settle)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Refuse new jobs, wait for pending ones to finish, then stop the worker pools."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        self._procs.shutdown(wait=True, cancel_futures=True)
+        if self._llm is not None:
+            self._llm.close()
+
+    def __enter__(self) -> "RecommendationService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+# HTTP front end
+
+ROUTES = ("/v1/bundle", "/v1/recommendations")
+
+class RecommendationServer:
+    def __init__(self, service: RecommendationService, host: str = "127.0.0.1", port: int = 0):
+        self.service = service
+        self._httpd = ThreadingHTTPServer((host, port), _handler(service))
+        self._httpd.daemon_threads = False  # server_close() then waits for in-flight requests
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "RecommendationServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop accepting connections; safe to call from a signal handler."""
+        threading.Thread(target=self._httpd.shutdown, daemon=True).start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+        self._httpd.server_close()
+        self.service.close()
+
+    def __enter__(self) -> "RecommendationServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def _job_from_request(route: str, query: dict, content_type: str, body: bytes) -> Job:
+    from .llm_layer import RENDER_MODES
+    if content_type.startswith("application/json"):
+        params = json.loads(body or b"{}")
+        if not isinstance(params, dict):
+            raise ValueError("JSON body must be an object")
+        csv = params.get("csv") or ""
+        if not isinstance(csv, str):
+            raise ValueError('"csv" must be a string')
+        content = csv.encode("utf-8")
+    else:  # Raw CSV or XLSX body, parameters in the query string
+        params = {k: v[-1] for k, v in query.items()}
+        content = body
+    if not content:
+        raise ValueError("Request has no bill content")
+    for name in ("region", "industry", "mode", "bill_source"):
+        if not isinstance(params.get(name) or "", str):
+            raise ValueError(f"{name!r} must be a string")
+    mode = params.get("mode") or None
+    if mode is not None and mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode {mode!r}; expected one of {RENDER_MODES}")
+    return Job(region=params.get("region") or DEFAULT_REGION, industry=params.get("industry") or DEFAULT_INDUSTRY,
+               content=content, synthesize=route == "/v1/recommendations", mode=mode,
+               bill_source=params.get("bill_source") or "upload")
+
+def _handler(service: RecommendationService):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+            body = dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            route = urlsplit(self.path).path.rstrip("/")
+            if route == "/health":
+                self._send_json(200, {"status": "draining" if service.closing else "ok", "pending": service.pending,
+                                      "max_pending": service.max_pending, "workers": service.workers})
+            elif route == "/metrics":
+                body = get_telemetry().prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            route = url.path.rstrip("/")
+            if route not in ROUTES:
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                if length < 0:
+                    raise ValueError
+            except ValueError:
+                self._send_json(400, {"error": "Invalid Content-Length"})
+                return
+            if length > MAX_UPLOAD_BYTES:
+                self._send_json(413, {"error": f"Upload larger than {MAX_UPLOAD_BYTES} bytes"})
+                return
+            body = self.rfile.read(length)
+            try:
+                job = _job_from_request(route, parse_qs(url.query), self.headers.get("Content-Type", ""), body)
+                future = service.submit(job)
+            except ServiceBusy as e:
+                count("service_rejected")
+                self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+                return
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:  # e.g. BrokenProcessPool after a worker crash
+                self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            try:
+                record = future.result(timeout=service.request_timeout)
+            except concurrent.futures.TimeoutError:
+                self._send_json(504, {"error": f"No result within {service.request_timeout:g} s"})
+            except LLMStageError as e:
+                self._send_json(502, {"error": str(e)})
+            except (ValueError, KeyError) as e:  # Unreadable or unsupported bill
+                self._send_json(400, {"error": f"Error parsing bill: {e}"})
+            except Exception as e:
+                self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            else:
+                self._send_json(200, record)
+
+    return Handler
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = SERVICE_WORKERS,
+          max_pending: int = SERVICE_MAX_PENDING, request_timeout: float = SERVICE_REQUEST_TIMEOUT_SECONDS) -> None:
+    server = RecommendationServer(RecommendationService(workers, max_pending, request_timeout), host, port)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: server.shutdown())
+    print(f"Recommendation service on {server.url} ({server.service.workers} workers, "
+          f"max {server.service.max_pending} pending)")
+    try:
+        server.serve_forever()
+    finally:
+        print("Shutting down: finishing in-flight requests")
+        server.stop()
+
+# Batch front end
+
+def run_batch(paths: list[str], out_path: str, region: str = DEFAULT_REGION, industry: str = DEFAULT_INDUSTRY,
+              mode: str | None = None, workers: int = SERVICE_WORKERS, max_pending: int | None = None) -> dict:
+    """Process bill CSVs in parallel, writing one JSON line per bill in completion order.
+    Failed bills are written as {"source", "error"} lines and counted; they do not stop the run.
+    """
+    counts = {"bills": len(paths), "ok": 0, "failed": 0}
+    write_lock = threading.Lock()
+    start = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out, \
+            RecommendationService(workers, max_pending or 2 * max(1, workers)) as service:
+
+        def write(path: str, future: concurrent.futures.Future) -> None:
+            try:
+                line, ok = dumps(future.result()), True
+            except BaseException as e:
+                line, ok = dumps({"source": path, "error": f"{type(e).__name__}: {e}"}), False
+            with write_lock:
+                out.write(line + "\n")
+                counts["ok" if ok else "failed"] += 1
+
+        for path in paths:
+            # Blocks while max_pending bills are in flight (backpressure on the directory walk)
+            job = Job(region, industry, path=path, synthesize=mode is not None, mode=mode, bill_source=path)
+            service.submit(job, block=True, on_done=lambda f, path=path: write(path, f))
+    counts["seconds"] = round(time.perf_counter() - start, 3)
+    return counts
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Recommendation pipeline as an HTTP service or batch job")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = commands.add_parser("serve", help="Serve JSON endpoints: POST /v1/bundle, POST /v1/recommendations")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8000)
+    serve_cmd.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Pipeline worker processes")
+    serve_cmd.add_argument("--max-pending", type=int, default=SERVICE_MAX_PENDING,
+                           help="Jobs in flight before requests get 503")
+    serve_cmd.add_argument("--timeout", type=float, default=SERVICE_REQUEST_TIMEOUT_SECONDS,
+                           help="Seconds a request waits for its result")
+
+    batch_cmd = commands.add_parser("batch", help="Process a directory of bill CSVs into JSONL")
+    batch_cmd.add_argument("directory")
+    batch_cmd.add_argument("--out", required=True, help="Output JSONL path")
+    batch_cmd.add_argument("--pattern", default="*.csv")
+    batch_cmd.add_argument("--region", default=DEFAULT_REGION)
+    batch_cmd.add_argument("--industry", default=DEFAULT_INDUSTRY)
+    batch_cmd.add_argument("--mode", default=None, choices=["template", "llm", "offline"],
+                           help="Also run the LLM stage in this render mode (default: bundles only)")
+    batch_cmd.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    batch_cmd.add_argument("--max-pending", type=int, default=None, help="Bills in flight (default 2 x workers)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.max_pending, args.timeout)
+        return
+    paths = sorted(glob.glob(os.path.join(args.directory, args.pattern)))
+    if not paths:
+        sys.exit(f"No files matching {args.pattern} in {args.directory}")
+    counts = run_batch(paths, args.out, args.region, args.industry, args.mode, args.workers, args.max_pending)
+    print(f"{counts['ok']}/{counts['bills']} bills written to {args.out} in {counts['seconds']} s "
+          f"({counts['bills'] / max(counts['seconds'], 1e-9):.1f} bills/s, {counts['failed']} failed)")
+
+if __name__ == "__main__":
+    main()
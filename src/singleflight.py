@@ -0,0 +1,189 @@
+# Single-flight coalescing: concurrent callers with the same key share one
+# in-flight computation instead of each running it. Works across threads
+# (Streamlit sessions), within an asyncio loop, and for token streams (late
+# joiners replay what has arrived so far, then follow live). With a lock
+# directory, the leader also holds a per-key file lock so other processes wait
+# for it; they then recompute against a warm LLM disk cache.
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from .llm_cache import canonicalize
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def content_key(*parts) -> str:
+    """SHA-256 over the canonical form of `parts` (dataclasses by field; volatile keys such
+    as generated_at ignored), so equal bundles map to the same key.
+    """
+    def plain(value):
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dataclasses.asdict(value)
+        return value
+    payload = json.dumps(canonicalize([plain(p) for p in parts]), sort_keys=True,
+                         separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+class _Broadcast:
+    __slots__ = ("cond", "chunks", "finished", "error")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: list = []
+        self.finished = False
+        self.error: BaseException | None = None
+
+class SingleFlight:
+    def __init__(self, lock_dir: str | None = None):
+        self.lock_dir = lock_dir
+        self.coalesced = 0  # Callers served by someone else's computation
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._streams: dict = {}
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _join(self, table: dict, key, factory):
+        with self._lock:
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = factory()
+                return entry, True
+            self.coalesced += 1
+            return entry, False
+
+    def _leave(self, table: dict, key) -> None:
+        with self._lock:
+            table.pop(key, None)
+
+    @contextmanager
+    def _file_lock(self, key):
+        if not self.lock_dir:
+            yield
+            return
+        path = os.path.join(self.lock_dir, content_key(key)[:32] + ".lock")
+        with open(path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def do(self, key, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per key at a time; concurrent callers get the same
+        result (or exception). Callers arriving after it finishes run it again.
+        """
+        call, leader = self._join(self._calls, key, _Call)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            with self._file_lock(key):
+                call.value = fn(*args, **kwargs)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(self._calls, key)
+            call.done.set()
+
+    async def ado(self, key, factory: Callable):
+        """asyncio variant within one event loop: `factory()` returns the coroutine to share.
+        Cancelling one waiter does not cancel the shared task.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                task = tasks[key] = loop.create_task(factory())
+                task.add_done_callback(lambda t: tasks.pop(key, None))
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key, factory: Callable[[], Iterator]) -> Iterator:
+        """Share one iterator per key: the first caller drives `factory()`, later callers
+        replay the chunks produced so far and then receive new ones as they arrive.
+        """
+        shared, leader = self._join(self._streams, key, _Broadcast)
+        if leader:
+            yield from self._lead(key, shared, factory)
+            return
+        seen = 0
+        while True:
+            with shared.cond:
+                while seen == len(shared.chunks) and not shared.finished:
+                    shared.cond.wait()
+                pending = shared.chunks[seen:]
+                seen = len(shared.chunks)
+                finished, error = shared.finished, shared.error
+            yield from pending
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+    def _lead(self, key, shared: _Broadcast, factory) -> Iterator:
+        try:
+            with self._file_lock(key):
+                for chunk in factory():
+                    with shared.cond:
+                        shared.chunks.append(chunk)
+                        shared.cond.notify_all()
+                    yield chunk
+        except Exception as e:
+            shared.error = e
+            raise
+        except BaseException:
+            # The leader's consumer stopped early; followers must not see a partial result as complete
+            shared.error = RuntimeError("Shared stream was abandoned before it finished")
+            raise
+        finally:
+            self._leave(self._streams, key)
+            with shared.cond:
+                shared.finished = True
+                shared.cond.notify_all()
+
+_default: SingleFlight | None = None
+_default_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide instance; set SINGLEFLIGHT_LOCK_DIR to also coalesce across processes."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = SingleFlight(lock_dir=os.getenv("SINGLEFLIGHT_LOCK_DIR") or None)
+    return _default
@@ -0,0 +1,282 @@
+# Lightweight, dependency-free tracing and metrics.
+# Spans record wall and CPU time with parent/child nesting (via contextvars, so
+# asyncio tasks nest correctly); counters and histograms aggregate in memory.
+# Finished spans can be streamed to a JSON-lines file, and everything can be
+# exported as JSON lines or Prometheus text. Disabled (the default), span() hands
+# back a shared no-op context manager and @traced functions cost one attribute
+# check; hot kernels decorated with hot=True are not wrapped at all.
+#
+#   TELEMETRY_ENABLED=1 TELEMETRY_JSONL_PATH=trace.jsonl python examples/run_example.py
+
+import contextvars
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "").lower() in ("1", "true", "yes")
+TELEMETRY_JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH") or None
+MAX_SPANS = 10_000  # Finished spans kept in memory, newest last
+METRIC_PREFIX = "ener_gpt_"
+# Histogram bucket upper bounds; seconds suit spans and LLM latencies
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+@dataclass(slots=True)
+class SpanRecord:
+    name: str
+    span_id: str
+    parent_id: str | None
+    start: float  # Unix time
+    wall_s: float
+    cpu_s: float | None  # Thread CPU time; includes other tasks interleaved on the same loop
+    attrs: dict = field(default_factory=dict)
+    error: str | None = None
+
+@dataclass(slots=True)
+class _Histogram:
+    buckets: tuple
+    counts: list
+    total: float = 0.0
+    count: int = 0
+
+_current: contextvars.ContextVar = contextvars.ContextVar("telemetry_span", default=None)
+_ids = itertools.count(1)
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ("_telemetry", "name", "attrs", "span_id", "parent_id", "_token", "_start", "_wall", "_cpu")
+
+    def __init__(self, telemetry: "Telemetry", name: str, attrs: dict):
+        self._telemetry = telemetry
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        """Attach attributes discovered while the span is open (e.g. row counts)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent_id = _current.get()
+        self.span_id = f"{os.getpid():x}-{next(_ids):x}"
+        self._token = _current.set(self.span_id)
+        self._start = time.time()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        _current.reset(self._token)
+        error = None if exc_type is None else f"{exc_type.__name__}: {exc}"
+        self._telemetry._finish(SpanRecord(self.name, self.span_id, self.parent_id, self._start, wall, cpu,
+                                           self.attrs, error))
+        return False
+
+class Telemetry:
+    def __init__(self, enabled: bool = TELEMETRY_ENABLED, jsonl_path: str | None = TELEMETRY_JSONL_PATH,
+                 max_spans: int = MAX_SPANS):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.spans: deque = deque(maxlen=max_spans)
+        self._counters: dict = {}
+        self._histograms: dict = {}
+        self._lock = threading.Lock()
+        self._sink = None
+
+    # Recording
+
+    def span(self, name: str, **attrs):
+        """Context manager timing a block; nested spans record their parent."""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, attrs)
+
+    def record_span(self, name: str, wall_s: float, cpu_s: float | None = None, **attrs) -> None:
+        """Record an already-measured span (e.g. a generator that was consumed lazily)."""
+        if self.enabled:
+            self._finish(SpanRecord(name, f"{os.getpid():x}-{next(_ids):x}", _current.get(),
+                                    time.time() - wall_s, wall_s, cpu_s, attrs))
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = _Histogram(buckets, [0] * len(buckets))
+            for i, bound in enumerate(h.buckets):
+                if value <= bound:
+                    h.counts[i] += 1
+                    break
+            h.total += value
+            h.count += 1
+
+    def _finish(self, record: SpanRecord) -> None:
+        self.observe("span_seconds", record.wall_s, span=record.name)
+        if record.error is not None:
+            self.count("span_errors", span=record.name)
+        line = json.dumps({"type": "span", **asdict(record)}, default=str) if self.jsonl_path else None
+        with self._lock:
+            self.spans.append(record)
+            if line is not None:
+                if self._sink is None:
+                    self._sink = open(self.jsonl_path, "a", encoding="utf-8")
+                self._sink.write(line + "\n")
+                self._sink.flush()
+
+    # Export
+
+    def metrics(self) -> list[dict]:
+        """Counters and histograms as plain dicts (histogram buckets are cumulative)."""
+        out = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                out.append({"type": "counter", "name": name, "labels": dict(labels), "value": value})
+            for (name, labels), h in sorted(self._histograms.items()):
+                cumulative = list(itertools.accumulate(h.counts))
+                out.append({"type": "histogram", "name": name, "labels": dict(labels), "count": h.count,
+                            "sum": h.total, "buckets": dict(zip(map(str, h.buckets), cumulative))})
+        return out
+
+    def write_jsonl(self, path: str) -> int:
+        """Write buffered spans, then current metrics, one JSON object per line; returns the line count."""
+        with self._lock:
+            spans = list(self.spans)
+        lines = [{"type": "span", **asdict(s)} for s in spans] + self.metrics()
+        with open(path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, default=str) + "\n")
+        return len(lines)
+
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format (counters get a _total suffix)."""
+        lines, typed = [], set()
+        for m in self.metrics():
+            name = METRIC_PREFIX + _metric_name(m["name"])
+            if m["type"] == "counter":
+                name += "_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {m['type']}")
+            if m["type"] == "counter":
+                lines.append(f"{name}{_format_labels(m['labels'])} {_number(m['value'])}")
+                continue
+            for bound, n in m["buckets"].items():
+                lines.append(f"{name}_bucket{_format_labels({**m['labels'], 'le': bound})} {n}")
+            lines.append(f"{name}_bucket{_format_labels({**m['labels'], 'le': '+Inf'})} {m['count']}")
+            lines.append(f"{name}_sum{_format_labels(m['labels'])} {_number(m['sum'])}")
+            lines.append(f"{name}_count{_format_labels(m['labels'])} {m['count']}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+def _metric_name(name: str) -> str:
+    return _NAME_RE.sub("_", name)
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{_metric_name(k)}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Process-wide instance and shortcuts
+
+_default = Telemetry()
+
+def get_telemetry() -> Telemetry:
+    return _default
+
+def set_enabled(enabled: bool) -> None:
+    """Turn recording on or off at runtime (hot=True kernels keep their import-time choice)."""
+    _default.enabled = enabled
+
+def span(name: str, **attrs):
+    return _default.span(name, **attrs)
+
+def record_span(name: str, wall_s: float, cpu_s: float | None = None, **attrs) -> None:
+    _default.record_span(name, wall_s, cpu_s, **attrs)
+
+def count(name: str, value: float = 1, **labels) -> None:
+    _default.count(name, value, **labels)
+
+def observe(name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels) -> None:
+    _default.observe(name, value, buckets, **labels)
+
+def traced(name: str | None = None, hot: bool = False):
+    """Decorator: run the function inside a span named `name` (default module.function).
+    hot=True is for microsecond kernels called per site: they are left unwrapped unless
+    TELEMETRY_ENABLED is set at import, and then only feed a latency histogram (its count
+    is the call count) instead of recording a span per call.
+    """
+    def decorate(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        if hot:
+            if not _default.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def hot_wrapper(*args, **kwargs):
+                if not _default.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    _default.observe("kernel_seconds", time.perf_counter() - start, kernel=span_name)
+            return hot_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _default.enabled:
+                return fn(*args, **kwargs)
+            with _Span(_default, span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,59 @@
+# Local renderer for the report templates in prompts/.
+# Each template is read once and pre-split into literal text and {field:spec}
+# slots, so filling the numeric tables is a handful of string joins rather than
+# an LLM round trip. Narrative slots can be given an iterator of text chunks,
+# which is streamed through in place.
+
+import os
+import string
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+_formatter = string.Formatter()
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    name: str
+    parts: tuple  # (literal, field, format_spec, conversion); field is None after the last slot
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        return tuple(dict.fromkeys(p[1] for p in self.parts if p[1] is not None))
+
+    def render(self, values: dict) -> str:
+        return "".join(self.render_iter(values))
+
+    def render_iter(self, values: dict) -> Iterator[str]:
+        """Yield the rendered text piece by piece; iterator values are yielded chunk by chunk."""
+        for literal, field, spec, conversion in self.parts:
+            if literal:
+                yield literal
+            if field is None:
+                continue
+            value = values[field]
+            if isinstance(value, Iterator):
+                yield from value
+                continue
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            yield format(value, spec) if spec else str(value)
+
+def compile_template(text: str, name: str = "<string>") -> CompiledTemplate:
+    parts = []
+    for literal, field, spec, conversion in _formatter.parse(text):
+        if field == "" or (field and not field.isidentifier()):
+            raise ValueError(f"Template {name}: unsupported field {{{field}}}")
+        parts.append((literal, field, spec or "", conversion))
+    return CompiledTemplate(name, tuple(parts))
+
+@lru_cache(maxsize=None)
+def load_template(name: str, directory: str = PROMPTS_DIR) -> CompiledTemplate:
+    """Read and compile prompts/<name>.md (cached for the life of the process)."""
+    with open(os.path.join(directory, f"{name}.md"), encoding="utf-8") as f:
+        return compile_template(f.read().strip("\n"), name)
+
+def render_rows(template: CompiledTemplate, rows: list[dict]) -> str:
+    return "\n".join(template.render(r) for r in rows)